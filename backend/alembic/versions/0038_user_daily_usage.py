@@ -0,0 +1,86 @@
+"""user_daily_usage: incremental per-user daily counters for quota checks"""
+
+from alembic import op
+
+revision = "0038_user_daily_usage"
+down_revision = "0037_backfill_campaigns"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 1) Таблица счётчиков: одна строка на пользователя и день (МСК)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS user_daily_usage (
+            user_id    BIGINT      NOT NULL,
+            msk_day    DATE        NOT NULL,
+            used       INTEGER     NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (user_id, msk_day)
+        );
+    """)
+
+    # 2) Триггер: счётчик = число заявок, созданных в этот день МСК (кроме отменённых),
+    #    то же правило, что и в бывшем COUNT(*) из limits.count_effective_today
+    op.execute("""
+        CREATE OR REPLACE FUNCTION applications_daily_usage()
+        RETURNS TRIGGER AS $$
+        DECLARE
+          old_day DATE;
+          new_day DATE;
+        BEGIN
+          IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            IF COALESCE(LOWER(OLD.status), '') NOT IN ('canceled', 'cancelled') THEN
+              old_day := (OLD.created_at AT TIME ZONE 'Europe/Moscow')::date;
+            END IF;
+          END IF;
+          IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            IF COALESCE(LOWER(NEW.status), '') NOT IN ('canceled', 'cancelled') THEN
+              new_day := (NEW.created_at AT TIME ZONE 'Europe/Moscow')::date;
+            END IF;
+          END IF;
+
+          IF TG_OP = 'UPDATE' THEN
+            IF OLD.user_id = NEW.user_id AND old_day IS NOT DISTINCT FROM new_day THEN
+              RETURN NULL;
+            END IF;
+          END IF;
+
+          IF old_day IS NOT NULL THEN
+            UPDATE user_daily_usage
+               SET used = GREATEST(used - 1, 0), updated_at = now()
+             WHERE user_id = OLD.user_id AND msk_day = old_day;
+          END IF;
+          IF new_day IS NOT NULL THEN
+            INSERT INTO user_daily_usage (user_id, msk_day, used)
+            VALUES (NEW.user_id, new_day, 1)
+            ON CONFLICT (user_id, msk_day)
+            DO UPDATE SET used = user_daily_usage.used + 1, updated_at = now();
+          END IF;
+          RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # 3) Триггер и бэкфилл под одной блокировкой, чтобы не потерять вставки между ними
+    op.execute("LOCK TABLE applications IN SHARE ROW EXCLUSIVE MODE;")
+    op.execute("""
+        DROP TRIGGER IF EXISTS trg_applications_daily_usage ON applications;
+        CREATE TRIGGER trg_applications_daily_usage
+        AFTER INSERT OR DELETE OR UPDATE OF status, created_at, user_id ON applications
+        FOR EACH ROW EXECUTE FUNCTION applications_daily_usage();
+    """)
+    op.execute("""
+        INSERT INTO user_daily_usage (user_id, msk_day, used)
+        SELECT user_id, (created_at AT TIME ZONE 'Europe/Moscow')::date, COUNT(*)::int
+          FROM applications
+         WHERE COALESCE(LOWER(status), '') NOT IN ('canceled', 'cancelled')
+         GROUP BY 1, 2
+        ON CONFLICT (user_id, msk_day) DO UPDATE SET used = EXCLUDED.used, updated_at = now();
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_applications_daily_usage ON applications;")
+    op.execute("DROP FUNCTION IF EXISTS applications_daily_usage();")
+    op.execute("DROP TABLE IF EXISTS user_daily_usage;")
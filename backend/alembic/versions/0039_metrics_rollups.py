@@ -0,0 +1,120 @@
+"""metrics.*: daily rollup tables instead of full-history views"""
+
+from alembic import op
+
+revision = "0039_metrics_rollups"
+down_revision = "0038_user_daily_usage"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE SCHEMA IF NOT EXISTS metrics;")
+
+    # те же имена и колонки, что у бывших VIEW — читатели не меняются;
+    # заполняет app/services/metrics_rollup.py (периодически + --backfill)
+    op.execute("DROP VIEW IF EXISTS metrics.registrations_daily;")
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS metrics.registrations_daily (
+            date          DATE        PRIMARY KEY,
+            registrations INTEGER     NOT NULL DEFAULT 0,
+            updated_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+    op.execute("DROP VIEW IF EXISTS metrics.active_subscribers_daily;")
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS metrics.active_subscribers_daily (
+            date               DATE        PRIMARY KEY,
+            active_subscribers INTEGER     NOT NULL DEFAULT 0,
+            updated_at         TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+    op.execute("DROP VIEW IF EXISTS metrics.funnel_alltime;")
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS metrics.funnel_alltime (
+            step       TEXT        PRIMARY KEY,
+            label      TEXT        NOT NULL,
+            value      BIGINT      NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+    # диапазонный подсчёт регистраций за день
+    op.execute("CREATE INDEX IF NOT EXISTS ix_users_created_at ON users (created_at);")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_users_created_at;")
+    op.execute("DROP TABLE IF EXISTS metrics.funnel_alltime;")
+    op.execute("DROP TABLE IF EXISTS metrics.active_subscribers_daily;")
+    op.execute("DROP TABLE IF EXISTS metrics.registrations_daily;")
+
+    # возвращаем VIEW из 21ba3213ffef
+    op.execute("""
+        CREATE OR REPLACE VIEW metrics.registrations_daily AS
+        WITH bounds AS (
+          SELECT
+            LEAST((SELECT COALESCE(MIN(created_at), now())::date FROM public.users), current_date) AS d0,
+            current_date AS d1
+        ),
+        days AS (
+          SELECT generate_series((SELECT d0 FROM bounds), (SELECT d1 FROM bounds), INTERVAL '1 day')::date AS d
+        )
+        SELECT
+          d::date AS date,
+          COALESCE(COUNT(u.*), 0) AS registrations
+        FROM days d
+        LEFT JOIN public.users u ON u.created_at::date = d
+        GROUP BY d
+        ORDER BY d;
+    """)
+    op.execute("""
+        CREATE OR REPLACE VIEW metrics.active_subscribers_daily AS
+        WITH bounds AS (
+          SELECT
+            COALESCE(MIN(started_at), current_date)::date AS d0,
+            GREATEST(current_date::date, COALESCE(MAX(expires_at), current_date)::date) AS d1
+          FROM public.subscriptions
+        ),
+        days AS (
+          SELECT generate_series((SELECT d0 FROM bounds), (SELECT d1 FROM bounds), INTERVAL '1 day')::date AS d
+        )
+        SELECT
+          d::date AS date,
+          COUNT(*) FILTER (
+            WHERE s.started_at::date <= d
+              AND s.expires_at::date  >  d
+              AND s.status = 'active'
+          ) AS active_subscribers
+        FROM days d
+        LEFT JOIN public.subscriptions s
+          ON s.started_at::date <= d
+        GROUP BY d
+        ORDER BY d;
+    """)
+    op.execute("""
+        CREATE OR REPLACE VIEW metrics.funnel_alltime AS
+        SELECT 'visited'          AS step, 'Зашли в бота'            AS label, COUNT(*)::bigint AS value
+        FROM public.users
+        UNION ALL
+        SELECT 'hh_connected',       'Подключили HH',                COUNT(*)::bigint
+        FROM public.users
+        WHERE hh_account_id IS NOT NULL AND hh_account_id <> ''
+        UNION ALL
+        SELECT 'applied_20',         'Сделали 20 откликов',          COUNT(*)::bigint
+        FROM (
+          SELECT user_id, COUNT(*) AS cnt
+          FROM public.applications
+          WHERE status IN ('queued','sent')
+          GROUP BY user_id
+        ) t
+        WHERE t.cnt >= 20
+        UNION ALL
+        SELECT 'subscribed',         'Оформили подписку (активна)',  COUNT(DISTINCT user_id)::bigint
+        FROM public.subscriptions
+        WHERE status = 'active'
+          AND started_at <= now()
+          AND expires_at  >  now();
+    """)
@@ -0,0 +1,52 @@
+"""composite indexes for range predicates on hot queries"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0040_sargable_indexes"
+down_revision = "0039_metrics_rollups"
+branch_labels = None
+depends_on = None
+
+
+def _has_column(bind, table: str, column: str) -> bool:
+    return bind.execute(sa.text("""
+        SELECT 1 FROM information_schema.columns
+         WHERE table_schema = 'public' AND table_name = :t AND column_name = :c
+    """), {"t": table, "c": column}).first() is not None
+
+
+def upgrade():
+    bind = op.get_bind()
+    queue_has_campaign = _has_column(bind, "applications_queue", "campaign_id")
+
+    # CONCURRENTLY — без блокировки записи в applications; вне транзакции
+    with op.get_context().autocommit_block():
+        # квоты/счётчики пользователя: user_id + диапазон created_at
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_applications_user_created
+            ON applications (user_id, created_at)
+        """)
+        # карточки кампаний: sent/pending за сегодня по campaign_id
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_applications_campaign_status_created
+            ON applications (campaign_id, status, created_at)
+        """)
+        # admin_today_quotas: status='sent' + диапазон updated_at
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_applications_status_updated
+            ON applications (status, updated_at)
+        """)
+        if queue_has_campaign:
+            op.execute("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_applications_queue_campaign_created
+                ON applications_queue (campaign_id, created_at)
+            """)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_applications_queue_campaign_created")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_applications_status_updated")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_applications_campaign_status_created")
+        # ix_applications_user_created создан ещё в 0002 — не трогаем
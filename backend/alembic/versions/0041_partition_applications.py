@@ -0,0 +1,267 @@
+"""applications: monthly range partitions by created_at + applications_dedup"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0041_partition_applications"
+down_revision = "0040_sargable_indexes"
+branch_labels = None
+depends_on = None
+
+# сколько месяцев вперёд держать готовые секции при миграции
+MONTHS_AHEAD = 3
+
+_DEPENDENT_VIEWS = """
+    SELECT DISTINCT v.oid::regclass::text AS name, pg_get_viewdef(v.oid) AS def
+      FROM pg_depend d
+      JOIN pg_rewrite r ON r.oid = d.objid
+      JOIN pg_class   v ON v.oid = r.ev_class
+     WHERE d.refobjid = CAST(:t AS regclass)
+       AND v.oid <> CAST(:t AS regclass)
+       AND v.relkind = 'v'
+"""
+
+_PLAIN_INDEXES = """
+    SELECT i.indexrelid::regclass::text AS name, pg_get_indexdef(i.indexrelid) AS def
+      FROM pg_index i
+     WHERE i.indrelid = CAST(:t AS regclass)
+       AND NOT i.indisunique
+"""
+
+# внешние ключи самой таблицы: LIKE ... INCLUDING CONSTRAINTS переносит только CHECK/NOT NULL
+_FOREIGN_KEYS = """
+    SELECT conname, pg_get_constraintdef(oid) AS def
+      FROM pg_constraint
+     WHERE conrelid = CAST(:t AS regclass)
+       AND contype = 'f'
+"""
+
+_USER_TRIGGERS = """
+    SELECT tgname, pg_get_triggerdef(oid) AS def
+      FROM pg_trigger
+     WHERE tgrelid = CAST(:t AS regclass)
+       AND NOT tgisinternal
+"""
+
+
+def _is_partitioned(bind) -> bool:
+    return bind.execute(sa.text("""
+        SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('public.applications')
+    """)).first() is not None
+
+
+def _retarget(defn: str, src: str, dst: str) -> str:
+    """DDL индекса/триггера со старой таблицы — на новую."""
+    for a, b in ((f" ON public.{src} ", f" ON public.{dst} "), (f" ON {src} ", f" ON {dst} ")):
+        defn = defn.replace(a, b)
+    return defn
+
+
+def _swap_table(bind, *, create_sql: str, after_copy_sql: list[str], skip_triggers: tuple = ()):
+    """
+    Общая часть upgrade/downgrade: applications -> applications_old,
+    новая applications по create_sql, копия данных, индексы/триггеры/VIEW обратно.
+    """
+    op.execute("LOCK TABLE applications IN ACCESS EXCLUSIVE MODE")
+
+    views = bind.execute(sa.text(_DEPENDENT_VIEWS), {"t": "applications"}).all()
+    indexes = bind.execute(sa.text(_PLAIN_INDEXES), {"t": "applications"}).all()
+    triggers = bind.execute(sa.text(_USER_TRIGGERS), {"t": "applications"}).all()
+    foreign_keys = bind.execute(sa.text(_FOREIGN_KEYS), {"t": "applications"}).all()
+
+    for name, _ in views:
+        op.execute(f"DROP VIEW {name}")
+    op.execute("ALTER TABLE applications RENAME TO applications_old")
+    # имя PK (и его индекса) освобождаем для новой таблицы
+    op.execute("""
+        DO $$
+        BEGIN
+          IF EXISTS (SELECT 1 FROM pg_constraint
+                      WHERE conname = 'applications_pkey' AND conrelid = 'applications_old'::regclass) THEN
+            ALTER TABLE applications_old RENAME CONSTRAINT applications_pkey TO applications_old_pkey;
+          END IF;
+        END $$;
+    """)
+
+    op.execute(create_sql)
+    op.execute("CREATE SEQUENCE IF NOT EXISTS applications_pid_seq AS bigint")
+    op.execute("""
+        SELECT setval('applications_pid_seq',
+                      GREATEST(COALESCE((SELECT MAX(id) FROM applications_old), 0), 1))
+    """)
+    op.execute("ALTER TABLE applications ALTER COLUMN id SET DEFAULT nextval('applications_pid_seq')")
+    for sql in after_copy_sql:
+        op.execute(sql)
+    # FK (users, campaigns, cover_letters) — на новую таблицу до удаления старой:
+    # DROP ... CASCADE иначе унёс бы их молча (на секционированной таблице — PG12+)
+    for conname, defn in foreign_keys:
+        op.execute(f'ALTER TABLE applications ADD CONSTRAINT "{conname}" {defn}')
+
+    # имена индексов глобальны в схеме — сначала убираем старую таблицу
+    # (последовательность отвязываем, чтобы она не ушла вместе со старой таблицей)
+    op.execute("ALTER SEQUENCE applications_pid_seq OWNED BY NONE")
+    op.execute("DROP TABLE applications_old CASCADE")
+    op.execute("ALTER SEQUENCE applications_pid_seq OWNED BY applications.id")
+
+    for _, defn in indexes:
+        op.execute(_retarget(defn, "applications_old", "applications"))
+    # триггеры — после копирования: иначе лог и счётчики квот задвоятся
+    for tgname, defn in triggers:
+        if tgname in skip_triggers:
+            continue
+        op.execute(_retarget(defn, "applications_old", "applications"))
+    for name, defn in views:
+        op.execute(f"CREATE VIEW {name} AS {defn}")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if _is_partitioned(bind):
+        return
+
+    # 1) Секции: создание вперёд и отсоединение старых (вызывает services/applications_store.py)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION applications_ensure_partitions(months_ahead int DEFAULT 3, from_month date DEFAULT NULL)
+        RETURNS int AS $$
+        DECLARE
+          m      date := COALESCE(from_month, date_trunc('month', now() AT TIME ZONE 'UTC')::date);
+          last_m date := (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => months_ahead))::date;
+          pname  text;
+          created int := 0;
+        BEGIN
+          m := date_trunc('month', m)::date;
+          WHILE m <= last_m LOOP
+            pname := 'applications_p' || to_char(m, 'YYYYMM');
+            IF to_regclass('public.' || pname) IS NULL
+               AND to_regclass('public.applications_archive_' || to_char(m, 'YYYYMM')) IS NULL THEN
+              EXECUTE format(
+                'CREATE TABLE %I PARTITION OF applications FOR VALUES FROM (%L) TO (%L)',
+                pname,
+                m::timestamp AT TIME ZONE 'UTC',
+                (m + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+              );
+              created := created + 1;
+            END IF;
+            m := (m + interval '1 month')::date;
+          END LOOP;
+          RETURN created;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION applications_detach_partitions(keep_months int)
+        RETURNS SETOF text AS $$
+        DECLARE
+          cutoff date := (date_trunc('month', now() AT TIME ZONE 'UTC') - make_interval(months => keep_months))::date;
+          r record;
+        BEGIN
+          FOR r IN
+            SELECT c.relname, substr(c.relname, 15) AS ym
+              FROM pg_inherits i
+              JOIN pg_class c ON c.oid = i.inhrelid
+             WHERE i.inhparent = 'applications'::regclass
+               AND c.relname ~ '^applications_p[0-9]{6}$'
+               AND to_date(substr(c.relname, 15), 'YYYYMM') < cutoff
+             ORDER BY c.relname
+          LOOP
+            EXECUTE format('ALTER TABLE applications DETACH PARTITION %I', r.relname);
+            EXECUTE format('ALTER TABLE %I RENAME TO %I', r.relname, 'applications_archive_' || r.ym);
+            RETURN NEXT 'applications_archive_' || r.ym;
+          END LOOP;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # 2) Дедуп (user_id, vacancy_id): уникальность на секционированной таблице
+    #    требовала бы created_at в ключе, поэтому — отдельная узкая таблица
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS applications_dedup (
+            user_id        BIGINT      NOT NULL,
+            vacancy_id     BIGINT      NOT NULL,
+            application_id BIGINT      NOT NULL,
+            created_at     TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY (user_id, vacancy_id),
+            CONSTRAINT applications_dedup_user_fk
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_applications_dedup_app ON applications_dedup (application_id)")
+
+    _swap_table(
+        bind,
+        create_sql="""
+            CREATE TABLE applications (
+                LIKE applications_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS
+            ) PARTITION BY RANGE (created_at)
+        """,
+        after_copy_sql=[
+            "ALTER TABLE applications ADD CONSTRAINT applications_pkey PRIMARY KEY (id, created_at)",
+            f"""
+            SELECT applications_ensure_partitions(
+                {MONTHS_AHEAD},
+                (SELECT MIN(created_at) AT TIME ZONE 'UTC' FROM applications_old)::date
+            )
+            """,
+            # страховка от строк вне диапазона секций; в норме пустая
+            "CREATE TABLE IF NOT EXISTS applications_default PARTITION OF applications DEFAULT",
+            "INSERT INTO applications SELECT * FROM applications_old",
+            """
+            INSERT INTO applications_dedup (user_id, vacancy_id, application_id, created_at)
+            SELECT user_id, vacancy_id, id, created_at FROM applications_old
+            ON CONFLICT (user_id, vacancy_id) DO NOTHING
+            """,
+        ],
+    )
+
+    # 3) Удалённая заявка освобождает вакансию; перенос строки между секциями
+    #    (UPDATE created_at) — это DELETE+INSERT, его не трогаем
+    op.execute("""
+        CREATE OR REPLACE FUNCTION applications_dedup_release()
+        RETURNS TRIGGER AS $$
+        BEGIN
+          IF NOT EXISTS (SELECT 1 FROM applications WHERE id = OLD.id) THEN
+            DELETE FROM applications_dedup
+             WHERE user_id = OLD.user_id AND vacancy_id = OLD.vacancy_id AND application_id = OLD.id;
+          END IF;
+          RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS trg_applications_dedup_release ON applications;
+        CREATE TRIGGER trg_applications_dedup_release
+        AFTER DELETE ON applications
+        FOR EACH ROW EXECUTE FUNCTION applications_dedup_release();
+    """)
+
+    # applications_log.application_id больше не FK (PK стал (id, created_at)) — нужен свой индекс
+    op.execute("CREATE INDEX IF NOT EXISTS ix_applications_log_app ON applications_log (application_id)")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if not _is_partitioned(bind):
+        return
+
+    _swap_table(
+        bind,
+        create_sql="""
+            CREATE TABLE applications (
+                LIKE applications_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS
+            )
+        """,
+        after_copy_sql=[
+            "INSERT INTO applications SELECT * FROM applications_old",
+            "ALTER TABLE applications ADD CONSTRAINT applications_pkey PRIMARY KEY (id)",
+            "ALTER TABLE applications ADD CONSTRAINT uq_applications_user_vacancy UNIQUE (user_id, vacancy_id)",
+        ],
+        skip_triggers=("trg_applications_dedup_release",),
+    )
+    op.execute("""
+        ALTER TABLE applications_log
+          ADD CONSTRAINT applications_log_application_id_fkey
+          FOREIGN KEY (application_id) REFERENCES applications(id) ON DELETE CASCADE NOT VALID
+    """)
+    op.execute("DROP FUNCTION IF EXISTS applications_dedup_release()")
+    op.execute("DROP TABLE IF EXISTS applications_dedup")
+    op.execute("DROP FUNCTION IF EXISTS applications_detach_partitions(int)")
+    op.execute("DROP FUNCTION IF EXISTS applications_ensure_partitions(int, date)")
@@ -0,0 +1,254 @@
+"""applications_log: smallint event codes, BRIN on created_at, monthly partitions; hh state columns on applications"""
+
+from alembic import op
+
+revision = "0042_applications_log_compact"
+down_revision = "0041_partition_applications"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+# коды событий; те же значения — в app/services/hh_events.py (EVENT_CODES)
+_EVENT_CODE_SQL = """
+    CREATE OR REPLACE FUNCTION application_event_code(ev text)
+    RETURNS smallint AS $$
+      SELECT (CASE lower(btrim(ev))
+        WHEN 'queued'        THEN 1
+        WHEN 'sent'          THEN 2
+        WHEN 'error'         THEN 3
+        WHEN 'retry'         THEN 4
+        WHEN 'canceled'      THEN 5
+        WHEN 'cancelled'     THEN 5
+        WHEN 'viewed'        THEN 10
+        WHEN 'resume_viewed' THEN 10
+        WHEN 'seen'          THEN 10
+        WHEN 'read'          THEN 10
+        WHEN 'invited'       THEN 11
+        WHEN 'invite'        THEN 11
+        WHEN 'interview'     THEN 11
+        WHEN 'offer'         THEN 11
+        WHEN 'declined'      THEN 12
+        WHEN 'decline'       THEN 12
+        WHEN 'rejected'      THEN 12
+        WHEN 'reject'        THEN 12
+        WHEN 'auto_rejected' THEN 12
+        WHEN 'denied'        THEN 12
+        WHEN 'failed'        THEN 12
+        ELSE 0
+      END)::smallint
+    $$ LANGUAGE sql IMMUTABLE;
+
+    CREATE OR REPLACE FUNCTION application_event_name(code smallint)
+    RETURNS text AS $$
+      SELECT CASE code
+        WHEN 1  THEN 'queued'
+        WHEN 2  THEN 'sent'
+        WHEN 3  THEN 'error'
+        WHEN 4  THEN 'retry'
+        WHEN 5  THEN 'canceled'
+        WHEN 10 THEN 'viewed'
+        WHEN 11 THEN 'invited'
+        WHEN 12 THEN 'declined'
+        ELSE 'other'
+      END
+    $$ LANGUAGE sql IMMUTABLE;
+"""
+
+
+def upgrade():
+    op.execute(_EVENT_CODE_SQL)
+
+    # 1) Текущее состояние заявки по событиям HH — читается без лога
+    op.execute("""
+        ALTER TABLE applications
+          ADD COLUMN IF NOT EXISTS viewed_at   TIMESTAMPTZ,
+          ADD COLUMN IF NOT EXISTS invited_at  TIMESTAMPTZ,
+          ADD COLUMN IF NOT EXISTS declined_at TIMESTAMPTZ;
+    """)
+    op.execute("""
+        UPDATE applications a
+           SET viewed_at   = s.viewed_at,
+               invited_at  = s.invited_at,
+               declined_at = s.declined_at
+          FROM (
+            SELECT application_id,
+                   MIN(created_at) FILTER (WHERE application_event_code(event) = 10) AS viewed_at,
+                   MIN(created_at) FILTER (WHERE application_event_code(event) = 11) AS invited_at,
+                   MIN(created_at) FILTER (WHERE application_event_code(event) = 12) AS declined_at
+              FROM applications_log
+             WHERE application_event_code(event) IN (10, 11, 12)
+             GROUP BY application_id
+          ) s
+         WHERE a.id = s.application_id
+    """)
+
+    # 2) Секции лога по месяцам (обслуживает services/applications_store.py)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION applications_log_ensure_partitions(months_ahead int DEFAULT 3, from_month date DEFAULT NULL)
+        RETURNS int AS $$
+        DECLARE
+          m      date := COALESCE(from_month, date_trunc('month', now() AT TIME ZONE 'UTC')::date);
+          last_m date := (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => months_ahead))::date;
+          pname  text;
+          created int := 0;
+        BEGIN
+          m := date_trunc('month', m)::date;
+          WHILE m <= last_m LOOP
+            pname := 'applications_log_p' || to_char(m, 'YYYYMM');
+            IF to_regclass('public.' || pname) IS NULL THEN
+              EXECUTE format(
+                'CREATE TABLE %I PARTITION OF applications_log FOR VALUES FROM (%L) TO (%L)',
+                pname,
+                m::timestamp AT TIME ZONE 'UTC',
+                (m + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+              );
+              created := created + 1;
+            END IF;
+            m := (m + interval '1 month')::date;
+          END LOOP;
+          RETURN created;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # 3) Пересборка лога: узкие колонки (bigint/timestamptz вперёд, smallint код), без FK
+    op.execute("LOCK TABLE applications_log IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE applications_log RENAME TO applications_log_old")
+    op.execute("ALTER INDEX IF EXISTS ix_applications_log_app RENAME TO ix_applications_log_old_app")
+    op.execute("ALTER INDEX IF EXISTS ix_applications_log_created_at RENAME TO ix_applications_log_old_created_at")
+    op.execute("ALTER INDEX IF EXISTS idx_applications_log_campaign_id RENAME TO idx_applications_log_old_campaign_id")
+    op.execute("""
+        DO $$
+        BEGIN
+          IF EXISTS (SELECT 1 FROM pg_constraint
+                      WHERE conname = 'applications_log_pkey' AND conrelid = 'applications_log_old'::regclass) THEN
+            ALTER TABLE applications_log_old RENAME CONSTRAINT applications_log_pkey TO applications_log_old_pkey;
+          END IF;
+        END $$;
+    """)
+    op.execute("""
+        CREATE TABLE applications_log (
+            id             BIGINT      NOT NULL DEFAULT nextval('applications_log_id_seq'),
+            application_id BIGINT      NOT NULL,
+            campaign_id    BIGINT,
+            created_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+            event_code     SMALLINT    NOT NULL,
+            details        TEXT,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute(f"""
+        SELECT applications_log_ensure_partitions(
+            {MONTHS_AHEAD},
+            (SELECT MIN(created_at) AT TIME ZONE 'UTC' FROM applications_log_old)::date
+        )
+    """)
+    op.execute("CREATE TABLE IF NOT EXISTS applications_log_default PARTITION OF applications_log DEFAULT")
+    # неизвестные события (код 0) сохраняют исходный текст в details
+    op.execute("""
+        INSERT INTO applications_log (id, application_id, campaign_id, created_at, event_code, details)
+        SELECT id, application_id, campaign_id, created_at,
+               application_event_code(event),
+               CASE WHEN application_event_code(event) = 0 AND details IS NULL THEN event ELSE details END
+          FROM applications_log_old
+    """)
+    op.execute("ALTER SEQUENCE applications_log_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE applications_log_old CASCADE")
+    op.execute("ALTER SEQUENCE applications_log_id_seq OWNED BY applications_log.id")
+
+    op.execute("""
+        ALTER TABLE applications_log
+          ADD CONSTRAINT applications_log_campaign_fk
+          FOREIGN KEY (campaign_id) REFERENCES campaigns(id) ON DELETE SET NULL
+    """)
+    # лог только дописывается — BRIN по времени почти ничего не весит
+    op.execute("CREATE INDEX IF NOT EXISTS ix_applications_log_created_brin ON applications_log USING brin (created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_applications_log_app ON applications_log (application_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_applications_log_campaign_id ON applications_log (campaign_id)")
+
+    # 4) Триггер статусов пишет код
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_applications_status()
+        RETURNS TRIGGER AS $$
+        BEGIN
+          IF TG_OP = 'INSERT' THEN
+            INSERT INTO applications_log(application_id, event_code, details)
+            VALUES (NEW.id, application_event_code(NEW.status), NULL);
+          ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+            INSERT INTO applications_log(application_id, event_code, details)
+            VALUES (NEW.id, application_event_code(NEW.status), NEW.error);
+          END IF;
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+
+def downgrade():
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_applications_status()
+        RETURNS TRIGGER AS $$
+        BEGIN
+          IF TG_OP = 'INSERT' THEN
+            INSERT INTO applications_log(application_id, event, details)
+            VALUES (NEW.id, NEW.status, NULL);
+            RETURN NEW;
+          ELSIF TG_OP = 'UPDATE' THEN
+            IF NEW.status IS DISTINCT FROM OLD.status THEN
+              INSERT INTO applications_log(application_id, event, details)
+              VALUES (NEW.id, NEW.status, NEW.error);
+            END IF;
+            RETURN NEW;
+          END IF;
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("LOCK TABLE applications_log IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE applications_log RENAME TO applications_log_new")
+    op.execute("DROP INDEX IF EXISTS ix_applications_log_app")
+    op.execute("DROP INDEX IF EXISTS idx_applications_log_campaign_id")
+    op.execute("ALTER TABLE applications_log_new DROP CONSTRAINT IF EXISTS applications_log_campaign_fk")
+    op.execute("ALTER TABLE applications_log_new RENAME CONSTRAINT applications_log_pkey TO applications_log_new_pkey")
+    op.execute("""
+        CREATE TABLE applications_log (
+            id             BIGINT      PRIMARY KEY DEFAULT nextval('applications_log_id_seq'),
+            application_id BIGINT      NOT NULL,
+            event          VARCHAR(32) NOT NULL,
+            details        TEXT,
+            created_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+            campaign_id    BIGINT
+        )
+    """)
+    op.execute("""
+        INSERT INTO applications_log (id, application_id, event, details, created_at, campaign_id)
+        SELECT id, application_id,
+               CASE WHEN event_code = 0 AND details IS NOT NULL THEN left(details, 32)
+                    ELSE application_event_name(event_code) END,
+               details, created_at, campaign_id
+          FROM applications_log_new
+    """)
+    op.execute("ALTER SEQUENCE applications_log_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE applications_log_new CASCADE")
+    op.execute("ALTER SEQUENCE applications_log_id_seq OWNED BY applications_log.id")
+
+    op.execute("CREATE INDEX IF NOT EXISTS ix_applications_log_app ON applications_log (application_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_applications_log_created_at ON applications_log (created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_applications_log_campaign_id ON applications_log (campaign_id)")
+    op.execute("""
+        ALTER TABLE applications_log
+          ADD CONSTRAINT applications_log_campaign_fk
+          FOREIGN KEY (campaign_id) REFERENCES campaigns(id) ON DELETE SET NULL
+    """)
+
+    op.execute("DROP FUNCTION IF EXISTS applications_log_ensure_partitions(int, date)")
+    op.execute("""
+        ALTER TABLE applications
+          DROP COLUMN IF EXISTS declined_at,
+          DROP COLUMN IF EXISTS invited_at,
+          DROP COLUMN IF EXISTS viewed_at;
+    """)
+    op.execute("DROP FUNCTION IF EXISTS application_event_name(smallint)")
+    op.execute("DROP FUNCTION IF EXISTS application_event_code(text)")
@@ -0,0 +1,183 @@
+"""campaign_stats: per-campaign counters maintained by triggers on applications/applications_queue"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0043_campaign_stats"
+down_revision = "0042_applications_log_compact"
+branch_labels = None
+depends_on = None
+
+
+def _has_column(bind, table: str, column: str) -> bool:
+    return bind.execute(sa.text("""
+        SELECT 1 FROM information_schema.columns
+         WHERE table_schema = 'public' AND table_name = :t AND column_name = :c
+    """), {"t": table, "c": column}).first() is not None
+
+
+def upgrade():
+    bind = op.get_bind()
+    queue_has_campaign = _has_column(bind, "applications_queue", "campaign_id")
+
+    # «сегодня» — сутки по МСК; *_today относятся к stats_day и обнуляются при смене дня
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS campaign_stats (
+            campaign_id   BIGINT      PRIMARY KEY REFERENCES campaigns(id) ON DELETE CASCADE,
+            sent_total    INTEGER     NOT NULL DEFAULT 0,
+            sent_today    INTEGER     NOT NULL DEFAULT 0,
+            pending       INTEGER     NOT NULL DEFAULT 0,
+            pending_today INTEGER     NOT NULL DEFAULT 0,
+            stats_day     DATE        NOT NULL DEFAULT (now() AT TIME ZONE 'Europe/Moscow')::date,
+            last_sent_at  TIMESTAMPTZ,
+            updated_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION campaign_stats_apply(
+            cid bigint, d_sent int, d_sent_today int, d_pending int, d_pending_today int, sent_ts timestamptz
+        ) RETURNS void AS $$
+        DECLARE
+          today date := (now() AT TIME ZONE 'Europe/Moscow')::date;
+        BEGIN
+          d_sent := COALESCE(d_sent, 0);
+          d_sent_today := COALESCE(d_sent_today, 0);
+          d_pending := COALESCE(d_pending, 0);
+          d_pending_today := COALESCE(d_pending_today, 0);
+          IF cid IS NULL OR (d_sent = 0 AND d_pending = 0 AND d_sent_today = 0 AND d_pending_today = 0) THEN
+            RETURN;
+          END IF;
+          INSERT INTO campaign_stats AS s
+                 (campaign_id, sent_total, sent_today, pending, pending_today, stats_day, last_sent_at, updated_at)
+          SELECT cid, GREATEST(d_sent, 0), GREATEST(d_sent_today, 0),
+                 GREATEST(d_pending, 0), GREATEST(d_pending_today, 0), today, sent_ts, now()
+           WHERE EXISTS (SELECT 1 FROM campaigns WHERE id = cid)
+          ON CONFLICT (campaign_id) DO UPDATE SET
+            sent_total    = GREATEST(s.sent_total + d_sent, 0),
+            sent_today    = GREATEST(CASE WHEN s.stats_day = today THEN s.sent_today ELSE 0 END + d_sent_today, 0),
+            pending       = GREATEST(s.pending + d_pending, 0),
+            pending_today = GREATEST(CASE WHEN s.stats_day = today THEN s.pending_today ELSE 0 END + d_pending_today, 0),
+            stats_day     = today,
+            last_sent_at  = GREATEST(s.last_sent_at, sent_ts),
+            updated_at    = now();
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # applications: sent — по sent_at (день отправки), pending (queued/retry) — по created_at
+    op.execute("""
+        CREATE OR REPLACE FUNCTION applications_campaign_stats()
+        RETURNS TRIGGER AS $$
+        DECLARE
+          today date := (now() AT TIME ZONE 'Europe/Moscow')::date;
+        BEGIN
+          IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.campaign_id IS NOT NULL THEN
+            PERFORM campaign_stats_apply(
+              OLD.campaign_id,
+              -(OLD.status = 'sent')::int,
+              -(OLD.status = 'sent' AND (COALESCE(OLD.sent_at, OLD.updated_at) AT TIME ZONE 'Europe/Moscow')::date = today)::int,
+              -(OLD.status IN ('queued', 'retry'))::int,
+              -(OLD.status IN ('queued', 'retry') AND (OLD.created_at AT TIME ZONE 'Europe/Moscow')::date = today)::int,
+              NULL
+            );
+          END IF;
+          IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.campaign_id IS NOT NULL THEN
+            PERFORM campaign_stats_apply(
+              NEW.campaign_id,
+              (NEW.status = 'sent')::int,
+              (NEW.status = 'sent' AND (COALESCE(NEW.sent_at, NEW.updated_at) AT TIME ZONE 'Europe/Moscow')::date = today)::int,
+              (NEW.status IN ('queued', 'retry'))::int,
+              (NEW.status IN ('queued', 'retry') AND (NEW.created_at AT TIME ZONE 'Europe/Moscow')::date = today)::int,
+              CASE WHEN NEW.status = 'sent' THEN NEW.sent_at END
+            );
+          END IF;
+          RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS trg_applications_campaign_stats ON applications;
+        CREATE TRIGGER trg_applications_campaign_stats
+        AFTER INSERT OR DELETE OR UPDATE OF status, campaign_id, created_at, sent_at ON applications
+        FOR EACH ROW EXECUTE FUNCTION applications_campaign_stats();
+    """)
+
+    if queue_has_campaign:
+        op.execute("""
+            CREATE OR REPLACE FUNCTION applications_queue_campaign_stats()
+            RETURNS TRIGGER AS $$
+            DECLARE
+              today date := (now() AT TIME ZONE 'Europe/Moscow')::date;
+            BEGIN
+              IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.campaign_id IS NOT NULL THEN
+                PERFORM campaign_stats_apply(
+                  OLD.campaign_id, 0, 0, -1,
+                  -((OLD.created_at AT TIME ZONE 'Europe/Moscow')::date = today)::int, NULL);
+              END IF;
+              IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.campaign_id IS NOT NULL THEN
+                PERFORM campaign_stats_apply(
+                  NEW.campaign_id, 0, 0, 1,
+                  ((NEW.created_at AT TIME ZONE 'Europe/Moscow')::date = today)::int, NULL);
+              END IF;
+              RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS trg_applications_queue_campaign_stats ON applications_queue;
+            CREATE TRIGGER trg_applications_queue_campaign_stats
+            AFTER INSERT OR DELETE OR UPDATE OF campaign_id, created_at ON applications_queue
+            FOR EACH ROW EXECUTE FUNCTION applications_queue_campaign_stats();
+        """)
+
+    # Бэкфилл: пишущие транзакции ждут, пока счётчики не посчитаны (иначе — двойной учёт)
+    op.execute("LOCK TABLE applications IN SHARE ROW EXCLUSIVE MODE")
+    if queue_has_campaign:
+        op.execute("LOCK TABLE applications_queue IN SHARE ROW EXCLUSIVE MODE")
+    queue_sql = """
+        UNION ALL
+        SELECT campaign_id, 0, 0, 1,
+               ((created_at AT TIME ZONE 'Europe/Moscow')::date = (now() AT TIME ZONE 'Europe/Moscow')::date)::int,
+               NULL::timestamptz
+          FROM applications_queue
+         WHERE campaign_id IS NOT NULL
+    """ if queue_has_campaign else ""
+    op.execute(f"""
+        INSERT INTO campaign_stats
+               (campaign_id, sent_total, sent_today, pending, pending_today, stats_day, last_sent_at, updated_at)
+        SELECT x.campaign_id, SUM(x.s), SUM(x.st), SUM(x.p), SUM(x.pt),
+               (now() AT TIME ZONE 'Europe/Moscow')::date, MAX(x.ts), now()
+          FROM (
+            SELECT campaign_id,
+                   (status = 'sent')::int AS s,
+                   (status = 'sent'
+                    AND (COALESCE(sent_at, updated_at) AT TIME ZONE 'Europe/Moscow')::date
+                        = (now() AT TIME ZONE 'Europe/Moscow')::date)::int AS st,
+                   (status IN ('queued', 'retry'))::int AS p,
+                   (status IN ('queued', 'retry')
+                    AND (created_at AT TIME ZONE 'Europe/Moscow')::date
+                        = (now() AT TIME ZONE 'Europe/Moscow')::date)::int AS pt,
+                   CASE WHEN status = 'sent' THEN sent_at END AS ts
+              FROM applications
+             WHERE campaign_id IS NOT NULL
+            {queue_sql}
+          ) x
+          JOIN campaigns c ON c.id = x.campaign_id
+         GROUP BY x.campaign_id
+        ON CONFLICT (campaign_id) DO UPDATE SET
+          sent_total    = EXCLUDED.sent_total,
+          sent_today    = EXCLUDED.sent_today,
+          pending       = EXCLUDED.pending,
+          pending_today = EXCLUDED.pending_today,
+          stats_day     = EXCLUDED.stats_day,
+          last_sent_at  = EXCLUDED.last_sent_at,
+          updated_at    = now()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_applications_queue_campaign_stats ON applications_queue;")
+    op.execute("DROP FUNCTION IF EXISTS applications_queue_campaign_stats();")
+    op.execute("DROP TRIGGER IF EXISTS trg_applications_campaign_stats ON applications;")
+    op.execute("DROP FUNCTION IF EXISTS applications_campaign_stats();")
+    op.execute("DROP FUNCTION IF EXISTS campaign_stats_apply(bigint, int, int, int, int, timestamptz);")
+    op.execute("DROP TABLE IF EXISTS campaign_stats;")
@@ -0,0 +1,72 @@
+"""idx_apps_campaign_kind_created via migration (was created at import of app.main)"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0044_apps_campaign_kind_index"
+down_revision = "0043_campaign_stats"
+branch_labels = None
+depends_on = None
+
+INDEX = "idx_apps_campaign_kind_created"
+COLUMNS = "(campaign_id, kind, created_at DESC)"
+
+
+def _partitions(bind) -> list:
+    return [r[0] for r in bind.execute(sa.text("""
+        SELECT c.relname
+          FROM pg_inherits i
+          JOIN pg_class c ON c.oid = i.inhrelid
+         WHERE i.inhparent = to_regclass('public.applications')
+         ORDER BY c.relname
+    """)).all()]
+
+
+def _attached(bind, child_index: str) -> bool:
+    return bind.execute(sa.text("""
+        SELECT 1 FROM pg_inherits
+         WHERE inhrelid = to_regclass(:c) AND inhparent = to_regclass(:p)
+    """), {"c": f"public.{child_index}", "p": f"public.{INDEX}"}).first() is not None
+
+
+def _valid(bind, index: str):
+    """None — индекса нет, иначе pg_index.indisvalid."""
+    return bind.execute(sa.text("""
+        SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:i)
+    """), {"i": f"public.{index}"}).scalar()
+
+
+def _create_concurrently(bind, index: str, table: str) -> None:
+    # упавший CONCURRENTLY оставляет невалидный индекс, IF NOT EXISTS его не пересоздаст
+    if _valid(bind, index) is False:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+    op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON {table} {COLUMNS}")
+
+
+def upgrade():
+    bind = op.get_bind()
+    # выходим, только если индекс валиден: родитель ON ONLY остаётся невалидным,
+    # пока к нему не присоединены индексы всех секций (например, после прерванного прогона)
+    if _valid(bind, INDEX):
+        return
+    partitioned = bind.execute(sa.text("""
+        SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('public.applications')
+    """)).first() is not None
+
+    # CONCURRENTLY на секционированную таблицу нельзя: индекс на родителе ON ONLY
+    # (пока невалиден), по секциям — CONCURRENTLY, затем ATTACH; новые секции получат его сами
+    with op.get_context().autocommit_block():
+        if not partitioned:
+            _create_concurrently(bind, INDEX, "applications")
+            return
+        op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON ONLY applications {COLUMNS}")
+        for part in _partitions(bind):
+            child = f"{part}_campaign_kind_created_idx"
+            _create_concurrently(bind, child, part)
+            if not _attached(bind, child):
+                op.execute(f"ALTER INDEX {INDEX} ATTACH PARTITION {child}")
+
+
+def downgrade():
+    # индексы секций уходят вместе с родительским
+    op.execute(f"DROP INDEX IF EXISTS {INDEX}")
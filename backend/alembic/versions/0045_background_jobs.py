@@ -0,0 +1,59 @@
+"""background_jobs: durable job queue (SKIP LOCKED claiming, retries, priorities, run_at)"""
+
+from alembic import op
+
+revision = "0045_background_jobs"
+down_revision = "0044_apps_campaign_kind_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # status: queued -> running -> done | failed (queued снова — ретрай с run_at в будущем)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS background_jobs (
+            id           BIGSERIAL   PRIMARY KEY,
+            kind         TEXT        NOT NULL,
+            payload      JSONB       NOT NULL DEFAULT '{}'::jsonb,
+            status       TEXT        NOT NULL DEFAULT 'queued',
+            priority     SMALLINT    NOT NULL DEFAULT 0,
+            run_at       TIMESTAMPTZ NOT NULL DEFAULT now(),
+            attempts     INTEGER     NOT NULL DEFAULT 0,
+            max_attempts INTEGER     NOT NULL DEFAULT 5,
+            dedup_key    TEXT,
+            locked_by    TEXT,
+            locked_at    TIMESTAMPTZ,
+            last_error   TEXT,
+            created_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+            finished_at  TIMESTAMPTZ,
+            CONSTRAINT background_jobs_status_chk CHECK (status IN ('queued', 'running', 'done', 'failed'))
+        )
+    """)
+    # выборка готовых: по типу, приоритет DESC, run_at — только живые строки
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_background_jobs_ready
+        ON background_jobs (kind, priority DESC, run_at, id)
+        WHERE status = 'queued'
+    """)
+    # счёт занятых слотов типа и поиск зависших
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_background_jobs_running
+        ON background_jobs (kind, locked_at)
+        WHERE status = 'running'
+    """)
+    # одна живая задача на (kind, dedup_key): повторный enqueue возвращает её id
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_background_jobs_dedup
+        ON background_jobs (kind, dedup_key)
+        WHERE dedup_key IS NOT NULL AND status IN ('queued', 'running')
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_background_jobs_finished
+        ON background_jobs (finished_at)
+        WHERE status IN ('done', 'failed')
+    """)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS background_jobs")
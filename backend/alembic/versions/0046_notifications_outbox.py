@@ -0,0 +1,35 @@
+"""notifications: Telegram outbox columns (payload, chat_id, attempts) and per-user ordering index"""
+
+from alembic import op
+
+revision = "0046_notifications_outbox"
+down_revision = "0045_background_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # payload: параметры sendMessage (reply_markup, parse_mode), у рассылок — курсор и счётчики;
+    # chat_id — адресат без строки users; attempts — неудачные попытки (ретраи с backoff)
+    op.execute("""
+        ALTER TABLE notifications
+          ADD COLUMN IF NOT EXISTS payload  JSONB,
+          ADD COLUMN IF NOT EXISTS chat_id  BIGINT,
+          ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0
+    """)
+    # порядок в чате: более ранние живые сообщения пользователя (в работе или на ретрае)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_notifications_user_live
+        ON notifications (user_id, id)
+        WHERE status IN ('pending', 'queued') AND scope = 'user'
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_notifications_user_live")
+    op.execute("""
+        ALTER TABLE notifications
+          DROP COLUMN IF EXISTS attempts,
+          DROP COLUMN IF EXISTS chat_id,
+          DROP COLUMN IF EXISTS payload
+    """)
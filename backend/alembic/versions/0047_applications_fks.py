@@ -0,0 +1,55 @@
+"""applications: restore foreign keys lost by the 0041 partition swap; applications_dedup -> users"""
+
+from alembic import op
+
+revision = "0047_applications_fks"
+down_revision = "0046_notifications_outbox"
+branch_labels = None
+depends_on = None
+
+# (таблица, имя, определение); до исправления 0041 swap удалял их вместе с applications_old
+_FKS = [
+    ("applications", "applications_user_id_fkey",
+     "FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE"),
+    ("applications", "applications_campaign_fk",
+     "FOREIGN KEY (campaign_id) REFERENCES campaigns(id) ON DELETE SET NULL"),
+    ("applications", "applications_cover_letter_id_fkey",
+     "FOREIGN KEY (cover_letter_id) REFERENCES cover_letters(id)"),
+    ("applications_dedup", "applications_dedup_user_fk",
+     "FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE"),
+]
+
+
+def _add_fk(table: str, name: str, defn: str) -> None:
+    op.execute(f"""
+        DO $$
+        BEGIN
+          IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                          WHERE conname = '{name}' AND conrelid = '{table}'::regclass) THEN
+            ALTER TABLE {table} ADD CONSTRAINT {name} {defn};
+          END IF;
+        END $$;
+    """)
+
+
+def upgrade():
+    # висячие ссылки, накопившиеся без FK, — так, как их обработал бы сам FK
+    op.execute("DELETE FROM applications a WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = a.user_id)")
+    op.execute("DELETE FROM applications_dedup d WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = d.user_id)")
+    op.execute("""
+        UPDATE applications a SET campaign_id = NULL
+         WHERE a.campaign_id IS NOT NULL
+           AND NOT EXISTS (SELECT 1 FROM campaigns c WHERE c.id = a.campaign_id)
+    """)
+    op.execute("""
+        UPDATE applications a SET cover_letter_id = NULL
+         WHERE a.cover_letter_id IS NOT NULL
+           AND NOT EXISTS (SELECT 1 FROM cover_letters cl WHERE cl.id = a.cover_letter_id)
+    """)
+    for table, name, defn in _FKS:
+        _add_fk(table, name, defn)
+
+
+def downgrade():
+    # FK applications — часть схемы до 0041, снимаем только добавленный здесь dedup -> users
+    op.execute("ALTER TABLE applications_dedup DROP CONSTRAINT IF EXISTS applications_dedup_user_fk")
@@ -0,0 +1,79 @@
+"""metrics.user_applied: per-user count of queued/sent applications for the funnel (applied_20)"""
+
+from alembic import op
+
+revision = "0048_user_applied_counts"
+down_revision = "0047_applications_fks"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 1) Счётчик на пользователя: заявки в статусах queued/sent — то же правило,
+    #    что и в бывшем GROUP BY user_id HAVING COUNT(*) >= 20 в refresh_funnel
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS metrics.user_applied (
+            user_id    BIGINT      PRIMARY KEY,
+            applied    INTEGER     NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION applications_user_applied()
+        RETURNS TRIGGER AS $$
+        DECLARE
+          old_in boolean := false;
+          new_in boolean := false;
+        BEGIN
+          IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            old_in := OLD.status IN ('queued', 'sent');
+          END IF;
+          IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            new_in := NEW.status IN ('queued', 'sent');
+          END IF;
+
+          IF TG_OP = 'UPDATE' THEN
+            IF OLD.user_id = NEW.user_id AND old_in = new_in THEN
+              RETURN NULL;
+            END IF;
+          END IF;
+
+          IF old_in THEN
+            UPDATE metrics.user_applied
+               SET applied = GREATEST(applied - 1, 0), updated_at = now()
+             WHERE user_id = OLD.user_id;
+          END IF;
+          IF new_in THEN
+            INSERT INTO metrics.user_applied (user_id, applied)
+            VALUES (NEW.user_id, 1)
+            ON CONFLICT (user_id)
+            DO UPDATE SET applied = metrics.user_applied.applied + 1, updated_at = now();
+          END IF;
+          RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # 2) Триггер и бэкфилл под одной блокировкой, чтобы не потерять вставки между ними
+    op.execute("LOCK TABLE applications IN SHARE ROW EXCLUSIVE MODE;")
+    op.execute("""
+        DROP TRIGGER IF EXISTS trg_applications_user_applied ON applications;
+        CREATE TRIGGER trg_applications_user_applied
+        AFTER INSERT OR DELETE OR UPDATE OF status, user_id ON applications
+        FOR EACH ROW EXECUTE FUNCTION applications_user_applied();
+    """)
+    op.execute("""
+        INSERT INTO metrics.user_applied (user_id, applied)
+        SELECT user_id, COUNT(*)::int
+          FROM applications
+         WHERE status IN ('queued', 'sent')
+         GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET applied = EXCLUDED.applied, updated_at = now();
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_applications_user_applied ON applications;")
+    op.execute("DROP FUNCTION IF EXISTS applications_user_applied();")
+    op.execute("DROP TABLE IF EXISTS metrics.user_applied;")
@@ -17,7 +17,7 @@ V1_MODULES = [
     "hh_resumes", "saved_requests", "auto_responses", "auto",
     "cover_letters", "stats", "admin_subscriptions", "admin_applications", "admin_auto",
     "admin_analytics", "admin_notifications", "admin_tariffs", "admin_users", "admin_logs", "hh_webhook",
-    "quota", "campaigns",
+    "quota", "campaigns", "hh_dictionaries",
 ]
 
 def _include_if_ok(mod_name: str) -> None:
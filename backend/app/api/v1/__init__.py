@@ -1,4 +1,2 @@
 # backend/app/api/v1/__init__.py
-from . import users, payments_nemiling, hh_auth, applications
-
-__all__ = ["users", "payments_nemiling", "hh_auth", "applications"]
+# роутеры подключает app/api/router.py (по списку, с пропуском сломанных) — пакет сам ничего не импортирует
@@ -1,36 +1,22 @@
 # backend/app/api/v1/admin_applications.py
 from fastapi import APIRouter, Query
 from typing import Optional
-import os, socket
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine.url import make_url
+from sqlalchemy import text
+from app.db import read_engine
+from app.services import keyset, list_totals
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
-def _build_sync_dsn() -> str:
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if not dsn:
-        raise RuntimeError("No DATABASE_URL")
-    dsn = dsn.replace("postgresql+asyncpg://", "postgresql+psycopg2://", 1)\
-             .replace("postgresql://",          "postgresql+psycopg2://", 1)
-    try:
-        host = make_url(dsn).host or ""
-        if host:
-            socket.gethostbyname(host)  # ensure resolvable
-    except Exception:
-        pass
-    return dsn
-
-_engine = create_engine(_build_sync_dsn(), pool_pre_ping=True, future=True)
-
-# --- Вычисление статуса по последнему событию из логов ---
+# --- Статус по последнему событию HH (колонки состояния на applications) ---
 STATUS_EXPR = """
 CASE
-  WHEN ll.event IN ('viewed','resume_viewed','seen','read') THEN 'viewed'
-  WHEN ll.event IN ('declined','rejected','denied','failed') THEN 'declined'
-  WHEN ll.event IN ('invited','invite','offer')            THEN 'invited'
-  WHEN a.status = 'error'                                  THEN 'error'
-  WHEN a.status = 'sent'                                   THEN 'sent'
+  WHEN a.declined_at IS NOT NULL
+   AND a.declined_at >= COALESCE(GREATEST(a.invited_at, a.viewed_at), a.declined_at) THEN 'declined'
+  WHEN a.invited_at IS NOT NULL
+   AND a.invited_at  >= COALESCE(a.viewed_at, a.invited_at)                         THEN 'invited'
+  WHEN a.viewed_at IS NOT NULL                                                      THEN 'viewed'
+  WHEN a.status = 'error'                                                           THEN 'error'
+  WHEN a.status = 'sent'                                                            THEN 'sent'
   ELSE COALESCE(a.status, 'sent')
 END
 """
@@ -42,18 +28,17 @@ def admin_list_applications(
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
     sort: str = Query("-id", description="id|-id|date|-date"),
+    cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+    exact_total: bool = Query(False, description="точный count вместо кэша/оценки"),
 ):
-    if sort == "id":
-        sort_sql = "a.id ASC"
-    elif sort == "-id":
-        sort_sql = "a.id DESC"
-    elif sort == "date":
-        sort_sql = "a.created_at ASC"
-    else:
-        sort_sql = "a.created_at DESC"
+    # ключ keyset-пагинации заканчивается id — порядок стабилен при равных датах
+    keys = ["a.id"] if sort in ("id", "-id") else ["a.created_at", "a.id"]
+    desc = sort not in ("id", "date")
+    sort_sql = keyset.order_by(keys, desc=desc)
 
     where_parts = ["1=1"]
-    params = {"limit": limit, "offset": offset}
+    # offset — режим совместимости, при cursor не используется
+    params = {"limit": limit + 1, "offset": 0 if cursor else offset}
 
     if q:
         where_parts.append("""
@@ -71,18 +56,14 @@ def admin_list_applications(
         where_parts.append(f"({STATUS_EXPR}) = :st")
         params["st"] = status
 
+    count_where_sql = " AND ".join(where_parts)
+    ks_sql, ks_params = keyset.after(keys, cursor, desc=desc)
+    if ks_sql:
+        where_parts.append(ks_sql)
+        params.update(ks_params)
     where_sql = " AND ".join(where_parts)
 
     sql = f"""
-    WITH last_log AS (
-      SELECT l.application_id, l.event
-      FROM applications_log l
-      JOIN (
-        SELECT application_id, MAX(created_at) AS mx
-        FROM applications_log
-        GROUP BY application_id
-      ) m ON m.application_id = l.application_id AND m.mx = l.created_at
-    )
     SELECT
       a.id                                        AS app_id,
       u.id                                        AS user_id,
@@ -95,7 +76,6 @@ def admin_list_applications(
       {STATUS_EXPR}                               AS eff_status
     FROM applications a
     JOIN users u ON u.id = a.user_id
-    LEFT JOIN last_log ll ON ll.application_id = a.id
     LEFT JOIN LATERAL (
       SELECT title
       FROM resumes rr
@@ -109,19 +89,9 @@ def admin_list_applications(
     """
 
     total_sql = f"""
-    WITH last_log AS (
-      SELECT l.application_id, l.event
-      FROM applications_log l
-      JOIN (
-        SELECT application_id, MAX(created_at) AS mx
-        FROM applications_log
-        GROUP BY application_id
-      ) m ON m.application_id = l.application_id AND m.mx = l.created_at
-    )
     SELECT COUNT(*)
     FROM applications a
     JOIN users u ON u.id = a.user_id
-    LEFT JOIN last_log ll ON ll.application_id = a.id
     LEFT JOIN LATERAL (
       SELECT title
       FROM resumes rr
@@ -129,16 +99,24 @@ def admin_list_applications(
       ORDER BY rr.updated_at DESC NULLS LAST
       LIMIT 1
     ) r ON TRUE
-    WHERE {where_sql}
+    WHERE {count_where_sql}
     """
 
-    with _engine.begin() as conn:
-        rows  = conn.execute(text(sql), params).fetchall()
-        total = conn.execute(text(total_sql), params).scalar() or 0
+    bind = read_engine(__name__)
+    with bind.begin() as conn:
+        rows  = conn.execute(text(sql), params).mappings().all()
+        # без фильтра — оценка по статистике секций applications
+        total, exact = list_totals.total(
+            ("admin_applications", q or "", status or ""),
+            lambda: conn.execute(text(total_sql), params).scalar(),
+            exact=exact_total,
+            estimate=None if (q or status) else (lambda: list_totals.reltuples_estimate(bind, "applications")),
+        )
+    rows, next_cursor = keyset.page(rows, limit, ["app_id"] if len(keys) == 1 else ["created_at", "app_id"])
 
     items = []
     for row in rows:
-        app_id, user_id, tg_id, user_name, created_at, resume_title, vacancy_code, company_name, eff_status = row
+        app_id, user_id, tg_id, user_name, created_at, resume_title, vacancy_code, company_name, eff_status = row.values()
         items.append({
             "appId":   int(app_id),
             "userId":  int(user_id),
@@ -151,4 +129,5 @@ def admin_list_applications(
             "status":   eff_status or "sent",
         })
 
-    return {"ok": True, "items": items, "limit": limit, "offset": offset, "total": total}
+    return {"ok": True, "items": items, "limit": limit, "offset": offset, "total": total,
+            "exact": exact, "next_cursor": next_cursor}
@@ -2,9 +2,9 @@
 from __future__ import annotations
 from fastapi import APIRouter, Query, HTTPException
 from typing import Optional, Any
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine.url import make_url
-import os, socket, re
+from sqlalchemy import text
+from app.db import engine
+import re
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -16,30 +16,7 @@ class AdminAutoUpdate(BaseModel):
     run_at: Optional[str] = None  # формат "HH:MM"
     name: Optional[str] = None
 
-def _build_sync_dsn() -> str:
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if not dsn:
-        try:
-            from app.core.config import settings
-            dsn = (getattr(settings, "database_url", "") or "").strip()
-        except Exception:
-            dsn = ""
-    if not dsn:
-        raise RuntimeError("No DATABASE_URL found")
-
-    # на случай asyncpg → psycopg2
-    dsn = dsn.replace("postgresql+asyncpg://", "postgresql+psycopg2://", 1).replace("postgresql://", "postgresql+psycopg2://", 1)
-
-    try:
-        url = make_url(dsn)
-        host = (url.host or "")
-        if host and not os.path.exists("/.dockerenv"):
-            socket.gethostbyname(host)
-    except Exception:
-        pass
-    return dsn
-
-_engine = create_engine(_build_sync_dsn(), pool_pre_ping=True, future=True)
+_engine = engine
 
 def _norm_status(s: Optional[str]) -> str:
     s = (s or "").strip().lower()
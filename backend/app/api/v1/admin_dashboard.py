@@ -1,9 +1,11 @@
 # backend/app/api/v1/admin_dashboard.py
 from fastapi import APIRouter
-import os, socket, re, datetime as dt
-import psycopg2
+import datetime as dt
 from psycopg2 import errors
 
+from app.db import pg_conn, read_engine
+from app.services.limits import TZ_MSK, today_bounds_msk
+
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 import datetime as dt
@@ -31,9 +33,8 @@ def chart_registrations(from_date: str | None = None, to_date: str | None = None
     - Плюс 'total_all_time' для «в общем».
     """
     try:
-        dsn = _dsn_pg()
         f, t = _date_range(from_date, to_date)
-        with psycopg2.connect(dsn) as conn:
+        with pg_conn(read_engine(__name__)) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -61,12 +62,11 @@ def chart_registrations(from_date: str | None = None, to_date: str | None = None
 def chart_active_subscribers(from_date: str | None = None, to_date: str | None = None):
     """
     Активные подписчики по дням за указанный диапазон (по умолчанию последние 30 дней).
-    Использует VIEW metrics.active_subscribers_daily.
+    Читает роллап metrics.active_subscribers_daily (services/metrics_rollup.py).
     """
     try:
-        dsn = _dsn_pg()
         f, t = _date_range(from_date, to_date)
-        with psycopg2.connect(dsn) as conn:
+        with pg_conn(read_engine(__name__)) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -94,8 +94,7 @@ def chart_funnel_alltime():
     visited → hh_connected → applied_20 → subscribed
     """
     try:
-        dsn = _dsn_pg()
-        with psycopg2.connect(dsn) as conn:
+        with pg_conn(read_engine(__name__)) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -113,30 +112,6 @@ def chart_funnel_alltime():
         return {"ok": False, "error": str(e), "steps": []}
 # ====== /CHART ENDPOINTS ======
 
-def _dsn_pg() -> str:
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if not dsn:
-        try:
-            from app.core.config import settings
-            dsn = (getattr(settings, "database_url", "") or "").strip()
-        except Exception:
-            pass
-    if not dsn:
-        raise RuntimeError("No DATABASE_URL found")
-    if dsn.startswith("postgresql+psycopg2://"):
-        dsn = dsn.replace("postgresql+psycopg2://", "postgresql://", 1)
-    if dsn.startswith("postgresql+asyncpg://"):
-        dsn = dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
-    # локальная разработка вне Docker: пробрасываем порт хоста
-    if not os.path.exists("/.dockerenv"):
-        try:
-            socket.getaddrinfo("db", 5432)
-        except Exception:
-            host = "localhost"
-            port = os.getenv("PGPORT_HOST", "5433")
-            dsn = re.sub(r"@db(?::\d+)?", f"@{host}:{port}", dsn, count=1)
-    return dsn
-
 def _safe_scalar(cur, sql, params=None, default=0):
     try:
         cur.execute(sql, params or {})
@@ -179,22 +154,30 @@ def _safe_timeseries(cur, sql, params=None):
 @router.get("/dashboard")
 def admin_dashboard():
     try:
-        dsn = _dsn_pg()
-        with psycopg2.connect(dsn) as conn:
+        with pg_conn(read_engine(__name__)) as conn:
             with conn.cursor() as cur:
+                # «сегодня»/«вчера» — полуинтервалы суток МСК, чтобы работали индексы по created_at
+                today_start, today_end = today_bounds_msk()
+                yday_start, yday_end = today_bounds_msk(dt.datetime.now(TZ_MSK) - dt.timedelta(days=1))
+
                 # === Заголовочные метрики ===
                 users_total       = _safe_scalar(cur, "SELECT count(*) FROM users")
                 users_new_7d      = _safe_scalar(cur, "SELECT count(*) FROM users WHERE created_at >= now() - interval '7 days'")
-                users_new_today   = _safe_scalar(cur, "SELECT count(*) FROM users WHERE created_at::date = current_date")
+                users_new_today   = _safe_scalar(
+                    cur, "SELECT count(*) FROM users WHERE created_at >= %s AND created_at < %s",
+                    (today_start, today_end),
+                )
                 users_active_24h  = _safe_scalar(cur, "SELECT count(*) FROM users WHERE last_seen_at >= now() - interval '24 hours'")
 
                 applications_total = _safe_scalar(cur, "SELECT count(*) FROM applications")
-                applications_today = _safe_scalar(cur, "SELECT count(*) FROM applications WHERE created_at::date = current_date")
+                applications_today = _safe_scalar(
+                    cur, "SELECT count(*) FROM applications WHERE created_at >= %s AND created_at < %s",
+                    (today_start, today_end),
+                )
                 applications_24h   = _safe_scalar(cur, "SELECT count(*) FROM applications WHERE created_at >= now() - interval '24 hours'")
                                 # === Точки времени для сравнений ===
                 now = dt.datetime.now(dt.timezone.utc)
                 today = dt.date.today()
-                yesterday = today - dt.timedelta(days=1)
                 day_ago = now - dt.timedelta(days=1)
                 two_days_ago = now - dt.timedelta(days=2)
                 month_ago_date = today - dt.timedelta(days=30)
@@ -209,7 +192,10 @@ def admin_dashboard():
                 )
 
                 # 2) Новые сегодня VS вчера
-                cur.execute("SELECT COUNT(*) FROM users WHERE created_at::date = %s", (yesterday,))
+                cur.execute(
+                    "SELECT COUNT(*) FROM users WHERE created_at >= %s AND created_at < %s",
+                    (yday_start, yday_end),
+                )
                 new_yesterday = int(cur.fetchone()[0] or 0)
                 new_today_vs_yday_pct = (
                     ((users_new_today - new_yesterday) / new_yesterday * 100.0)
@@ -304,7 +290,7 @@ def admin_dashboard():
                     agg AS (
                       SELECT created_at::date AS d, count(*) AS cnt
                       FROM users
-                      WHERE created_at::date >= current_date - interval '29 days'
+                      WHERE created_at >= current_date - interval '29 days'
                       GROUP BY 1
                     )
                     SELECT d, COALESCE(cnt,0)
@@ -328,7 +314,7 @@ def admin_dashboard():
                         agg AS (
                           SELECT created_at::date AS d, count(*) AS cnt
                           FROM subscriptions
-                          WHERE created_at::date >= current_date - interval '29 days'
+                          WHERE created_at >= current_date - interval '29 days'
                                 AND status = 'active'
                           GROUP BY 1
                         )
@@ -345,7 +331,7 @@ def admin_dashboard():
                         agg AS (
                           SELECT created_at::date AS d, count(*) AS cnt
                           FROM payments
-                          WHERE created_at::date >= current_date - interval '29 days'
+                          WHERE created_at >= current_date - interval '29 days'
                                 AND status = 'paid'
                           GROUP BY 1
                         )
@@ -1,41 +1,13 @@
 # backend/app/api/v1/admin_listings.py
 from fastapi import APIRouter, Query, HTTPException
-import os, socket, re, psycopg2
 from psycopg2.extras import RealDictCursor
 import csv, io
 from fastapi.responses import StreamingResponse
 
-router = APIRouter(prefix="/admin", tags=["admin"])
-
-
-def _dsn_pg() -> str:
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if not dsn:
-        try:
-            from app.core.config import settings
-            dsn = (getattr(settings, "database_url", "") or "").strip()
-        except Exception:
-            pass
-    if not dsn:
-        raise RuntimeError("No DATABASE_URL found")
-
-    # нормализуем схему
-    if dsn.startswith("postgresql+psycopg2://"):
-        dsn = dsn.replace("postgresql+psycopg2://", "postgresql://", 1)
-    if dsn.startswith("postgresql+asyncpg://"):
-        dsn = dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
-
-    # локальная подмена хоста/порта, если нет docker-сети
-    if not os.path.exists("/.dockerenv"):
-        try:
-            socket.getaddrinfo("db", 5432)
-        except Exception:
-            host = "localhost"
-            port = os.getenv("PGPORT_HOST", "5433")
-            dsn = re.sub(r"@db(?::\d+)?", f"@{host}:{port}", dsn, count=1)
-
-    return dsn
+from app.db import pg_conn, read_engine
+from app.services import keyset, list_totals
 
+router = APIRouter(prefix="/admin", tags=["admin"])
 
 # ====== USERS LIST (для таблицы «Пользователи») ======
 @router.get("/users")
@@ -43,6 +15,8 @@ def list_users(
     q: str = "",
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы"),
+    exact_total: bool = Query(False, description="точный count вместо кэша/оценки"),
 ):
     """
     Возвращает поля:
@@ -50,23 +24,35 @@ def list_users(
       created_at, last_seen_at,
       hh_account_id, hh_account_name,
       name (вычисляемое), hh_connected (bool)
+    Пагинация: cursor (keyset по id) или offset (совместимость).
     """
-    dsn = _dsn_pg()
 
-    where = ""
-    params = {"limit": limit, "offset": offset}
+    conds = []
+    params = {"limit": limit + 1, "offset": 0 if cursor else offset}
     if q:
-        where = """
-        WHERE (
+        conds.append("""
+        (
             COALESCE(u.username,'') ILIKE %(q)s OR
             COALESCE(u.email,'')    ILIKE %(q)s OR
             COALESCE(u.hh_account_name,'') ILIKE %(q)s OR
             CAST(u.tg_id AS TEXT) ILIKE %(q)s
         )
-        """
+        """)
         params["q"] = f"%{q}%"
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    ks_sql, ks_params = keyset.after(["u.id"], cursor, paramstyle="pyformat")
+    params.update(ks_params)
+    page_where = ("WHERE " + " AND ".join(conds + [ks_sql])) if (conds or ks_sql) else ""
 
+    # сначала страница пользователей по индексу, агрегаты — только для неё
     sql = f"""
+        WITH pg AS (
+          SELECT u.*
+          FROM users u
+          {page_where}
+          ORDER BY u.id DESC
+          LIMIT %(limit)s OFFSET %(offset)s
+        )
         SELECT
             u.id,
             u.tg_id,
@@ -89,45 +75,45 @@ def list_users(
             COALESCE(pp.total_cents, 0)::bigint / 100.0       AS revenue_total_rub,
             COALESCE(rb.balance_cents, 0)::bigint / 100.0     AS referral_balance_rub,
             COALESCE(ap.applications_total, 0)::bigint        AS applications_total
-        FROM users u
+        FROM pg u
         LEFT JOIN hh_tokens ht ON ht.user_id = u.id
-        LEFT JOIN (
-          SELECT user_id, COUNT(*)::bigint AS subs_count_total
-          FROM subscriptions
-          GROUP BY user_id
-        ) ps ON ps.user_id = u.id
-        LEFT JOIN (
-          SELECT user_id, SUM(amount_cents)::bigint AS total_cents
-          FROM payments
-          GROUP BY user_id
-        ) pp ON pp.user_id = u.id
-        LEFT JOIN (
-          SELECT user_id, balance_cents
-          FROM referral_balances
-        ) rb ON rb.user_id = u.id
-        LEFT JOIN (
-          SELECT user_id, COUNT(*)::bigint AS applications_total
-          FROM applications
-          GROUP BY user_id
-        ) ap ON ap.user_id = u.id
-        {where}
+        LEFT JOIN LATERAL (
+          SELECT COUNT(*)::bigint AS subs_count_total
+          FROM subscriptions WHERE user_id = u.id
+        ) ps ON TRUE
+        LEFT JOIN LATERAL (
+          SELECT SUM(amount_cents)::bigint AS total_cents
+          FROM payments WHERE user_id = u.id
+        ) pp ON TRUE
+        LEFT JOIN referral_balances rb ON rb.user_id = u.id
+        LEFT JOIN LATERAL (
+          SELECT COUNT(*)::bigint AS applications_total
+          FROM applications WHERE user_id = u.id
+        ) ap ON TRUE
         ORDER BY u.id DESC
-        LIMIT %(limit)s OFFSET %(offset)s
     """
     cnt = f"SELECT count(*) FROM users u {where}"
 
-    with psycopg2.connect(dsn) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(cnt, params)
-        total = int(cur.fetchone()["count"])
+    bind = read_engine(__name__)
+    with pg_conn(bind) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        def _count() -> int:
+            cur.execute(cnt, params)
+            return int(cur.fetchone()["count"])
+
+        # без фильтра — оценка по статистике, с фильтром — count с коротким кэшем
+        total, exact = list_totals.total(
+            ("admin_listings.users", q), _count, exact=exact_total,
+            estimate=None if q else (lambda: list_totals.reltuples_estimate(bind, "users")),
+        )
         cur.execute(sql, params)
-        items = cur.fetchall()
+        items, next_cursor = keyset.page(cur.fetchall(), limit, ["id"])
 
-    return {"ok": True, "items": items, "limit": limit, "offset": offset, "total": total}
+    return {"ok": True, "items": items, "limit": limit, "offset": offset, "total": total,
+            "exact": exact, "next_cursor": next_cursor}
 
 # ====== USER PROFILE (страница/модалка профиля) ======
 @router.get("/users/{user_id}")
 def get_user(user_id: int):
-    dsn = _dsn_pg()
     sql = """
         SELECT
             u.id, u.tg_id, u.username, u.email,
@@ -146,7 +132,7 @@ def get_user(user_id: int):
         WHERE u.id = %(id)s
         LIMIT 1
     """
-    with psycopg2.connect(dsn) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+    with pg_conn(read_engine(__name__)) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
         cur.execute(sql, {"id": user_id})
         row = cur.fetchone()
     if not row:
@@ -177,8 +163,7 @@ def update_user(user_id: int, payload: dict):
     sets = ", ".join([f"{k} = %({k})s" for k in data.keys()])
     data["id"] = user_id
 
-    dsn = _dsn_pg()
-    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute(f"UPDATE users SET {sets} WHERE id = %(id)s", data)
         conn.commit()
 
@@ -193,7 +178,6 @@ def users_export_csv(
     - все базовые поля, UTM (utm_source/utm_medium/utm_campaign),
     - агрегаты: subs_count_total, revenue_total_rub.
     """
-    dsn = _dsn_pg()
 
     where = ""
     params = {}
@@ -254,7 +238,7 @@ def users_export_csv(
         return ("'" + s) if s[:1] in ("=", "+", "-", "@") else s
 
     def generate_rows():
-        with psycopg2.connect(dsn) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with pg_conn(read_engine(__name__)) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(sql, params)
             # ВАЖНО: заголовок должен соответствовать SELECT
             header = [
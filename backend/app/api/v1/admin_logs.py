@@ -1,45 +1,19 @@
 # backend/app/api/v1/admin_logs.py
 from __future__ import annotations
 from fastapi import APIRouter, HTTPException, Query
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine.url import make_url
-import os, socket
+from sqlalchemy import text
+from app.db import engine
+from app.services import schema_registry
 
 router = APIRouter(prefix="/admin/logs", tags=["admin:logs"])
 
-def _build_sync_dsn() -> str:
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if not dsn:
-        try:
-            from app.core.config import import_settings as _imp
-            settings = _imp()
-            dsn = (getattr(settings, "database_url", "") or "").strip()
-        except Exception:
-            pass
-    if not dsn:
-        raise RuntimeError("No DATABASE_URL found")
-    dsn = dsn.replace("postgresql+asyncpg://", "postgresql+psycopg2://", 1)\
-             .replace("postgresql://", "postgresql+psycopg2://", 1)
-    try:
-        url = make_url(dsn)
-        host = (url.host or "")
-        if host and not os.path.exists("/.dockerenv"):
-            socket.gethostbyname(host)
-    except Exception:
-        pass
-    return dsn
-
-_engine = create_engine(_build_sync_dsn(), pool_pre_ping=True, future=True)
+_engine = engine
 
 # ---- helpers ---------------------------------------------------------------
 
 def _table_cols(conn, schema: str, table: str) -> set[str]:
-    rows = conn.execute(text("""
-      SELECT column_name
-      FROM information_schema.columns
-      WHERE table_schema=:s AND table_name=:t
-    """), {"s": schema, "t": table}).scalars().all()
-    return {r for r in rows}
+    # реестр схемы кэширует только public
+    return set(schema_registry.columns(table, conn)) if schema == "public" else set()
 
 def _pick(cols: set[str], *candidates: str) -> str | None:
     for c in candidates:
@@ -4,40 +4,17 @@ from __future__ import annotations
 from fastapi import APIRouter, HTTPException, Query, Body
 from typing import Optional
 from pydantic import BaseModel
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine.url import make_url
-import os, socket
+from sqlalchemy import text
+from app.db import engine
+from app.services import keyset, tg_outbox
 from datetime import datetime
 
 router = APIRouter(prefix="/admin/notifications", tags=["admin:notifications"])
 
-def _build_sync_dsn() -> str:
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if not dsn:
-        try:
-            from app.core.config import import_settings as _imp
-            settings = _imp()
-            dsn = (getattr(settings, "database_url", "") or "").strip()
-        except Exception:
-            pass
-    if not dsn:
-        raise RuntimeError("No DATABASE_URL found")
-
-    dsn = dsn.replace("postgresql+asyncpg://", "postgresql+psycopg2://", 1)\
-             .replace("postgresql://", "postgresql+psycopg2://", 1)
-    try:
-        url = make_url(dsn)
-        host = (url.host or "")
-        if host and not os.path.exists("/.dockerenv"):
-            socket.gethostbyname(host)
-    except Exception:
-        pass
-    return dsn
-
-_engine = create_engine(_build_sync_dsn(), pool_pre_ping=True, future=True)
-
-# поддерживаем сегменты
-SEGMENTS = {"premium", "no_subscription", "active", "auto_responses", "ai_responses"}
+_engine = engine
+
+# поддерживаем сегменты — те, что умеет рассылать tg_outbox
+SEGMENTS = {s.split(":", 1)[1] for s in tg_outbox.AUDIENCES if s.startswith("segment:")}
 
 # ---------- модели ввода ----------
 class CreateNotification(BaseModel):
@@ -53,29 +30,38 @@ def admin_notifications_list(
     offset: int = Query(0, ge=0),
     q: str = "",
     status: str = "all",
+    cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
 ):
     where = ["1=1"]
-    params = {"limit": limit, "offset": offset}
+    # cursor — keyset по (created_at, id); offset — режим совместимости
+    params = {"limit": limit + 1, "offset": 0 if cursor else offset}
     if q:
         where.append("lower(n.text) like :q")
         params["q"] = f"%{q.lower()}%"
     if status and status != "all":
         where.append("n.status = :status")
         params["status"] = status
+    ks_sql, ks_params = keyset.after(["n.created_at", "n.id"], cursor)
+    if ks_sql:
+        where.append(ks_sql)
+        params.update(ks_params)
 
     sql = f"""
     select
       n.id, n.user_id, n.scope, n.text, n.scheduled_at, n.sent_at, n.status, n.error,
+      n.created_at,
       u.tg_id, coalesce(u.hh_account_name, u.username, u.email, u.id::text) as user_name
     from notifications n
     left join users u on u.id = n.user_id
     where {' and '.join(where)}
-    order by n.created_at desc
+    order by n.created_at desc, n.id desc
     limit :limit offset :offset
     """
     with _engine.begin() as conn:
         rows = conn.execute(text(sql), params).mappings().all()
-    return {"items": rows, "limit": limit, "offset": offset, "count": len(rows)}
+    rows, next_cursor = keyset.page(rows, limit, ["created_at", "id"])
+    return {"items": rows, "limit": limit, "offset": offset, "count": len(rows),
+            "next_cursor": next_cursor}
 
 # ---------- create ----------
 @router.post("")
@@ -167,67 +153,16 @@ def resolve_recipients(conn, scope: str, user_id: int | None):
     Возвращает список tg_id по значению scope.
     scope: 'all' | 'user' | 'segment:<key>'
     """
-    if scope == "all":
-        rows = conn.execute(text("SELECT tg_id FROM users WHERE tg_id IS NOT NULL"))
-        return [r.tg_id for r in rows]
-
     if scope == "user":
         if not user_id:
             return []
         row = conn.execute(text("SELECT tg_id FROM users WHERE id=:uid"), {"uid": user_id}).first()
         return [row.tg_id] if row and row.tg_id else []
 
-    if scope and scope.startswith("segment:"):
-        key = scope.split(":", 1)[1]
-        if key not in SEGMENTS:
-            return []
-
-        if key == "premium":
-            sql = """
-              SELECT u.tg_id
-              FROM users u
-              JOIN subscriptions s ON s.user_id = u.id
-              WHERE u.tg_id IS NOT NULL AND s.status = 'active'
-            """
-            rows = conn.execute(text(sql))
-            return [r.tg_id for r in rows]
-
-        if key == "no_subscription":
-            sql = """
-              SELECT u.tg_id
-              FROM users u
-              LEFT JOIN subscriptions s ON s.user_id = u.id AND s.status = 'active'
-              WHERE u.tg_id IS NOT NULL AND s.user_id IS NULL
-            """
-            rows = conn.execute(text(sql))
-            return [r.tg_id for r in rows]
-
-        if key == "active":
-            sql = """
-              SELECT tg_id FROM users
-              WHERE tg_id IS NOT NULL AND last_seen_at >= now() - INTERVAL '30 days'
-            """
-            rows = conn.execute(text(sql))
-            return [r.tg_id for r in rows]
-
-        if key == "auto_responses":
-            sql = """
-              SELECT u.tg_id
-              FROM users u
-              JOIN auto_responses ar ON ar.user_id = u.id
-              WHERE u.tg_id IS NOT NULL AND ar.active = TRUE
-            """
-            rows = conn.execute(text(sql))
-            return [r.tg_id for r in rows]
-
-        if key == "ai_responses":
-            sql = """
-              SELECT u.tg_id
-              FROM users u
-              JOIN ai_responses_settings a ON a.user_id = u.id
-              WHERE u.tg_id IS NOT NULL AND a.enabled = TRUE
-            """
-            rows = conn.execute(text(sql))
-            return [r.tg_id for r in rows]
+    # 'all' и сегменты — тот же SQL, по которому рассылает tg_outbox
+    sql = tg_outbox.audience_sql(scope or "")
+    if sql:
+        rows = conn.execute(text(sql))
+        return [r.tg_id for r in rows]
 
     return []
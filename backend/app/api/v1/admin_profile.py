@@ -1,29 +1,16 @@
 # backend/app/api/v1/admin_profile.py
 from fastapi import APIRouter, HTTPException, Query
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine.url import make_url
+from sqlalchemy import text
+from app.db import engine
+from app.services.tariff_cache import notify_tariff_changed
+from app.services import keyset, list_totals, schema_registry
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
-import os, socket
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
-def _build_sync_dsn() -> str:
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if not dsn:
-        raise RuntimeError("No DATABASE_URL found")
-    dsn = dsn.replace("postgresql+asyncpg://","postgresql+psycopg2://").replace("postgresql://","postgresql+psycopg2://",1)
-    if not os.path.exists("/.dockerenv"):
-        try:
-            url = make_url(dsn)
-            host = (url.host or "")
-            socket.gethostbyname(host) 
-        except Exception:
-            pass
-    return dsn
-
-_engine = create_engine(_build_sync_dsn(), pool_pre_ping=True, future=True)
+_engine = engine
 
 
 @router.get("/users")
@@ -31,40 +18,28 @@ def admin_users_list(
     search: str = "",
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+    exact_total: bool = Query(False, description="точный count вместо кэша/оценки"),
 ):
-    where = ""
-    params = {"limit": limit, "offset": offset}
+    conds = []
+    # cursor — keyset по (created_at, id); offset — режим совместимости
+    params = {"limit": limit + 1, "offset": 0 if cursor else offset}
     if search:
-        where = """
-            WHERE (u.username ILIKE :q OR u.email ILIKE :q OR CAST(u.tg_id AS TEXT) ILIKE :q)
-        """
+        conds.append("(u.username ILIKE :q OR u.email ILIKE :q OR CAST(u.tg_id AS TEXT) ILIKE :q)")
         params["q"] = f"%{search}%"
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    ks_sql, ks_params = keyset.after(["u.created_at", "u.id"], cursor)
+    params.update(ks_params)
+    page_where = ("WHERE " + " AND ".join(conds + [ks_sql])) if (conds or ks_sql) else ""
 
+    # сначала страница пользователей, агрегаты — только по ней
     sql = f"""
-    WITH
-    apps AS (
-    SELECT user_id, COUNT(*) AS total
-    FROM applications
-    GROUP BY user_id
-    ),
-    autos AS (
-    SELECT user_id,
-            COUNT(*) AS total,
-            BOOL_OR(active) AS any_active
-    FROM auto_responses
-    GROUP BY user_id
-    ),
-    subs AS (
-    SELECT DISTINCT ON (s.user_id)
-            s.user_id,
-            s.expires_at,
-            t.title AS tariff_title
-    FROM subscriptions s
-    LEFT JOIN tariffs t ON t.id = s.tariff_id
-    WHERE s.status = 'active'
-        AND s.started_at <= now()
-        AND s.expires_at  >  now()
-    ORDER BY s.user_id, s.expires_at DESC
+    WITH pg AS (
+    SELECT u.*
+    FROM users u
+    {page_where}
+    ORDER BY u.created_at DESC, u.id DESC
+    LIMIT :limit OFFSET :offset
     )
     SELECT
     u.id,
@@ -86,20 +61,43 @@ def admin_users_list(
     COALESCE(au.any_active, FALSE) AS auto_responses_active,
     COALESCE(s.tariff_title, '')   AS subscription_title,
     s.expires_at                   AS subscription_expires_at
-    FROM users u
+    FROM pg u
     LEFT JOIN referral_balances rb ON rb.user_id = u.id
-    LEFT JOIN apps  a   ON a.user_id  = u.id
-    LEFT JOIN autos au  ON au.user_id = u.id
-    LEFT JOIN subs  s   ON s.user_id  = u.id
+    LEFT JOIN LATERAL (
+    SELECT COUNT(*) AS total
+    FROM applications
+    WHERE user_id = u.id
+    ) a ON TRUE
+    LEFT JOIN LATERAL (
+    SELECT COUNT(*) AS total,
+            BOOL_OR(active) AS any_active
+    FROM auto_responses
+    WHERE user_id = u.id
+    ) au ON TRUE
+    LEFT JOIN LATERAL (
+    SELECT s.expires_at, t.title AS tariff_title
+    FROM subscriptions s
+    LEFT JOIN tariffs t ON t.id = s.tariff_id
+    WHERE s.user_id = u.id
+        AND s.status = 'active'
+        AND s.started_at <= now()
+        AND s.expires_at  >  now()
+    ORDER BY s.expires_at DESC
+    LIMIT 1
+    ) s ON TRUE
     LEFT JOIN hh_tokens ht ON ht.user_id = u.id
-    {where}
-    ORDER BY u.created_at DESC
-    LIMIT :limit OFFSET :offset
+    ORDER BY u.created_at DESC, u.id DESC
     """
 
     with _engine.connect() as conn:
         rows = conn.execute(text(sql), params).mappings().all()
-        total = conn.scalar(text(f"SELECT COUNT(*) FROM users u {where}"), params) or 0
+        total, exact = list_totals.total(
+            ("admin_profile.users", search),
+            lambda: conn.scalar(text(f"SELECT COUNT(*) FROM users u {where}"), params),
+            exact=exact_total,
+            estimate=None if search else (lambda: list_totals.reltuples_estimate(_engine, "users")),
+        )
+    rows, next_cursor = keyset.page(rows, limit, ["registered_at", "id"])
 
     items = []
     for r in rows:
@@ -107,15 +105,11 @@ def admin_users_list(
         d["balance"] = (d.get("balance_cents", 0) or 0) / 100.0
         items.append(d)
 
-    return {"ok": True, "total": int(total), "limit": limit, "offset": offset, "items": items}
+    return {"ok": True, "total": int(total), "exact": exact, "limit": limit, "offset": offset,
+            "items": items, "next_cursor": next_cursor}
 
 def _has_column(conn, table: str, column: str) -> bool:
-    row = conn.execute(text("""
-        SELECT 1 FROM information_schema.columns
-        WHERE table_schema='public' AND table_name=:t AND column_name=:c
-        LIMIT 1
-    """), {"t": table, "c": column}).first()
-    return bool(row)
+    return schema_registry.has_column(table, column, conn)
 
 def _resolve_tariff_id(conn, plan: Optional[str], tariff_id: Optional[int]) -> int:
     if tariff_id is not None:
@@ -354,6 +348,7 @@ def _upsert_subscription(conn, user_id, plan, status, expires_at, tariff_id):
                 "sid": last["id"],
             },
         )
+        notify_tariff_changed(conn, user_id)
         return
 
     conn.execute(
@@ -368,6 +363,7 @@ def _upsert_subscription(conn, user_id, plan, status, expires_at, tariff_id):
             "st":  status,
         },
     )
+    notify_tariff_changed(conn, user_id)
 
 @router.patch("/users/{user_id}")
 def admin_update_user(user_id: int, body: AdminUserPatch):
@@ -439,11 +435,7 @@ def _ensure_admin_comments(conn) -> None:
 def user_applications(user_id: int, limit: int = Query(50, ge=1, le=200), offset: int = Query(0, ge=0)):
     try:
         with _engine.connect() as conn:
-            cols = {r["column_name"] for r in conn.execute(text("""
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_schema='public' AND table_name='applications'
-            """)).mappings().all()}
+            cols = schema_registry.columns("applications", conn)
 
             # title column autodetect
             title_candidates = []
@@ -1,31 +1,22 @@
 from fastapi import APIRouter, Query
-from sqlalchemy import create_engine, text
-import os
+from sqlalchemy import text
+
+from app.db import engine
+from app.services import schema_registry
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 def _engine():
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if dsn.startswith("postgresql+asyncpg://"):
-        dsn = "postgresql+psycopg2://" + dsn.split("://", 1)[1]
-    elif dsn.startswith("postgresql://"):
-        dsn = "postgresql+psycopg2://" + dsn.split("://", 1)[1]
-    return create_engine(dsn, pool_pre_ping=True, future=True)
+    return engine
 
 def _has_column(conn, table: str, col: str) -> bool:
-    sql = """
-    SELECT 1
-    FROM information_schema.columns
-    WHERE table_schema='public' AND table_name=:t AND column_name=:c
-    LIMIT 1
-    """
-    return conn.execute(text(sql), {"t": table, "c": col}).first() is not None
+    return schema_registry.has_column(table, col, conn)
 
 @router.get("/tariffs")
 def admin_list_tariffs():
     """
     Справочник тарифов для админки: id, code, title (+ price_minor, если колонка есть).
-    Без падающих пробных SELECT — только через information_schema.
+    Без падающих пробных SELECT — наличие колонки берём из реестра схемы.
     """
     eng = _engine()
     with eng.connect() as conn:
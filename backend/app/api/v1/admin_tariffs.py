@@ -2,37 +2,12 @@ from __future__ import annotations
 from fastapi import APIRouter, HTTPException, Body
 from pydantic import BaseModel
 from typing import Optional, List
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine.url import make_url
-import os, socket
+from sqlalchemy import text
+from app.db import engine
 
 router = APIRouter(prefix="/admin/tariffs", tags=["admin:tariffs"])
 
-# --- общий sync DSN ---
-def _build_sync_dsn() -> str:
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if not dsn:
-        try:
-            from app.core.config import import_settings as _imp
-            settings = _imp()
-            dsn = (getattr(settings, "database_url", "") or "").strip()
-        except Exception:
-            pass
-    if not dsn:
-        raise RuntimeError("No DATABASE_URL found")
-
-    dsn = dsn.replace("postgresql+asyncpg://", "postgresql+psycopg2://", 1)\
-             .replace("postgresql://", "postgresql+psycopg2://", 1)
-    try:
-        url = make_url(dsn)
-        host = (url.host or "")
-        if host and not os.path.exists("/.dockerenv"):
-            socket.gethostbyname(host)
-    except Exception:
-        pass
-    return dsn
-
-_engine = create_engine(_build_sync_dsn(), pool_pre_ping=True, future=True)
+_engine = engine
 
 # ======= схемы =======
 class Plan(BaseModel):
@@ -3,14 +3,15 @@ from __future__ import annotations
 
 from typing import List, Optional, Literal
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, text, bindparam
-from sqlalchemy.dialects import postgresql as pg
-from datetime import timezone
-from app.services.limits import today_bounds_msk 
+from sqlalchemy import text
+from datetime import datetime, timedelta, timezone
+from app.services.limits import reserve_quota, today_bounds_msk
+from app.services import admission, applications_store
 
-from app.core.config import settings
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import engine, get_async_session
 
 import re
 
@@ -26,8 +27,7 @@ class QueueIn(BaseModel):
     campaign_id: Optional[int] = None 
 # --------- DB helpers ---------
 def _get_conn():
-    eng = create_engine(settings.database_url, pool_pre_ping=True, future=True)
-    return eng.begin()  
+    return engine.begin()
 
 def _get_user_id_by_tg(conn, tg_id: int) -> Optional[int]:
     row = conn.execute(
@@ -36,88 +36,77 @@ def _get_user_id_by_tg(conn, tg_id: int) -> Optional[int]:
     ).fetchone()
     return None if not row else int(row[0])
 
+async def _get_user_id_by_tg_async(db: AsyncSession, tg_id: int) -> Optional[int]:
+    row = (await db.execute(
+        text("SELECT id FROM users WHERE tg_id = :tg"),
+        {"tg": tg_id},
+    )).fetchone()
+    return None if not row else int(row[0])
+
 # --------- API ---------
 @router.post("/hh/applications/queue")
-def queue_applications(payload: QueueIn):
+async def queue_applications(payload: QueueIn, db: AsyncSession = Depends(get_async_session)):
     if not payload.vacancies:
         raise HTTPException(status_code=400, detail="vacancies is empty")
 
-    with _get_conn() as conn:
-        uid = _get_user_id_by_tg(conn, payload.tg_id)
-        if not uid:
-            raise HTTPException(status_code=404, detail="user not found")
-
-        row = conn.execute(text("""
-            SELECT EXISTS(
-                SELECT 1 FROM subscriptions
-                 WHERE user_id=:u
-                   AND status IN ('active','paid')
-                   AND (expires_at IS NULL OR now() < expires_at)
-            ) AS paid
-        """), {"u": uid}).first()
-        daily_cap = 200 if (row and row[0]) else 10
-
-        start_utc, end_utc = today_bounds_msk()
-        used = conn.execute(text("""
-            SELECT COUNT(*)::int
-              FROM applications
-             WHERE user_id = :u
-               AND created_at >= :start_utc
-               AND created_at <  :end_utc
-               AND COALESCE(LOWER(status), '') NOT IN ('canceled','cancelled')
-        """), {"u": uid, "start_utc": start_utc, "end_utc": end_utc}).scalar_one()
-
-        remaining = max(0, min(daily_cap, 200) - used)
-        if remaining <= 0:
-            return {"queued": 0}
-
-        vids = list(map(int, payload.vacancies))[:remaining]
-
-        raw = (payload.cover_letter or "")
-        clean_cl = "" if re.fullmatch(r"\s*(?:-|—)?\s*(?:без\s+сопроводительн(?:ого\s+письма)?\.?)?\s*", raw, flags=re.I) else raw.strip()
-
-        stmt = text("""
-            INSERT INTO applications (user_id, vacancy_id, resume_id, cover_letter, kind, status, campaign_id)
-            SELECT :uid, v, :rid, :cl, :kind, 'queued', :cid
-            FROM unnest(:vids) AS v
-            ON CONFLICT (user_id, vacancy_id)
-            DO UPDATE SET
-                resume_id     = EXCLUDED.resume_id,
-                cover_letter  = EXCLUDED.cover_letter,
-                kind          = EXCLUDED.kind,
-                status        = 'queued',
-                campaign_id   = COALESCE(EXCLUDED.campaign_id, applications.campaign_id),  -- ← удерживаем привязку, если есть
-                error         = NULL,
-                attempt_count = 0,
-                next_try_at   = NULL,
-                created_at    = CASE WHEN applications.created_at < :start_utc THEN now() ELSE applications.created_at END,
-                updated_at    = now()
-            RETURNING (created_at >= :start_utc AND created_at < :end_utc) AS is_today
-        """).bindparams(
-            bindparam("uid"),
-            bindparam("rid"),
-            bindparam("cl"),
-            bindparam("kind"),
-            bindparam("vids", type_=pg.ARRAY(pg.BIGINT)),
-            bindparam("start_utc"),
-            bindparam("end_utc"),
+    uid = await _get_user_id_by_tg_async(db, payload.tg_id)
+    if not uid:
+        raise HTTPException(status_code=404, detail="user not found")
+
+    # admission control: при большом бэклоге auto откладываем или не принимаем (до резерва квоты)
+    vids = list(dict.fromkeys(map(int, payload.vacancies)))
+    snap = await admission.backlog()
+    decision = admission.decide(snap, payload.kind, len(vids))
+    if not decision.admit:
+        raise HTTPException(
+            status_code=429,
+            detail={"reason": "dispatch backlog", **decision.as_dict()},
+            headers={"Retry-After": str(max(decision.eta_sec, 1))},
         )
-
-        res = conn.execute(stmt, {
-            "uid": uid,
-            "rid": payload.resume_id,
-            "cl": clean_cl,
+    next_try_at = (
+        datetime.now(timezone.utc) + timedelta(seconds=decision.defer_sec) if decision.defer_sec else None
+    )
+
+    # резерв квоты держит строку user_daily_usage до commit — параллельные запросы не перебирают лимит
+    granted = await db.run_sync(reserve_quota, uid, len(vids))
+    if granted <= 0:
+        await db.rollback()
+        return {"queued": 0, **decision.as_dict()}
+
+    vids = vids[:granted]
+    start_utc, end_utc = today_bounds_msk()
+
+    raw = (payload.cover_letter or "")
+    clean_cl = "" if re.fullmatch(r"\s*(?:-|—)?\s*(?:без\s+сопроводительн(?:ого\s+письма)?\.?)?\s*", raw, flags=re.I) else raw.strip()
+
+    # дедуп (user_id, vacancy_id) — через applications_dedup (applications секционирована)
+    rows = await db.run_sync(
+        applications_store.upsert, uid, vids,
+        values={
+            "resume_id": payload.resume_id,
+            "cover_letter": clean_cl,
             "kind": payload.kind,
-            "vids": vids,
-            "start_utc": start_utc,
-            "end_utc": end_utc,
-            "cid": payload.campaign_id,
-        })
-        rows = res.fetchall()
-        credited_today = sum(1 for r in rows if bool(r[0])) 
-        conn.commit()
-        return {"queued": int(credited_today)}
-    
+            "status": "queued",
+            "campaign_id": payload.campaign_id,
+            "error": None,
+            "attempt_count": 0,
+            "next_try_at": next_try_at,
+        },
+        coalesce_cols=("campaign_id",),   # ← удерживаем привязку, если есть
+        revive_before=start_utc,
+    )
+    credited_today = sum(1 for _, ca in rows if start_utc <= ca < end_utc)
+    await db.commit()
+    admission.record(snap, len(rows))
+    return {"queued": int(credited_today), **decision.as_dict()}
+
+
+@router.get("/hh/applications/backlog")
+async def applications_backlog():
+    """Глобальный бэклог диспетчера, скорость разбора и режим приёма (для бота)."""
+    return (await admission.backlog()).as_dict()
+
+
 @router.get("/hh/applications/stats")
 def apps_stats(tg_id: int = Query(..., ge=1)):
     """
@@ -6,13 +6,14 @@ from typing import Optional, List, Dict
 
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
-from app.core.config import settings
+from app.db import engine
 import httpx
 from urllib.parse import urlparse, parse_qsl, urlencode
 from urllib.parse import parse_qs
 from app.services.auto_scheduler import dispatch_auto_once
+from app.services.limits import today_bounds_msk
 
 router = APIRouter()
 
@@ -81,8 +82,7 @@ class AutoActiveIn(BaseModel):
     
 # ---------- DB helpers ----------
 def _conn():
-    eng = create_engine(settings.database_url, pool_pre_ping=True, future=True)
-    return eng.connect()
+    return engine.connect()
 
 def _user_id_by_tg(conn, tg_id: int) -> Optional[int]:
     row = conn.execute(text("SELECT id FROM users WHERE tg_id=:tg"), {"tg": tg_id}).fetchone()
@@ -233,13 +233,14 @@ def auto_status(tg_id: int = Query(..., ge=1)):
         ).fetchone())
 
         # Счётчики по авто-заявкам
+        start_utc, end_utc = today_bounds_msk()
         counts = conn.execute(text("""
             SELECT
-              COUNT(*) FILTER (WHERE created_at::date = CURRENT_DATE) AS today_count,
-              COUNT(*)                                              AS total_count
+              COUNT(*) FILTER (WHERE created_at >= :start_utc AND created_at < :end_utc) AS today_count,
+              COUNT(*)                                                                   AS total_count
             FROM applications
             WHERE user_id = :u AND kind = 'auto'
-        """), {"u": uid}).fetchone() or (0, 0)
+        """), {"u": uid, "start_utc": start_utc, "end_utc": end_utc}).fetchone() or (0, 0)
         today_count = int(counts[0] or 0)
         total_count = int(counts[1] or 0)
 
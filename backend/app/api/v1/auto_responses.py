@@ -6,9 +6,9 @@ from typing import Optional, Dict, List
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
-from app.core.config import settings
+from app.db import engine
 
 router = APIRouter()
 
@@ -21,8 +21,7 @@ ALLOW_KEYS = {
 DROP_VALUES = {"", None}
 
 def _conn():
-    eng = create_engine(settings.database_url, pool_pre_ping=True, future=True)
-    return eng.connect()
+    return engine.connect()
 
 def _normalize_query(qs_or_url: str) -> str:
     """
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel, conint
 from sqlalchemy import text
 from ..deps import get_session
+from app.services.tariff_cache import notify_tariff_changed
 
 
 router = APIRouter(prefix="/payments", tags=["billing"])
@@ -28,6 +29,7 @@ def payments_confirm(body: Webhook, session = Depends(get_session)):
         ON CONFLICT (user_id, active) WHERE active
         DO UPDATE SET tariff_id=:tid, started_at=NOW(), expires_at=EXCLUDED.expires_at
     """), {"uid": int(uid), "tid": int(body.tariff_id)})
+    notify_tariff_changed(session, int(uid))
     try:
         uid = session.execute(text("SELECT id FROM users WHERE tg_id=:tg"), {"tg": int(body.user_id)}).scalar()
         if not uid:
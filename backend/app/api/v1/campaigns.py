@@ -1,14 +1,20 @@
 # app/api/v1/campaigns.py
 from __future__ import annotations
 from datetime import datetime
-from fastapi import APIRouter, Query, Body, HTTPException
+from fastapi import APIRouter, Depends, Query, Body, HTTPException
 from pydantic import BaseModel, Field
 from sqlalchemy import text
-from app.db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import SessionLocal, get_async_session
 from urllib.parse import parse_qsl, urlencode
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
 import httpx
-from app.services.limits import quota_for_user
+from app.services.limits import msk_today, quota_for_user, reserve_quota, today_bounds_msk
+from app.services import applications_store, job_queue, keyset, list_totals
+from app.services.hh_replay import hh_transport
 
 router = APIRouter(prefix="/hh", tags=["campaigns"])
 
@@ -37,6 +43,19 @@ def _resolve_user_id(db, tg_id: int | None, user_id: int | None) -> int:
         return int(uid)
     raise HTTPException(400, "tg_id or user_id is required")
 
+async def _resolve_user_id_async(db: AsyncSession, tg_id: int | None, user_id: int | None) -> int:
+    if user_id:
+        return int(user_id)
+    if tg_id:
+        uid = (await db.execute(
+            text("SELECT id FROM users WHERE tg_id=:t LIMIT 1"),
+            {"t": tg_id},
+        )).scalar()
+        if not uid:
+            raise HTTPException(404, "user not found")
+        return int(uid)
+    raise HTTPException(400, "tg_id or user_id is required")
+
 def _require(val, msg: str):
     if val is None or (isinstance(val, str) and not val.strip()):
         raise HTTPException(400, msg)
@@ -80,100 +99,143 @@ def _normalize_qs_for_hh(qp: str) -> list[tuple[str, str]]:
         norm.append((k, v))
     return norm
     
-def _hh_search_by_qs(db, user_id: int, qp: str, limit: int) -> list[dict]:
-    token = _get_hh_access_token(db, user_id)  # может быть None — это ок
-    headers = {
-        "User-Agent": "offerbot/1.0",
-        "Accept": "application/json",
-    }
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-
-    base = "https://api.hh.ru/vacancies"
-    params_base = _normalize_qs_for_hh(qp)
-    per_page = min(max(1, limit), 100)
-
-    def _fetch(params: list[tuple[str,str]]) -> tuple[list[dict], Optional[dict]]:
-        out: list[dict] = []
-        err_json: Optional[dict] = None
-        with httpx.Client(timeout=12.0, headers=headers) as client:
-            page = 0
-            dropped_auth = False
-            while len(out) < limit and page < 20:
-                q = params + [("per_page", str(per_page)), ("page", str(page))]
-                try:
-                    r = client.get(base, params=q)
-                except httpx.HTTPError:
-                    break 
-    
-                if r.status_code == 401:
-                    # токен протух — пробуем без авторизации один раз
-                    if "Authorization" in client.headers and not dropped_auth:
-                        client.headers.pop("Authorization", None)
-                        dropped_auth = True
-                        continue
-                    break
-    
-                if r.status_code == 400:
-                    # запомнили ошибку и попробуем упростить запрос выше
-                    try:
-                        err_json = r.json()
-                    except Exception:
-                        err_json = {"errors": [{"type": "unknown_400"}]}
-                    break
-    
-                if r.status_code in (403, 429, 500, 502, 503, 504):
-                    # временные/доступ — попробуем без авторизации один раз, потом выходим
-                    if "Authorization" in client.headers and not dropped_auth:
-                        client.headers.pop("Authorization", None)
-                        dropped_auth = True
-                        continue
-                    break
-    
-                r.raise_for_status()
-    
-                items = r.json().get("items", [])
-                if not items:
-                    break
-                for it in items:
-                    vid = str(it.get("id") or "").strip()
-                    if vid:
-                        out.append({"id": vid})
-                        if len(out) >= limit:
-                            break
-                page += 1
-    
-        return out[:limit], err_json
-
-    # Попытка 1 — как есть
-    items, err = _fetch(params_base)
-    if items:
-        return items
-    
-    # Попытка 2 — убираем professional_role (частая причина 400)
+# ---------- поиск в HH: планировщик фолбэков ----------
+HH_API = os.getenv("HH_API_BASE", "https://api.hh.ru")
+HH_SEARCH_UA = os.getenv("HH_USER_AGENT") or "offerbot/1.0"
+HH_MAX_DEPTH = 2000      # HH не отдаёт дальше page*per_page >= 2000
+HH_MAX_PAGES = 20
+
+_hh_sync_state: dict = {"client": None}
+_hh_sync_lock = threading.Lock()
+_hh_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hh-search")
+
+
+def _hh_sync_client() -> httpx.Client:
+    """Общий sync-клиент (пул соединений) для поиска; потокобезопасен."""
+    with _hh_sync_lock:
+        client = _hh_sync_state["client"]
+        if client is None or client.is_closed:
+            client = httpx.Client(
+                timeout=12.0,
+                headers={"User-Agent": HH_SEARCH_UA, "Accept": "application/json"},
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+                transport=hh_transport(),
+            )
+            _hh_sync_state["client"] = client
+        return client
+
+
+def _hh_vacancies_get(params: list[tuple[str, str]], token: Optional[str]) -> Optional[httpx.Response]:
+    """
+    Один GET /vacancies. Протухший токен (401) и временные ошибки
+    (403/429/5xx) — один повтор без авторизации. None — сеть недоступна.
+    """
+    client = _hh_sync_client()
+    url = f"{HH_API.rstrip('/')}/vacancies"
+    auth = {"Authorization": f"Bearer {token}"} if token else None
+    try:
+        r = client.get(url, params=params, headers=auth)
+        if auth and r.status_code in (401, 403, 429, 500, 502, 503, 504):
+            r = client.get(url, params=params)
+    except httpx.HTTPError:
+        return None
+    return r
+
+
+def _search_variants(params_base: list[tuple[str, str]]) -> list[list[tuple[str, str]]]:
+    """Варианты запроса от самого точного к самому общему (без дублей)."""
+    variants = [params_base]
+    # без professional_role (частая причина 400)
     if any(k == "professional_role" for k, _ in params_base):
-        params2 = [(k, v) for (k, v) in params_base if k != "professional_role"]
-        items, err = _fetch(params2)
-        if items:
-            return items
-
-    # Попытка 3 — убираем search_field (редко, но бывает)
+        variants.append([(k, v) for (k, v) in params_base if k != "professional_role"])
+    # без search_field (редко, но бывает)
     if any(k == "search_field" for k, _ in params_base):
-        params3 = [(k, v) for (k, v) in params_base if k != "search_field"]
-        items, err = _fetch(params3)
-        if items:
-            return items
-
-    # Попытка 4 — только text + area
+        variants.append([(k, v) for (k, v) in params_base if k != "search_field"])
+    # только text + area
     text_val = next((v for k, v in params_base if k == "text"), None)
     area_vals = [v for k, v in params_base if k == "area"]
-    params4: list[tuple[str,str]] = []
+    minimal: list[tuple[str, str]] = []
     if text_val:
-        params4.append(("text", text_val))
+        minimal.append(("text", text_val))
     if area_vals:
-        params4.append(("area", area_vals[0]))
-    items, _ = _fetch(params4)
-    return items
+        minimal.append(("area", area_vals[0]))
+    variants.append(minimal)
+
+    out, seen = [], set()
+    for v in variants:
+        key = tuple(v)
+        if key not in seen:
+            seen.add(key)
+            out.append(v)
+    return out
+
+
+def _probe_found(params: list[tuple[str, str]], token: Optional[str]) -> Optional[int]:
+    """Сколько вакансий найдёт вариант (per_page=0). 0 — пусто/400, None — не знаем."""
+    r = _hh_vacancies_get(params + [("per_page", "0"), ("page", "0")], token)
+    if r is None:
+        return None
+    if r.status_code == 400:
+        return 0
+    if r.status_code != 200:
+        return None
+    try:
+        return int(r.json().get("found") or 0)
+    except Exception:
+        return None
+
+
+def _fetch_page(params: list[tuple[str, str]], token: Optional[str], page: int, per_page: int) -> list[dict]:
+    r = _hh_vacancies_get(params + [("per_page", str(per_page)), ("page", str(page))], token)
+    if r is None or r.status_code != 200:
+        return []
+    try:
+        items = r.json().get("items") or []
+    except Exception:
+        return []
+    return [{"id": str(it.get("id")).strip()} for it in items if str(it.get("id") or "").strip()]
+
+
+def _hh_search_by_qs(db, user_id: int, qp: str, limit: int) -> list[dict]:
+    """
+    Поиск вакансий по query_params сохранённого запроса.
+
+    Все фолбэк-варианты зондируем параллельно с per_page=0 (читаем только found),
+    берём самый точный вариант с found > 0 и листаем только его — страницы
+    тоже параллельно. Безнадёжный запрос стоит один параллельный раунд.
+    """
+    token = _get_hh_access_token(db, user_id)  # может быть None — это ок
+    if limit <= 0:
+        return []
+    variants = _search_variants(_normalize_qs_for_hh(qp))
+    per_page = min(max(1, limit), 100)
+
+    found = list(_hh_pool.map(lambda v: _probe_found(v, token), variants))
+
+    chosen, total = None, 0
+    for v, f in zip(variants, found):
+        if f:
+            chosen, total = v, f
+            break
+    if chosen is None:
+        # HH не ответил ни на один зонд — листаем первый неизвестный вариант «вслепую»
+        unknown = [v for v, f in zip(variants, found) if f is None]
+        if not unknown:
+            return []
+        chosen, total = unknown[0], per_page
+
+    want = min(limit, total)
+    pages = min(-(-want // per_page), HH_MAX_PAGES, HH_MAX_DEPTH // per_page)
+    chunks = _hh_pool.map(lambda pg: _fetch_page(chosen, token, pg, per_page), range(pages))
+
+    out: list[dict] = []
+    seen: set[str] = set()
+    for chunk in chunks:
+        for it in chunk:
+            if it["id"] not in seen:
+                seen.add(it["id"])
+                out.append(it)
+    return out[:limit]
 
 # ---------- models ----------
 class CampaignUpsert(BaseModel):
@@ -231,81 +293,79 @@ def _from_qp(qp: str) -> dict:
     }
 
 @router.get("/campaigns")
-def list_campaigns(
+async def list_campaigns(
     tg_id: int | None = Query(None),
     user_id: int | None = Query(None),
     page: int = 1,
     page_size: int = 20,
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы"),
+    exact_total: bool = Query(False, description="точный count вместо кэша"),
+    db: AsyncSession = Depends(get_async_session),
 ):
-    off = (page - 1) * page_size
-    with SessionLocal() as db:
-        uid = _resolve_user_id(db, tg_id, user_id)
-        
-        total = db.execute(
+    # cursor — keyset по id; page — режим совместимости
+    off = 0 if cursor else (page - 1) * page_size
+    uid = await _resolve_user_id_async(db, tg_id, user_id)
+    ks_sql, ks_params = keyset.after(["c.id"], cursor)
+    ks_and = f"AND {ks_sql}" if ks_sql else ""
+
+    async def _count() -> int:
+        return (await db.execute(
             text("SELECT COUNT(*) FROM campaigns WHERE user_id=:uid"),
             {"uid": uid},
-        ).scalar()
-        
-        rows = db.execute(
-            text("""
-                SELECT
-                  c.id, c.user_id, c.title, c.status,
-                  c.created_at, c.updated_at, c.started_at, c.stopped_at,
-                  c.resume_id, c.saved_request_id,
-                  sr.query_params, sr.query, sr.area, sr.employment,
-                  sr.professional_roles, sr.search_fields, sr.cover_letter,
-                  (
-                    SELECT r.title
-                    FROM resumes r
-                    WHERE r.user_id = c.user_id
-                      AND r.resume_id = c.resume_id
-                    LIMIT 1
-                  ) AS resume_title,
-                  s.sent_count,
-                  s.sent_today,
-                  s.last_sent_at
-                FROM campaigns c
-                LEFT JOIN saved_requests sr ON sr.id = c.saved_request_id
-                LEFT JOIN LATERAL (
-                  SELECT
-                    COUNT(*) FILTER (WHERE a.status='sent')::int AS sent_count,
-                    COUNT(*) FILTER (WHERE a.status='sent' AND a.created_at::date = now()::date)::int AS sent_today,
-                    COUNT(*) FILTER (WHERE a.status IN ('queued','retry'))::int AS pending_apps,
-                    COUNT(*) FILTER (WHERE a.status IN ('queued','retry') AND a.created_at::date = now()::date)::int AS pending_apps_today,
-                    COALESCE((SELECT COUNT(*) FROM applications_queue aq WHERE aq.campaign_id = c.id), 0)::int AS pending_queue,
-                    COALESCE((SELECT COUNT(*) FROM applications_queue aq WHERE aq.campaign_id = c.id AND aq.created_at::date = now()::date), 0)::int AS pending_queue_today,
-                    MAX(a.sent_at) AS last_sent_at
-                  FROM applications a
-                  WHERE a.campaign_id = c.id
-                ) s ON TRUE
-                WHERE c.user_id = :uid
-                ORDER BY c.id DESC
-                LIMIT :lim OFFSET :off
-            """),
-            {"uid": uid, "lim": page_size, "off": off},
-        ).mappings().all()
-        items = []
-        for r in rows:
-            d = dict(r)
-            parsed = _from_qp((d.get("query_params") or "").strip())
-            # визуальная ссылка
-            d["search_url"] = parsed.get("search_url")
-            # массивы и текстовые поля для карточки
-            d["work_format"]        = parsed.get("work_format")        or []
-            d["employment"]         = parsed.get("employment")         or (d.get("employment") or [])
-            d["professional_roles"] = parsed.get("professional_roles") or (d.get("professional_roles") or [])
-            d["search_fields"]      = parsed.get("search_fields")      or (d.get("search_fields") or [])
-            # география (массив)
-            areas_from_qp = parsed.get("areas") or []
-            d["areas"] = areas_from_qp or ([str(d["area"])] if d.get("area") else [])
-            d["query"]              = d.get("query") or parsed.get("text") or ""
-            d["cover_letter"] = (d.get("cover_letter") or "")
-            d["sent_count"]   = int(d.get("sent_count") or 0)
-            d["sent_today"]   = int(d.get("sent_today") or 0)
-            d["queued_count"] = int((d.get("pending_apps") or 0) + (d.get("pending_queue") or 0))
-            d["queued_today"] = int((d.get("pending_apps_today") or 0) + (d.get("pending_queue_today") or 0))
-            items.append(d)
-        return {"items": items, "total": int(total or 0), "page": page, "page_size": page_size}
+        )).scalar()
+
+    total, exact = await list_totals.atotal(("campaigns.list", uid), _count, exact=exact_total)
+    
+    rows = (await db.execute(
+        text(f"""
+            SELECT
+              c.id, c.user_id, c.title, c.status,
+              c.created_at, c.updated_at, c.started_at, c.stopped_at,
+              c.resume_id, c.saved_request_id,
+              sr.query_params, sr.query, sr.area, sr.employment,
+              sr.professional_roles, sr.search_fields, sr.cover_letter,
+              r.title AS resume_title,
+              COALESCE(cs.sent_total, 0)                                               AS sent_count,
+              CASE WHEN cs.stats_day = :today THEN cs.sent_today    ELSE 0 END          AS sent_today,
+              COALESCE(cs.pending, 0)                                                  AS queued_count,
+              CASE WHEN cs.stats_day = :today THEN cs.pending_today ELSE 0 END          AS queued_today,
+              cs.last_sent_at
+            FROM campaigns c
+            LEFT JOIN saved_requests sr ON sr.id = c.saved_request_id
+            LEFT JOIN resumes r         ON r.resume_id = c.resume_id AND r.user_id = c.user_id
+            -- счётчики ведут триггеры на applications/applications_queue (миграция 0043)
+            LEFT JOIN campaign_stats cs ON cs.campaign_id = c.id
+            WHERE c.user_id = :uid
+              {ks_and}
+            ORDER BY c.id DESC
+            LIMIT :lim OFFSET :off
+        """),
+        {"uid": uid, "lim": page_size + 1, "off": off, "today": msk_today(), **ks_params},
+    )).mappings().all()
+    rows, next_cursor = keyset.page(rows, page_size, ["id"])
+    items = []
+    for r in rows:
+        d = dict(r)
+        parsed = _from_qp((d.get("query_params") or "").strip())
+        # визуальная ссылка
+        d["search_url"] = parsed.get("search_url")
+        # массивы и текстовые поля для карточки
+        d["work_format"]        = parsed.get("work_format")        or []
+        d["employment"]         = parsed.get("employment")         or (d.get("employment") or [])
+        d["professional_roles"] = parsed.get("professional_roles") or (d.get("professional_roles") or [])
+        d["search_fields"]      = parsed.get("search_fields")      or (d.get("search_fields") or [])
+        # география (массив)
+        areas_from_qp = parsed.get("areas") or []
+        d["areas"] = areas_from_qp or ([str(d["area"])] if d.get("area") else [])
+        d["query"]              = d.get("query") or parsed.get("text") or ""
+        d["cover_letter"] = (d.get("cover_letter") or "")
+        d["sent_count"]   = int(d.get("sent_count") or 0)
+        d["sent_today"]   = int(d.get("sent_today") or 0)
+        d["queued_count"] = int(d.get("queued_count") or 0)
+        d["queued_today"] = int(d.get("queued_today") or 0)
+        items.append(d)
+    return {"items": items, "total": int(total or 0), "exact": exact, "page": page, "page_size": page_size,
+            "next_cursor": next_cursor}
 
 @router.post("/campaigns/upsert")
 def upsert_campaign(p: CampaignUpsert):
@@ -338,6 +398,7 @@ def upsert_campaign(p: CampaignUpsert):
             },
         ).scalar_one()
         db.commit()
+        list_totals.invalidate(("campaigns.list", uid))
         return {"id": int(new_id)}
 
 @router.post("/campaigns/start")
@@ -419,75 +480,89 @@ def delete_campaign(p: CampaignDeleteRequest):
             raise HTTPException(status_code=404, detail="campaign not found")
 
         db.commit()
+    list_totals.invalidate(("campaigns.list", uid))
     return {"ok": True, "deleted_id": int(p.id)}
     
 class CampaignSendNow(CampaignId):
     limit: int | None = None
+    wait: bool = False  # True — выполнить в запросе (по умолчанию — задача в background_jobs)
+
+def _new_vacancy_ids(db, uid: int, vacancies: list) -> list[int]:
+    """id вакансий из выдачи, на которые пользователь ещё не откликался (в порядке выдачи)."""
+    vids = list(dict.fromkeys(
+        int(vid) for vid in (str(v.get("id") or "").strip() for v in vacancies) if vid.isdigit()
+    ))
+    existing = applications_store.existing_vacancies(db, uid, vids)
+    return [v for v in vids if v not in existing]
+
+def _send_now(db, uid: int, campaign_id: int, limit: Optional[int]) -> dict:
+    """Первая пачка откликов кампании: поиск в HH + постановка в applications."""
+    camp = db.execute(text("""
+        SELECT c.id, c.user_id, c.resume_id, c.saved_request_id, sr.query_params, sr.cover_letter
+        FROM campaigns c
+        JOIN saved_requests sr ON sr.id = c.saved_request_id
+        WHERE c.id=:cid AND c.user_id=:uid
+        LIMIT 1
+    """), {"cid": campaign_id, "uid": uid}).mappings().first()
+    if not camp:
+        raise HTTPException(404, "campaign not found")
+
+    remaining = quota_for_user(db, uid)["remaining"]
+    if remaining <= 0:
+        return {"enqueued": 0, "remaining_quota": 0}
+    
+    first_batch = min(remaining, limit or FIRST_BATCH_DEFAULT)
+    if first_batch <= 0:
+        return {"enqueued": 0, "remaining_quota": remaining}
+    qp = (camp["query_params"] or "").strip()
+    vacancies = _hh_search_by_qs(db, uid, qp, limit=first_batch*3)
+
+    # уже откликнутые этой кампанией (и вообще этим пользователем) — по дедупу
+    candidates = _new_vacancy_ids(db, uid, vacancies)
+
+    # резерв квоты: строка счётчика заблокирована до commit ниже
+    granted = reserve_quota(db, uid, first_batch)
+    enqueued = len(applications_store.insert_new(
+        db, uid, candidates[:granted],
+        status="queued", source="hh", meta={}, attempt_count=0, kind="manual",
+        resume_id=camp["resume_id"], campaign_id=camp["id"],
+        cover_letter=camp.get("cover_letter") or None,
+    ))
+
+    db.commit()
+    return {"enqueued": enqueued, "remaining_quota": max(remaining - enqueued, 0)}
+
+
+@job_queue.job("campaigns.send_now", concurrency=4, max_attempts=3)
+def _send_now_job(payload: dict) -> dict:
+    with SessionLocal() as db:
+        try:
+            return _send_now(db, int(payload["user_id"]), int(payload["campaign_id"]), payload.get("limit"))
+        except HTTPException as e:
+            raise job_queue.PermanentJobError(e.detail)
+
 
 @router.post("/campaigns/send_now")
 def send_now(p: CampaignSendNow):
+    """Ставит первую пачку в очередь задач и сразу отвечает; wait=true — синхронно, как раньше."""
     with SessionLocal() as db:
         uid = _resolve_user_id(db, p.tg_id, p.user_id)
-        camp = db.execute(text("""
-            SELECT c.id, c.user_id, c.resume_id, c.saved_request_id, sr.query_params, sr.cover_letter
-            FROM campaigns c
-            JOIN saved_requests sr ON sr.id = c.saved_request_id
-            WHERE c.id=:cid AND c.user_id=:uid
-            LIMIT 1
-        """), {"cid": p.id, "uid": uid}).mappings().first()
-        if not camp:
+        if p.wait:
+            return _send_now(db, uid, p.id, p.limit)
+        exists = db.execute(
+            text("SELECT 1 FROM campaigns WHERE id=:cid AND user_id=:uid"), {"cid": p.id, "uid": uid},
+        ).first()
+        if not exists:
             raise HTTPException(404, "campaign not found")
-
-        remaining = quota_for_user(db, uid)["remaining"]
-        if remaining <= 0:
-            return {"enqueued": 0, "remaining_quota": 0}
-        
-        first_batch = min(remaining, p.limit or FIRST_BATCH_DEFAULT)
-        if first_batch <= 0:
-            return {"enqueued": 0, "remaining_quota": remaining}
-        qp = (camp["query_params"] or "").strip()
-        vacancies = _hh_search_by_qs(db, uid, qp, limit=first_batch*3)
-
-        # уже откликнутые этой кампанией (и вообще этим пользователем)
-        existing = {
-            str(v_id) for (v_id,) in db.execute(text("""
-                SELECT vacancy_id FROM applications WHERE user_id=:u
-            """), {"u": uid}).all()
-        }
-
-        enqueued = 0
-        for v in vacancies:
-            vid = str(v.get("id") or "").strip()
-            if not vid or vid in existing:
-                continue
-            try:
-                db.execute(text("""
-                    INSERT INTO applications
-                        (user_id, vacancy_id, status, source, meta, attempt_count, kind,
-                         resume_id, campaign_id, cover_letter, created_at, updated_at)
-                    VALUES
-                        (:uid, :vid, 'queued', 'hh', '{}'::jsonb, 0, 'manual',
-                         :rid, :cid, :cl, now(), now())
-                    ON CONFLICT (user_id, vacancy_id) DO NOTHING
-                """), {
-                    "uid": uid,
-                    "vid": vid,
-                    "rid": camp["resume_id"],
-                    "cid": camp["id"],
-                    "cl":  camp.get("cover_letter") or None,
-                })
-                enqueued += 1
-                if enqueued >= first_batch:
-                    break
-                existing.add(vid)
-            except Exception:
-                pass
-
+        job_id = job_queue.enqueue(
+            db, "campaigns.send_now", {"user_id": uid, "campaign_id": p.id, "limit": p.limit},
+            priority=10, dedup_key=str(p.id),
+        )
         db.commit()
-        return {"enqueued": enqueued, "remaining_quota": max(remaining - enqueued, 0)}
+    return {"queued": True, "job_id": job_id}
 
-@router.post("/campaigns/auto_tick", response_model=dict)
-def auto_tick(payload: Optional[dict] = Body(None)) -> dict:
+def _auto_tick() -> dict:
+    """Добор автооткликов по всем активным кампаниям в пределах квоты."""
     with SessionLocal() as db:
         active = db.execute(text("""
             SELECT c.id, c.user_id, c.resume_id, sr.query_params, sr.cover_letter
@@ -527,41 +602,31 @@ def auto_tick(payload: Optional[dict] = Body(None)) -> dict:
             qp = (camp["query_params"] or "").strip()
             vacancies = _hh_search_by_qs(db, uid, qp, limit=to_enqueue * 2)
 
-            existing = {
-                str(v_id) for (v_id,) in db.execute(text("""
-                    SELECT vacancy_id FROM applications WHERE user_id = :u
-                """), {"u": uid}).all()
-            }
-
-            enq = 0
-            for v in vacancies:
-                vid = str(v.get("id") or "").strip()
-                if not vid or vid in existing:
-                    continue
-                try:
-                    db.execute(text("""
-                        INSERT INTO applications
-                          (user_id, vacancy_id, status, source, meta, attempt_count, kind,
-                           resume_id, campaign_id, cover_letter, created_at, updated_at)
-                        VALUES
-                          (:uid, :vid, 'queued', 'hh', '{}'::jsonb, 0, 'auto',
-                           :rid, :cid, :cl, now(), now())
-                        ON CONFLICT (user_id, vacancy_id) DO NOTHING
-                    """), {
-                        "uid": uid,
-                        "vid": vid,
-                        "rid": camp["resume_id"],
-                        "cid": camp["id"],
-                        "cl": camp.get("cover_letter") or None,
-                    })
-                    enq += 1
-                    if enq >= to_enqueue:
-                        break
-                    existing.add(vid)
-                except Exception:
-                    pass
+            candidates = _new_vacancy_ids(db, uid, vacancies)
 
+            granted = reserve_quota(db, uid, to_enqueue)
+            enq = len(applications_store.insert_new(
+                db, uid, candidates[:granted],
+                status="queued", source="hh", meta={}, attempt_count=0, kind="auto",
+                resume_id=camp["resume_id"], campaign_id=camp["id"],
+                cover_letter=camp.get("cover_letter") or None,
+            ))
+
+            # коммит на кампанию — не держим блокировку квоты на время поиска по остальным
+            db.commit()
             total_enq += enq
 
-        db.commit()
-        return {"enqueued": int(total_enq)}
\ No newline at end of file
+        return {"enqueued": int(total_enq)}
+
+
+@job_queue.job("campaigns.auto_tick", concurrency=1, max_attempts=2, lease_sec=900)
+def _auto_tick_job(payload: dict) -> dict:
+    return _auto_tick()
+
+
+@router.post("/campaigns/auto_tick", response_model=dict)
+def auto_tick(payload: Optional[dict] = Body(None)) -> dict:
+    """Ставит тик в очередь (одна живая задача на все вызовы); {"wait": true} — синхронно."""
+    if (payload or {}).get("wait"):
+        return _auto_tick()
+    return {"queued": True, "job_id": job_queue.enqueue_now("campaigns.auto_tick", dedup_key="all")}
\ No newline at end of file
@@ -4,15 +4,14 @@ from __future__ import annotations
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, text
-from app.core.config import settings
+from sqlalchemy import text
+from app.db import engine
 
 router = APIRouter(prefix="/cover-letters", tags=["cover_letters"])
 
 # ── helpers ──────────────────────────────────────────────────────────────────
 def _conn():
-    eng = create_engine(settings.database_url, pool_pre_ping=True, future=True)
-    return eng.connect()
+    return engine.connect()
 
 def _user_id_by_tg(conn, tg_id: int) -> Optional[int]:
     row = conn.execute(text("SELECT id FROM users WHERE tg_id=:tg"), {"tg": tg_id}).fetchone()
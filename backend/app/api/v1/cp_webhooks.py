@@ -12,6 +12,7 @@ from sqlalchemy.dialects.postgresql import JSONB
 from app.core.config import CP_API_SECRET
 from app.db import SessionLocal
 from app.services.referral_payouts import payout_on_payment_sync 
+from app.services.tariff_cache import notify_tariff_changed
 
 router = APIRouter(prefix="/cp", tags=["payments"])
 
@@ -194,6 +195,7 @@ async def cp_pay(request: Request):
                 INSERT INTO subscriptions (user_id, tariff_id, started_at, expires_at, status, source)
                 VALUES (:uid, :tid, :start, :until, 'active', 'cloudpayments')
             """), {"uid": user_id, "tid": tariff_id, "start": now, "until": new_until})
+        notify_tariff_changed(db, user_id)
 
         # реферальные начисления — один раз при успешной оплате
         try:
@@ -1,14 +1,12 @@
 from fastapi import APIRouter, Query
 from fastapi.responses import StreamingResponse
-from sqlalchemy import create_engine, text
-from app.core.config import settings
+from sqlalchemy import text
+from app.db import read_engine
 import csv
 from io import StringIO
 
 router = APIRouter(prefix="/admin/export", tags=["admin"])
 
-engine = create_engine(settings.database_url, future=True, pool_pre_ping=True)
-
 def _iter_csv(rows):
     buf = StringIO()
     w = csv.writer(buf)
@@ -30,7 +28,7 @@ def export_applications(status: str | None = Query(None), limit: int = Query(100
         params["st"] = status
     q += " ORDER BY id DESC LIMIT :lim"
     params["lim"] = limit
-    with engine.begin() as conn:
+    with read_engine(__name__).begin() as conn:
         rows = conn.execute(text(q), params).mappings()
         return StreamingResponse(_iter_csv(rows),
                                  media_type="text/csv",
@@ -11,23 +11,22 @@ import secrets
 import string
 
 import requests
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from sqlalchemy import text
 
 from app.core.config import settings
-from app.db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import SessionLocal, get_async_session
 
 from app.hh_client import hh_get_resumes
 from app.services.resumes import upsert_resumes
 from app.services.referrals import attach_pending_ref_on_link_sync
+from app.services import job_queue, tg_outbox
 import logging
 
 from fastapi.responses import RedirectResponse
 
-import json
-from urllib.request import Request, urlopen
-
 router = APIRouter(prefix="/hh", tags=["hh"])
 
 # ---------- конфиг ----------
@@ -36,31 +35,9 @@ HH_CLIENT_ID     = getattr(settings, "hh_client_id",     None) or os.getenv("HH_
 HH_CLIENT_SECRET = getattr(settings, "hh_client_secret", None) or os.getenv("HH_CLIENT_SECRET", "")
 HH_REDIRECT_URI  = getattr(settings, "hh_redirect_uri",  None) or os.getenv("HH_REDIRECT_URI", "")
 HH_API_BASE      = getattr(settings, "hh_api_base",      None) or os.getenv("HH_API_BASE", "https://api.hh.ru")
-BOT_TOKEN = (os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("BOT_TOKEN") or "").strip()
-API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage" if BOT_TOKEN else None
 
 HH_SCOPE = os.getenv("HH_SCOPE", "applicant_resumes offline")
 # ---------- utils ----------
-def _tg_send(chat_id: int, text_msg: str, reply_markup: dict | None = None, parse_mode: str | None = None) -> None:
-    if not API_URL or not text_msg:
-        return
-    payload = {
-        "chat_id": int(chat_id),
-        "text": text_msg,
-        "disable_web_page_preview": True,
-    }
-    if parse_mode:
-        payload["parse_mode"] = parse_mode
-    if reply_markup:
-        payload["reply_markup"] = json.dumps(reply_markup, ensure_ascii=False)
-    data = urlencode(payload).encode("utf-8")
-    try:
-        req = Request(API_URL, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"})
-        with urlopen(req, timeout=10):
-            pass
-    except Exception:
-        pass
-
 def _cases_kb() -> dict:
     return {
         "inline_keyboard": [
@@ -247,9 +224,89 @@ def hh_login(tg_id: int = Query(..., description="Telegram user id")):
     return LoginOut(auth_url=f"{HH_OAUTH_BASE.rstrip('/')}/oauth/authorize?{qs}")
 
 
+def _sync_hh_profile(tg_id: int) -> None:
+    """
+    Профиль /me, резюме и реферальная привязка после OAuth (задача hh.sync_profile).
+    Ошибки сети/HH — наружу: очередь повторит задачу, все записи идемпотентны.
+    """
+    tok = _get_tokens_by_tg(tg_id)
+    if not tok or not tok.get("access_token"):
+        raise job_queue.PermanentJobError(f"no hh token for tg_id={tg_id}")
+    access = tok["access_token"]
+
+    try:
+        with SessionLocal() as db:
+            attach_pending_ref_on_link_sync(db, tok["user_id"])
+            db.commit()
+    except Exception:
+        logging.exception("attach_pending_ref_on_link_sync failed")
+
+    # профиль /me — чтобы админка и бот видели данные
+    me_resp = requests.get(
+        f"{HH_API_BASE.rstrip('/')}/me",
+        headers={"Authorization": f"Bearer {access}"},
+        timeout=10,
+    )
+    if me_resp.status_code == 200:
+        me_json = me_resp.json()
+        full_name = " ".join(
+            x for x in [(me_json.get("first_name") or "").strip(),
+                        (me_json.get("last_name") or "").strip()]
+            if x
+        ).strip()
+        _save_hh_account_info(
+            tg_id=tg_id,
+            account_id=str(me_json.get("id") or "").strip(),
+            full_name=full_name,
+        )
+    elif me_resp.status_code >= 500:
+        raise RuntimeError(f"hh /me {me_resp.status_code}")
+
+    # резюме /resumes/mine
+    res_resp = requests.get(
+        f"{HH_API_BASE.rstrip('/')}/resumes/mine",
+        headers={"Authorization": f"Bearer {access}"},
+        timeout=10,
+    )
+    if res_resp.status_code >= 500:
+        raise RuntimeError(f"hh /resumes/mine {res_resp.status_code}")
+    if res_resp.status_code == 200:
+        items = res_resp.json().get("items", [])
+        try:
+            upsert_resumes(SessionLocal, tg_id, items)
+        except Exception:
+            with SessionLocal() as db:
+                for it in items:
+                    db.execute(
+                        text("""
+                            INSERT INTO resumes (user_id,resume_id,title,area,updated_at,visible)
+                            VALUES (:uid,:rid,:title,:area,:upd,:vis)
+                            ON CONFLICT (resume_id) DO UPDATE
+                            SET title = EXCLUDED.title,
+                                area = EXCLUDED.area,
+                                updated_at = EXCLUDED.updated_at,
+                                visible = EXCLUDED.visible
+                        """),
+                        {
+                            "uid": tok["user_id"],
+                            "rid": str(it.get("id") or ""),
+                            "title": it.get("title"),
+                            "area": (it.get("area") or {}).get("name"),
+                            "upd": it.get("updated_at"),
+                            "vis": bool(it.get("visible", True)),
+                        },
+                    )
+                db.commit()
+
+
+@job_queue.job("hh.sync_profile", concurrency=4, max_attempts=5, priority=5)
+def _sync_hh_profile_job(payload: dict) -> None:
+    _sync_hh_profile(int(payload["tg_id"]))
+
+
 @router.get("/callback", response_model=CallbackOut)
 def hh_callback(code: Optional[str] = None, state: Optional[str] = None):
-    """Обмен кода на токены + сохранение профиля и резюме."""
+    """Обмен кода на токены; профиль и резюме подтягивает задача hh.sync_profile."""
     if not code:
         raise HTTPException(400, "missing code")
 
@@ -289,103 +346,57 @@ def hh_callback(code: Optional[str] = None, state: Optional[str] = None):
         # 1) токены
         saved = _upsert_token_for_tg(tg_id, access, refresh, token_type, expires_in)
 
-        # 2) профиль HH
-    # --- сразу подтянем профиль и резюме, чтобы админка и бот видели данные ---
-        try:
-            # 2.1 профиль /me
-            me_resp = requests.get(
-                f"{HH_API_BASE.rstrip('/')}/me",
-                headers={"Authorization": f"Bearer {access}"},
-                timeout=10,
-            )
-            if me_resp.status_code == 200:
-                me_json = me_resp.json()
-                full_name = " ".join(
-                    x for x in [(me_json.get("first_name") or "").strip(),
-                                (me_json.get("last_name") or "").strip()]
-                    if x
-                ).strip()
-                _save_hh_account_info(
-                    tg_id=tg_id if tg_id is not None else 0,
-                    account_id=str(me_json.get("id") or "").strip(),
-                    full_name=full_name,
-                )
-
-            # 2.2 резюме /resumes/mine
-            res_resp = requests.get(
-                f"{HH_API_BASE.rstrip('/')}/resumes/mine",
-                headers={"Authorization": f"Bearer {access}"},
-                timeout=10,
-            )
-            if res_resp.status_code == 200:
-                items = res_resp.json().get("items", [])
-                
-                try:
-                    upsert_resumes(SessionLocal, tg_id, items)
-                except Exception:
-                    with SessionLocal() as db:
-                        uid = db.execute(text("SELECT id FROM users WHERE tg_id=:tg"), {"tg": tg_id}).scalar()
-                        if uid is not None:
-                            for it in items:
-                                db.execute(
-                                    text("""
-                                        INSERT INTO resumes (user_id,resume_id,title,area,updated_at,visible)
-                                        VALUES (:uid,:rid,:title,:area,:upd,:vis)
-                                        ON CONFLICT (resume_id) DO UPDATE
-                                        SET title = EXCLUDED.title,
-                                            area = EXCLUDED.area,
-                                            updated_at = EXCLUDED.updated_at,
-                                            visible = EXCLUDED.visible
-                                    """),
-                                    {
-                                        "uid": int(uid),
-                                        "rid": str(it.get("id") or ""),
-                                        "title": it.get("title"),
-                                        "area": (it.get("area") or {}).get("name"),
-                                        "upd": it.get("updated_at"),
-                                        "vis": bool(it.get("visible", True)),
-                                    },
-                                )
-                            db.commit()
-        except Exception:
-            pass
-        
-        try:
-            with SessionLocal() as db:
-                user_id = db.execute(text("SELECT id FROM users WHERE tg_id=:tg"), {"tg": tg_id}).scalar()
-                if user_id:
-                    attach_pending_ref_on_link_sync(db, int(user_id))
-                    db.commit()
-        except Exception:
-            logging.exception("attach_pending_ref_on_link_sync failed")
-        if tg_id is not None and saved:
-            # 1) Успех
-            _tg_send(tg_id, "✅ Аккаунт привязан. Готовы откликаться на вакансии!")
-        
-            # 2) Блок с кейсами (HTML + кликабельные ссылки)
+        # 2) профиль, резюме, рефералка — задачей в фоне: ответ на редирект не ждёт HH
+        if saved:
+            try:
+                job_queue.enqueue_now("hh.sync_profile", {"tg_id": tg_id}, dedup_key=str(tg_id))
+            except Exception:
+                logging.exception("hh.sync_profile enqueue failed")
+        if saved:
+            # сообщения в бот — через outbox (отправит воркер), редирект их не ждёт
             cases_text = (
                 "🙌 С ботом поиск работы будет идти быстрее и легче. Истории пользователей:\n\n"
             )
-            _tg_send(tg_id, cases_text, reply_markup=_cases_kb(), parse_mode="HTML")
-        
-            # 3) Главное меню (ссылка на доку)
-            _tg_send(
-                tg_id,
-                "📋 Главное меню. Выбери, что хочешь сделать:\n\n"
-                "<a href=''>Документация</a>",
-                reply_markup=_main_menu_kb(), parse_mode="HTML"
-            )
+            try:
+                with SessionLocal() as db:
+                    # 1) Успех
+                    tg_outbox.enqueue(db, chat_id=tg_id, text_msg="✅ Аккаунт привязан. Готовы откликаться на вакансии!")
+                    # 2) Блок с кейсами (HTML + кликабельные ссылки)
+                    tg_outbox.enqueue(db, chat_id=tg_id, text_msg=cases_text,
+                                      reply_markup=_cases_kb(), parse_mode="HTML")
+                    # 3) Главное меню (ссылка на доку)
+                    tg_outbox.enqueue(
+                        db, chat_id=tg_id,
+                        text_msg="📋 Главное меню. Выбери, что хочешь сделать:\n\n"
+                                 "<a href=''>Документация</a>",
+                        reply_markup=_main_menu_kb(), parse_mode="HTML",
+                    )
+                    db.commit()
+            except Exception:
+                logging.exception("tg outbox enqueue failed")
 
     return RedirectResponse(url="", status_code=302)
 
 @router.get("/link-status", response_model=LinkStatus)
-def link_status(tg_id: int = Query(..., description="Telegram user id")):
+async def link_status(
+    tg_id: int = Query(..., description="Telegram user id"),
+    db: AsyncSession = Depends(get_async_session),
+):
     """Статус привязки HH: есть ли токен (и не важно, надо ли рефрешить)."""
-    row = _get_tokens_by_tg(tg_id)
+    row = (await db.execute(
+        text("""
+            SELECT u.hh_account_id
+              FROM users u
+             WHERE u.tg_id = :tg_id
+               AND EXISTS (SELECT 1 FROM hh_tokens ht WHERE ht.user_id = u.id)
+             LIMIT 1
+        """),
+        {"tg_id": tg_id},
+    )).first()
     if not row:
         return LinkStatus(linked=False, hh_user_id=None)
 
-    hh_id_str = _get_hh_account_id_by_tg(tg_id)
+    hh_id_str = row[0] or None
     hh_id_int: Optional[int] = None
     if hh_id_str and hh_id_str.isdigit():
         hh_id_int = int(hh_id_str)
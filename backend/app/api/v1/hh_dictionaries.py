@@ -0,0 +1,32 @@
+# backend/app/api/v1/hh_dictionaries.py
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+from app.services import hh_dictionaries
+
+router = APIRouter(prefix="/hh/dictionaries", tags=["hh_dictionaries"])
+
+
+@router.get("")
+async def get_dictionaries(request: Request):
+    """
+    Справочники HH (проф. области/роли, занятость, график) с готовыми индексами.
+    Поддерживает If-None-Match: при совпадении ETag — 304 без тела.
+    """
+    try:
+        snapshot, etag = await hh_dictionaries.get_snapshot()
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"hh dictionaries unavailable: {e}")
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    inm = request.headers.get("if-none-match") or ""
+    if etag and etag in [x.strip() for x in inm.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(snapshot, headers=headers)
+
+
+@router.get("/stats")
+async def dictionaries_stats():
+    return hh_dictionaries.stats()
@@ -8,10 +8,24 @@ import httpx
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 
+from app.services.hh_client import HH_GET_FLIGHT, hh_get
+from app.services.ttl_cache import TTLCache
+
 router = APIRouter(prefix="/hh/jobs", tags=["hh_jobs"])
 
-HH_API = os.getenv("HH_API_BASE", "https://api.hh.ru").rstrip("/")
-USER_AGENT = os.getenv("HH_USER_AGENT", "hhbot/1.0")
+# кэш ответов /search: листание страниц и популярные запросы не ходят в HH каждый раз
+SEARCH_TTL_SEC = float(os.getenv("JOBS_CACHE_TTL_SEC", "60"))
+SEARCH_STALE_SEC = float(os.getenv("JOBS_CACHE_STALE_SEC", "600"))
+SEARCH_NEGATIVE_TTL_SEC = float(os.getenv("JOBS_CACHE_NEGATIVE_TTL_SEC", "15"))
+
+SEARCH_CACHE = TTLCache(
+    "hh_jobs_search",
+    ttl=SEARCH_TTL_SEC,
+    stale_ttl=SEARCH_STALE_SEC,
+    max_items=int(os.getenv("JOBS_CACHE_MAX_ITEMS", "2000")),
+    max_bytes=int(float(os.getenv("JOBS_CACHE_MAX_MB", "32")) * 1024 * 1024),
+)
+_bg_tasks: set[asyncio.Task] = set()
 
 # ---------- Models ----------
 
@@ -47,27 +61,71 @@ async def _hh_get(path: str, params: Dict[str, Any] | None = None) -> Dict[str,
     Небольшой ретрай и аккуратные коды ошибок, чтобы фронт не видел 500.
     """
     attempts = 3
-    headers = {"User-Agent": USER_AGENT}
-    async with httpx.AsyncClient(timeout=20.0, headers=headers) as client:
-        for i in range(attempts):
-            r = await client.get(f"{HH_API}{path}", params=params)
-            if r.status_code == 200:
-                try:
-                    return r.json()
-                except Exception:
-                    raise HTTPException(status_code=502, detail="hh.ru json parse error")
-            if r.status_code in (429, 503) and i < attempts - 1:
-                retry_after = r.headers.get("Retry-After")
-                delay = float(retry_after) if (retry_after or "").isdigit() else (1.5 * (i + 1))
-                await asyncio.sleep(delay)
-                continue
-            if r.status_code == 404:
-                raise HTTPException(status_code=404, detail="not found")
-            raise HTTPException(status_code=502, detail=f"hh.ru upstream error ({r.status_code})")
+    for i in range(attempts):
+        try:
+            r = await hh_get(path, params=params)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="hh.ru upstream timeout")
+        except httpx.RequestError:
+            raise HTTPException(status_code=502, detail="hh.ru upstream unavailable")
+        if r.status_code == 200:
+            try:
+                return r.json()
+            except Exception:
+                raise HTTPException(status_code=502, detail="hh.ru json parse error")
+        if r.status_code in (429, 503) and i < attempts - 1:
+            retry_after = r.headers.get("Retry-After")
+            delay = float(retry_after) if (retry_after or "").isdigit() else (1.5 * (i + 1))
+            await asyncio.sleep(delay)
+            continue
+        if r.status_code == 404:
+            raise HTTPException(status_code=404, detail="not found")
+        raise HTTPException(status_code=502, detail=f"hh.ru upstream error ({r.status_code})")
     raise HTTPException(status_code=502, detail="hh.ru upstream error")
 
 # ---------- Routes ----------
 
+def _search_key(
+    query: str,
+    area: int | None,
+    page: int,
+    page_size: int,
+    search_field: list[str] | None,
+    employment: list[str] | None,
+    schedule: list[str] | None,
+    professional_role: list[int] | None,
+) -> tuple:
+    """Нормализованный ключ кэша: регистр/пробелы и порядок значений не важны."""
+    return (
+        " ".join((query or "").lower().split()),
+        area,
+        page,
+        page_size,
+        tuple(sorted(set(search_field or []))),
+        tuple(sorted(set(employment or []))),
+        tuple(sorted(set(schedule or []))),
+        tuple(sorted({int(x) for x in (professional_role or [])})),
+    )
+
+
+def _cache_put(key: tuple, resp: dict[str, Any]) -> None:
+    # пустые выдачи кэшируем коротко и без stale-окна
+    if int(resp.get("total") or 0) == 0:
+        SEARCH_CACHE.set(key, resp, ttl=SEARCH_NEGATIVE_TTL_SEC, stale_ttl=0)
+    else:
+        SEARCH_CACHE.set(key, resp)
+
+
+async def _revalidate(key: tuple, fetch) -> None:
+    try:
+        _cache_put(key, await fetch())
+    except Exception:
+        # оставляем устаревшую запись, следующая попытка — при следующем запросе
+        pass
+    finally:
+        SEARCH_CACHE.end_revalidate(key)
+
+
 @router.get("/search", response_model=JobsResponse)
 async def search_jobs(
     query: str = Query(""),
@@ -79,6 +137,49 @@ async def search_jobs(
     schedule: list[str] | None = Query(None, description="['fullDay','shift','flexible','remote','flyInFlyOut']"),
     professional_role: list[int] | None = Query(None),
 ):
+    async def fetch() -> dict[str, Any]:
+        return await _search_upstream(
+            query, area, page, page_size, search_field, employment, schedule, professional_role
+        )
+
+    key = _search_key(query, area, page, page_size, search_field, employment, schedule, professional_role)
+    cached, state = SEARCH_CACHE.get(key)
+    if state == "fresh":
+        return cached
+    if state == "stale":
+        if SEARCH_CACHE.begin_revalidate(key):
+            task = asyncio.create_task(_revalidate(key, fetch))
+            _bg_tasks.add(task)
+            task.add_done_callback(_bg_tasks.discard)
+        return cached
+
+    resp = await fetch()
+    _cache_put(key, resp)
+    return resp
+
+
+@router.get("/cache/stats")
+def search_cache_stats():
+    """Метрики кэша поиска (hit/miss/stale, размер)."""
+    return SEARCH_CACHE.stats()
+
+
+@router.get("/upstream/stats")
+def upstream_stats():
+    """Метрики схлопывания одинаковых GET в HH (лидеры/присоединившиеся/таймауты)."""
+    return HH_GET_FLIGHT.stats()
+
+
+async def _search_upstream(
+    query: str,
+    area: int | None,
+    page: int,
+    page_size: int,
+    search_field: list[str] | None,
+    employment: list[str] | None,
+    schedule: list[str] | None,
+    professional_role: list[int] | None,
+) -> dict[str, Any]:
     def build_params(include_roles: bool = True) -> dict[str, Any]:
         p: dict[str, Any] = {
             "text": query or "",
@@ -1,39 +1,14 @@
 from fastapi import APIRouter
-import os, socket, re
-import psycopg2
 
-router = APIRouter(prefix="/metrics", tags=["metrics"])
+from app.db import pg_conn, pool_stats, read_engine
+from app.services import job_queue, schema_registry, tariff_cache
 
-def _dsn_pg() -> str:
-    dsn = (os.getenv("DATABASE_URL") or "").strip()
-    if not dsn:
-        try:
-            from app.core.config import settings
-            dsn = (getattr(settings, "database_url", "") or "").strip()
-        except Exception:
-            pass
-    if not dsn:
-        raise RuntimeError("No DATABASE_URL found")
-
-    if dsn.startswith("postgresql+psycopg2://"):
-        dsn = dsn.replace("postgresql+psycopg2://", "postgresql://", 1)
-    if dsn.startswith("postgresql+asyncpg://"):
-        dsn = dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
-
-    if not os.path.exists("/.dockerenv"):
-        try:
-            socket.getaddrinfo("db", 5432)
-        except Exception:
-            host = "localhost"
-            port = os.getenv("PGPORT_HOST", "5433")
-            dsn = re.sub(r"@db(?::\d+)?", f"@{host}:{port}", dsn, count=1)
-    return dsn
+router = APIRouter(prefix="/metrics", tags=["metrics"])
 
 @router.get("/summary")
 def metrics_summary():
     try:
-        dsn = _dsn_pg()
-        with psycopg2.connect(dsn) as conn:
+        with pg_conn(read_engine(__name__)) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT count(*) FROM users")
                 users_total = int(cur.fetchone()[0] or 0)
@@ -42,3 +17,28 @@ def metrics_summary():
         return {"ok": True, "users_total": users_total, "applications_total": appl_total}
     except Exception as e:
         return {"ok": False, "users_total": 0, "applications_total": 0, "note": "fallback", "error": str(e)}
+
+@router.get("/db-pool")
+def db_pool():
+    """Состояние общего пула соединений процесса."""
+    return pool_stats()
+
+@router.get("/tariff-cache")
+def tariff_cache_stats():
+    """Кэш тарифов: попадания и состояние LISTEN tariff_changed."""
+    return tariff_cache.stats()
+
+@router.get("/schema")
+def schema_stats():
+    """Реестр схемы: когда и сколько таблиц прочитано."""
+    return schema_registry.stats()
+
+@router.post("/schema/refresh")
+def schema_refresh():
+    """Перечитать схему после миграций без перезапуска (во всех процессах через NOTIFY)."""
+    return schema_registry.refresh_all()
+
+@router.get("/jobs")
+def jobs_stats():
+    """Очередь background_jobs: глубина и занятые слоты по типам."""
+    return job_queue.stats(read_engine(__name__))
@@ -1,26 +1,26 @@
 # backend/app/api/v1/quota.py
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import text
-from sqlalchemy.orm import Session
-from ..deps import get_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_session
 from app.services.limits import quota_for_user
 
 router = APIRouter(prefix="/quota", tags=["quota"])
 
 @router.get("")
-def get_quota(
+async def get_quota(
     tg_id: int | None = Query(None),
     user_id: int | None = Query(None),
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_async_session),
 ):
     if user_id is None:
         if tg_id is None:
             raise HTTPException(status_code=422, detail="either tg_id or user_id is required")
-        user_id = db.execute(text("SELECT id FROM users WHERE tg_id=:t LIMIT 1"), {"t": tg_id}).scalar_one_or_none()
+        user_id = (await db.execute(text("SELECT id FROM users WHERE tg_id=:t LIMIT 1"), {"t": tg_id})).scalar_one_or_none()
         if not user_id:
             raise HTTPException(status_code=404, detail="user not found")
 
-    q = quota_for_user(db, user_id)
+    q = await db.run_sync(quota_for_user, user_id)
     return {
         "tg_id": tg_id,
         "user_id": user_id,
@@ -2,13 +2,12 @@ from __future__ import annotations
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import create_async_engine
-from app.db import SessionLocal
+from app.db import SessionLocal, async_engine
 
 from app.core.config import settings
 
 router = APIRouter(prefix="/referrals", tags=["referrals"])
-engine = create_async_engine(settings.database_url.replace("+psycopg2", "+asyncpg"), pool_pre_ping=True)
+engine = async_engine
 
 def _bot_link(code: str) -> str:
     username = (settings.bot_username or "").lstrip("@").strip()
@@ -1,11 +1,12 @@
 from __future__ import annotations
 from typing import Any, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
 from sqlalchemy import text
 
-from app.db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import SessionLocal, get_async_session
 
 router = APIRouter(prefix="/saved-requests", tags=["saved_requests"])
 
@@ -34,43 +35,48 @@ class SavedRequestOut(SavedRequestIn):
 # ---- endpoints ----
 
 @router.get("", response_model=list[SavedRequestOut])
-def list_saved_requests(tg_id: int = Query(...)):
-    with SessionLocal() as db:
-        uid = _get_user_id_by_tg(db, tg_id)
-        if not uid:
-            return []
-
-        rows = db.execute(
-            text("""
-                SELECT id, title, query, area, employment, schedule,
-                       professional_roles, search_fields, cover_letter,
-                       query_params, resume,             -- ← ДОБАВИЛИ
-                       created_at, updated_at
-                  FROM saved_requests
-                 WHERE user_id = :uid
-                 ORDER BY updated_at DESC
-            """),
-            {"uid": uid}
-        ).mappings().all()
-
-        out: list[dict[str, Any]] = []
-        for r in rows:
-            out.append({
-                "id": int(r["id"]),
-                "title": r["title"] or "",
-                "query": r["query"] or "",
-                "area": r["area"],
-                "employment": r["employment"] or [],
-                "schedule": r["schedule"] or [],
-                "professional_roles": r["professional_roles"] or [],
-                "search_fields": r["search_fields"] or [],
-                "cover_letter": r["cover_letter"] or "",
-                "query_params": r.get("query_params") or "",   
-                "resume": r.get("resume"),                     
-                "created_at": r["created_at"].isoformat(),
-                "updated_at": r["updated_at"].isoformat(),
-            })
-        return out
+async def list_saved_requests(
+    tg_id: int = Query(...),
+    db: AsyncSession = Depends(get_async_session),
+):
+    row = (await db.execute(
+        text("SELECT id FROM users WHERE tg_id=:tg_id"), {"tg_id": tg_id}
+    )).first()
+    uid = int(row[0]) if row else None
+    if not uid:
+        return []
+
+    rows = (await db.execute(
+        text("""
+            SELECT id, title, query, area, employment, schedule,
+                   professional_roles, search_fields, cover_letter,
+                   query_params, resume,             -- ← ДОБАВИЛИ
+                   created_at, updated_at
+              FROM saved_requests
+             WHERE user_id = :uid
+             ORDER BY updated_at DESC
+        """),
+        {"uid": uid}
+    )).mappings().all()
+
+    out: list[dict[str, Any]] = []
+    for r in rows:
+        out.append({
+            "id": int(r["id"]),
+            "title": r["title"] or "",
+            "query": r["query"] or "",
+            "area": r["area"],
+            "employment": r["employment"] or [],
+            "schedule": r["schedule"] or [],
+            "professional_roles": r["professional_roles"] or [],
+            "search_fields": r["search_fields"] or [],
+            "cover_letter": r["cover_letter"] or "",
+            "query_params": r.get("query_params") or "",   
+            "resume": r.get("resume"),                     
+            "created_at": r["created_at"].isoformat(),
+            "updated_at": r["updated_at"].isoformat(),
+        })
+    return out
 
 
 @router.post("", response_model=SavedRequestOut)
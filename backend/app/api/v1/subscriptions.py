@@ -3,9 +3,11 @@ from __future__ import annotations
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict, Any
 from datetime import datetime
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import os
 
+from app.db import engine
+
 from datetime import datetime, timezone
 
 import os, logging, requests
@@ -13,9 +15,6 @@ import os, logging, requests
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/subscriptions", tags=["subscriptions"])
 
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+psycopg2://")
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, future=True)
-
 @router.get("/me")
 def my_subscription(
     user_id: str | None = Query(None, description="internal users.id (строка или число)"),
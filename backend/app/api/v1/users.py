@@ -5,6 +5,7 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field, conint
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi.responses import StreamingResponse
 import csv, io
@@ -13,6 +14,8 @@ try:
     from app.deps import get_session as get_db
 except Exception:
     from app.db import get_db
+from app.db import get_async_session
+from app.services import keyset, list_totals
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -56,14 +59,14 @@ def _days_left(dt: Optional[datetime]) -> Optional[int]:
 # ---------- routes ----------
 
 @router.post("/seen")
-def users_seen(p: SeenIn, db: Session = Depends(get_db)):
+async def users_seen(p: SeenIn, db: AsyncSession = Depends(get_async_session)):
     """
     Идемпотентный апсерт пользователя по tg_id.
     Обновляет username (если передан) и last_seen.
     Если прилетели UTM — записывает их ТОЛЬКО если пусто (COALESCE),
     чтобы сохранить первичный источник.
     """
-    db.execute(
+    await db.execute(
         text("""
             INSERT INTO users (tg_id, username, created_at, last_seen, last_seen_at)
             VALUES (:tg, :un, now(), now(), now())
@@ -75,7 +78,7 @@ def users_seen(p: SeenIn, db: Session = Depends(get_db)):
         {"tg": int(p.tg_id), "un": p.username},
     )
     if any([p.utm_source, p.utm_medium, p.utm_campaign]):
-        db.execute(
+        await db.execute(
             text("""
                 UPDATE users
                    SET utm_source   = COALESCE(utm_source,   :s),
@@ -85,7 +88,7 @@ def users_seen(p: SeenIn, db: Session = Depends(get_db)):
             """),
             {"tg": int(p.tg_id), "s": p.utm_source, "m": p.utm_medium, "c": p.utm_campaign},
         )
-    db.commit()
+    await db.commit()
     return {"ok": True}
 
 @router.post("/register")
@@ -112,22 +115,36 @@ def register_user(p: RegisterIn, db: Session = Depends(get_db)):
 def users_list(q: str | None = None,
                limit: int = 50,
                offset: int = 0,
+               cursor: str | None = None,
+               exact_total: bool = False,
                db: Session = Depends(get_db)):
     """
-    Простой список для админки. Возвращает {total, items:[...]}.
+    Простой список для админки. Возвращает {total, items:[...], next_cursor}.
     Поля строго из существующей схемы.
+    Пагинация: cursor (keyset по id) или offset (совместимость).
+    total без фильтра — оценка, с фильтром — кэш на несколько секунд (exact=false);
+    exact_total=1 — точный count.
     """
-    where = ""
-    params = {"limit": limit, "offset": offset}
+    conds = []
+    params = {"limit": limit + 1, "offset": 0 if cursor else offset}
     if q:
-        where = """
-          WHERE (COALESCE(username,'') ILIKE :qq
+        conds.append("""
+          (COALESCE(username,'') ILIKE :qq
              OR  COALESCE(hh_account_name,'') ILIKE :qq
              OR  CAST(tg_id AS text) ILIKE :qq)
-        """
+        """)
         params["qq"] = f"%{q}%"
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
 
-    total = db.execute(text(f"SELECT COUNT(*) FROM users {where}"), params).scalar() or 0
+    total, exact = list_totals.total(
+        ("users.list", q or ""),
+        lambda: db.execute(text(f"SELECT COUNT(*) FROM users {where}"), params).scalar(),
+        exact=exact_total,
+        estimate=None if q else (lambda: list_totals.reltuples_estimate(db.get_bind(), "users")),
+    )
+    ks_sql, ks_params = keyset.after(["u.id"], cursor)
+    params.update(ks_params)
+    where = ("WHERE " + " AND ".join(conds + [ks_sql])) if (conds or ks_sql) else ""
     rows = db.execute(
         text(f"""
             SELECT
@@ -183,8 +200,9 @@ def users_list(q: str | None = None,
         """),
         params,
     ).mappings().all()
+    rows, next_cursor = keyset.page(rows, limit, ["id"])
 
-    return {"total": total, "items": rows}
+    return {"total": total, "exact": exact, "items": rows, "next_cursor": next_cursor}
 
 @router.get("/profile")
 def users_profile(tg_id: int = Query(..., description="Telegram user id"),
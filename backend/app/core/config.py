@@ -6,14 +6,10 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List, Optional
 
-from dotenv import load_dotenv
+from app.core.env import load_env
 
 ROOT = Path(__file__).resolve().parents[3]
-ENV_FILE = ROOT / ".env"
-load_dotenv(ENV_FILE)  
-
-import os
-from typing import List
+ENV_FILE = load_env() or ROOT / ".env"
 
 def _get(name: str, default: Optional[str] = None, cast=None, required: bool = False):
     v = os.getenv(name, default)
@@ -77,7 +73,7 @@ def load_settings() -> Settings:
 CP_PUBLIC_ID = os.getenv("CP_PUBLIC_ID","")
 CP_API_SECRET = os.getenv("CP_API_SECRET","")
 BASE_URL = os.getenv("BASE_URL","http://localhost:8000").rstrip("/")
-PAY_RETURN_BOT_URL = 
+PAY_RETURN_BOT_URL = os.getenv("PAY_RETURN_BOT_URL", "")
 
 settings = load_settings()
 settings.DATABASE_URL = settings.database_url
\ No newline at end of file
@@ -0,0 +1,37 @@
+# backend/app/core/env.py
+"""
+Единственная загрузка .env на процесс.
+
+Ищем ближайший .env вверх от backend/app (обычно — корень проекта) и читаем
+его один раз; переменные, уже заданные в окружении, не перетираются.
+Модули вызывают load_env() вместо собственного load_dotenv.
+"""
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+_lock = threading.Lock()
+_loaded: Optional[Path] = None
+_done = False
+
+
+def load_env() -> Optional[Path]:
+    """Путь к загруженному .env (None — файла нет); повторные вызовы ничего не делают."""
+    global _loaded, _done
+    if _done:
+        return _loaded
+    with _lock:
+        if not _done:
+            here = Path(__file__).resolve().parent
+            for p in here.parents:
+                env = p / ".env"
+                if env.exists():
+                    load_dotenv(env.as_posix())
+                    _loaded = env
+                    break
+            _done = True
+    return _loaded
@@ -1,19 +1,388 @@
 # backend/app/db.py
+"""
+Единая точка подключения к Postgres.
+
+Один engine (пул) на процесс; размер пула — по роли процесса (PROCESS_ROLE).
+Вместо pool_pre_ping на каждом checkout — TCP keepalive и pool_recycle.
+Модули не создают свои engine, а импортируют `engine` / `SessionLocal` отсюда.
+Горячие эндпоинты бота работают через `async_engine` (asyncpg) и `get_async_session`.
+Тяжёлые админские чтения — через `read_engine(__name__)` / `pg_conn(read_engine(...))`:
+на реплику DATABASE_REPLICA_URL, если модуль в DB_READ_REPLICA_MODULES и лаг в норме.
+Импорт модуля ничего не создаёт и не ходит в сеть: engine, пулы и DNS-проверка
+хоста `db` — при первом обращении (обычно в первом запросе или в lifespan).
+"""
+import functools
 import os
-from sqlalchemy import create_engine
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = os.getenv(
-    "DATABASE_URL",
-    "postgresql+psycopg2://postgres:postgres@db:5432/postgres",
+from app.core.env import load_env
+
+load_env()
+
+
+@functools.lru_cache(maxsize=8)
+def normalize_dsn(url: str) -> str:
+    """
+    DSN для psycopg2-engine: чистим «DATABASE_URL=...», asyncpg/plain -> psycopg2,
+    вне docker хост `db` подменяем на localhost:PGPORT_HOST. Считается один раз.
+    """
+    url = (url or "").strip()
+    if url.startswith("DATABASE_URL="):
+        url = url.split("=", 1)[1].strip()
+    url = re.sub(r"^postgresql\+asyncpg://", "postgresql+psycopg2://", url)
+    url = re.sub(r"^postgres(ql)?://", "postgresql+psycopg2://", url)
+
+    if "@db" in url and not os.path.exists("/.dockerenv"):
+        try:
+            socket.getaddrinfo("db", 5432)
+        except Exception:
+            port = os.getenv("PGPORT_HOST", "5433")
+            url = re.sub(r"@db(?::\d+)?", f"@localhost:{port}", url, count=1)
+    return url
+
+
+_RAW_DATABASE_URL = os.getenv("DATABASE_URL") or "postgresql+psycopg2://postgres:postgres@db:5432/postgres"
+
+
+def database_url() -> str:
+    """Нормализованный DSN основной БД (первый вызов может проверить DNS хоста `db`)."""
+    return normalize_dsn(_RAW_DATABASE_URL)
+
+
+def __getattr__(name: str) -> Any:
+    # DATABASE_URL для старых импортов: считается при первом обращении, а не на импорте
+    if name == "DATABASE_URL":
+        return database_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _Lazy:
+    """
+    Прокси, который строит объект (engine, sessionmaker) при первом обращении
+    к атрибуту. `from app.db import engine` остаётся дешёвым, а код вида
+    engine.begin() / SessionLocal() работает как раньше.
+    """
+
+    __slots__ = ("_factory", "_obj", "_lock", "_label")
+
+    def __init__(self, factory: Callable[[], Any], label: str):
+        self._factory = factory
+        self._obj = None
+        self._lock = threading.Lock()
+        self._label = label
+
+    def _get(self):
+        obj = self._obj
+        if obj is None:
+            with self._lock:
+                if self._obj is None:
+                    self._obj = self._factory()
+                obj = self._obj
+        return obj
+
+    @property
+    def created(self) -> bool:
+        return self._obj is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._get()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return repr(self._obj) if self._obj is not None else f"<lazy {self._label}>"
+
+# --- пул по роли процесса ---
+# api — веб-воркер uvicorn; worker — фоновые циклы; script — CLI/миграции
+PROCESS_ROLE = (os.getenv("PROCESS_ROLE") or "api").strip().lower()
+_POOL_BY_ROLE = {
+    "api": (10, 10),
+    "worker": (4, 2),
+    "script": (2, 0),
+}
+_pool_size, _max_overflow = _POOL_BY_ROLE.get(PROCESS_ROLE, _POOL_BY_ROLE["api"])
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(_pool_size)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(_max_overflow)))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0").lower() in ("1", "true", "yes", "on")
+
+# TCP keepalive: мёртвые соединения отваливаются сами, без SELECT 1 на checkout
+DB_CONNECT_ARGS = {
+    "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "5")),
+    "keepalives": 1,
+    "keepalives_idle": int(os.getenv("DB_KEEPALIVES_IDLE", "30")),
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+    "application_name": f"hhbot-{PROCESS_ROLE}",
+}
+
+_pool_counters = {"connects": 0, "checkouts": 0, "invalidated": 0}
+_counters_lock = threading.Lock()
+
+
+def _bump(name: str) -> None:
+    with _counters_lock:
+        _pool_counters[name] += 1
+
+
+def make_engine(url: Optional[str] = None, **overrides) -> Engine:
+    """Фабрика engine с общими настройками пула (для основного engine и редких особых случаев)."""
+    kw = dict(
+        future=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_use_lifo=True,
+        connect_args=dict(DB_CONNECT_ARGS),
+    )
+    kw.update(overrides)
+    return create_engine(url or database_url(), **kw)
+
+
+def _on_connect(dbapi_conn, conn_record):
+    _bump("connects")
+
+
+def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+    _bump("checkouts")
+
+
+def _on_invalidate(dbapi_conn, conn_record, exception):
+    _bump("invalidated")
+
+
+def _make_main_engine() -> Engine:
+    eng = make_engine()
+    event.listen(eng, "connect", _on_connect)
+    event.listen(eng, "checkout", _on_checkout)
+    event.listen(eng, "invalidate", _on_invalidate)
+    return eng
+
+
+engine: Engine = _Lazy(_make_main_engine, "engine")  # type: ignore[assignment]
+SessionLocal = _Lazy(
+    lambda: sessionmaker(bind=engine._get(), autocommit=False, autoflush=False), "SessionLocal"
 )
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+# --- реплика для тяжёлых read-only запросов админки/аналитики (опционально) ---
+_RAW_REPLICA_URL = (os.getenv("DATABASE_REPLICA_URL") or "").strip()
+REPLICA_MAX_LAG_SEC = float(os.getenv("REPLICA_MAX_LAG_SEC", "30"))
+REPLICA_LAG_CHECK_SEC = float(os.getenv("REPLICA_LAG_CHECK_SEC", "5"))
+# последние компоненты имён модулей роутеров; "*" — все модули
+DB_READ_REPLICA_MODULES = {
+    m.strip()
+    for m in os.getenv(
+        "DB_READ_REPLICA_MODULES",
+        "admin_dashboard,admin_analytics,admin_listings,export,admin_applications,metrics",
+    ).split(",")
+    if m.strip()
+}
+
+DB_REPLICA_POOL_SIZE = int(os.getenv("DB_REPLICA_POOL_SIZE", "4"))
+DB_REPLICA_MAX_OVERFLOW = int(os.getenv("DB_REPLICA_MAX_OVERFLOW", "2"))
+
+
+
+def _make_replica_engine() -> Engine:
+    return make_engine(
+        normalize_dsn(_RAW_REPLICA_URL),
+        pool_size=DB_REPLICA_POOL_SIZE,
+        max_overflow=DB_REPLICA_MAX_OVERFLOW,
+        connect_args={
+            **DB_CONNECT_ARGS,
+            "application_name": f"hhbot-{PROCESS_ROLE}-ro",
+            # и на отдельном (не standby) инстансе запись не пройдёт
+            "options": "-c default_transaction_read_only=on",
+        },
+    )
+
+
+replica_engine: Optional[Engine] = (
+    _Lazy(_make_replica_engine, "replica_engine") if _RAW_REPLICA_URL else None  # type: ignore[assignment]
+)
+
+# Лаг на standby. 0 — не standby, или WAL-receiver в streaming и всё принятое проиграно,
+# или проиграно всё, что было на primary к началу проверки (:primary_lsn — heartbeat
+# с основного: на простаивающем primary replay_timestamp стареет, а отставания нет).
+# Иначе (receiver отключён или отстаёт) — возраст последней проигранной транзакции:
+# равенство receive/replay LSN при отключённом receiver ничего не значит.
+# NULL — ни одной транзакции ещё не проиграно: лаг неизвестен, читаем с primary.
+# status в pg_stat_wal_receiver виден роли с pg_read_all_stats; без неё — только ветки ниже.
+_REPLICA_LAG_SQL = text("""
+    SELECT CASE
+             WHEN NOT pg_is_in_recovery() THEN 0::float8
+             WHEN EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming')
+              AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0::float8
+             WHEN CAST(:primary_lsn AS pg_lsn) IS NOT NULL
+              AND pg_last_wal_replay_lsn() >= CAST(:primary_lsn AS pg_lsn) THEN 0::float8
+             ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8
+           END
+""")
+_PRIMARY_LSN_SQL = text("SELECT pg_current_wal_lsn()::text")
+_replica_state = {"checked_at": 0.0, "lag_sec": None, "error": None, "routed": 0, "fallbacks": 0}
+_replica_lock = threading.Lock()
+
+
+def replica_lag() -> Optional[float]:
+    """Лаг реплики в секундах (проверка не чаще REPLICA_LAG_CHECK_SEC); None — реплика недоступна."""
+    if replica_engine is None:
+        return None
+    now = time.monotonic()
+    with _replica_lock:
+        if now - _replica_state["checked_at"] < REPLICA_LAG_CHECK_SEC:
+            return _replica_state["lag_sec"]
+        # проверяет один поток, остальные до конца проверки видят прошлое значение
+        _replica_state["checked_at"] = now
+    try:
+        # сначала позиция primary: всё, что реплика проиграла сверх неё, — уже после проверки
+        try:
+            with engine.connect() as conn:
+                primary_lsn = conn.execute(_PRIMARY_LSN_SQL).scalar()
+        except Exception:
+            primary_lsn = None
+        with replica_engine.connect() as conn:
+            value = conn.execute(_REPLICA_LAG_SQL, {"primary_lsn": primary_lsn}).scalar()
+        lag, err = (float(value), None) if value is not None else (None, "replay position unknown")
+    except Exception as e:
+        lag, err = None, str(e)[:300]
+    with _replica_lock:
+        _replica_state["lag_sec"] = lag
+        _replica_state["error"] = err
+    return lag
+
+
+def read_engine(module: str) -> Engine:
+    """
+    Engine для read-only запросов модуля (передавать __name__): реплика, если
+    модуль включён в DB_READ_REPLICA_MODULES и лаг не больше REPLICA_MAX_LAG_SEC,
+    иначе основной engine. Запись через него не делать.
+    """
+    if replica_engine is None:
+        return engine
+    name = module.rsplit(".", 1)[-1]
+    if "*" not in DB_READ_REPLICA_MODULES and name not in DB_READ_REPLICA_MODULES:
+        return engine
+    lag = replica_lag()
+    key = "routed" if lag is not None and lag <= REPLICA_MAX_LAG_SEC else "fallbacks"
+    with _replica_lock:
+        _replica_state[key] += 1
+    return replica_engine if key == "routed" else engine
+
+
+def replica_stats() -> dict:
+    with _replica_lock:
+        st = dict(_replica_state)
+    st.pop("checked_at", None)
+    return {
+        "configured": replica_engine is not None,
+        "modules": sorted(DB_READ_REPLICA_MODULES),
+        "max_lag_sec": REPLICA_MAX_LAG_SEC,
+        **st,
+        **(_pool_info(replica_engine.pool, DB_REPLICA_MAX_OVERFLOW)
+           if replica_engine is not None and replica_engine.created else {}),
+    }
+
+
+# --- async (asyncpg): отдельный пул, конкуренция ограничена БД, а не потоками ---
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "20" if PROCESS_ROLE == "api" else "2"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "10" if PROCESS_ROLE == "api" else "0"))
+
+
+
+def _make_async_engine():
+    return create_async_engine(
+        database_url().replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1),
+        pool_size=DB_ASYNC_POOL_SIZE,
+        max_overflow=DB_ASYNC_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            "timeout": DB_CONNECT_ARGS["connect_timeout"],
+            "server_settings": {
+                "application_name": f"hhbot-{PROCESS_ROLE}-async",
+                "tcp_keepalives_idle": str(DB_CONNECT_ARGS["keepalives_idle"]),
+            },
+        },
+    )
+
+
+async_engine = _Lazy(_make_async_engine, "async_engine")
+AsyncSessionLocal = _Lazy(
+    lambda: async_sessionmaker(async_engine._get(), expire_on_commit=False, autoflush=False),
+    "AsyncSessionLocal",
+)
+
+
+def _pool_info(pool, max_overflow: int) -> dict:
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+
+def pool_stats() -> dict:
+    with _counters_lock:
+        counters = dict(_pool_counters)
+    # ещё не созданные пулы не создаём ради метрик
+    return {
+        "role": PROCESS_ROLE,
+        "created": engine.created,
+        **(_pool_info(engine.pool, DB_MAX_OVERFLOW) if engine.created else {}),
+        "recycle_sec": DB_POOL_RECYCLE,
+        "pre_ping": DB_POOL_PRE_PING,
+        **counters,
+        "async": _pool_info(async_engine.pool, DB_ASYNC_MAX_OVERFLOW) if async_engine.created else {},
+        "replica": replica_stats(),
+    }
+
+
+@contextmanager
+def pg_conn(bind: Optional[Engine] = None):
+    """
+    Сырое psycopg2-соединение из общего пула — для кода на курсорах.
+    Семантика как у `with psycopg2.connect(...)`: commit/rollback на выходе,
+    но соединение не закрывается, а возвращается в пул.
+    bind — другой engine (например, read_engine(__name__)).
+    """
+    conn = (bind or engine).raw_connection()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -1,34 +1,46 @@
 # backend/app/main.py
 from __future__ import annotations
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from pathlib import Path
-from dotenv import load_dotenv
-from fastapi import FastAPI
+
+from app.core.env import load_env
+
+load_env()
+
 import app.core.compat              # noqa: F401 
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
-from fastapi import FastAPI
 from app.api.router import api_router
 from app.api.v1 import payments_cp, cp_webhooks 
-import os
 
-app = FastAPI(title="HH Bot API")
-app.include_router(payments_cp.router)  
-app.include_router(cp_webhooks.router)
-app.include_router(api_router)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # всё, что ходит в БД или запускает потоки, — здесь, а не на импорте модуля
+    budget = float(os.getenv("STARTUP_IMPORT_BUDGET_SEC", "3"))
+    if app.state.import_sec > budget:
+        print(f"[startup] WARNING: app.main imported in {app.state.import_sec:.2f}s (budget {budget:.0f}s)")
+    else:
+        print(f"[startup] app.main imported in {app.state.import_sec:.2f}s")
+    await asyncio.to_thread(load_schema_registry)
+    # фоновые циклы живут в отдельном процессе: python -m app.worker
+    yield
 
-def _load_env():
-    here = Path(__file__).resolve()
-    for p in [here] + list(here.parents):
-        env = p / ".env"
-        if env.exists():
-            load_dotenv(env.as_posix())
-            break
 
-_load_env()
+app = FastAPI(title="HH Bot API", lifespan=lifespan)
+app.include_router(payments_cp.router)  
+app.include_router(cp_webhooks.router)
+app.include_router(api_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -54,40 +66,15 @@ if ADMIN_DIR:
     def admin_spa(_: str | None = None):
         return FileResponse((ADMIN_DIR / "index.html").as_posix())
 
-import builtins
-try:
-    from app.core.config import _get as __cfg_get, _get_list as __cfg_get_list
-    builtins._get = __cfg_get
-    builtins._get_list = __cfg_get_list
-except Exception:
-    pass
-
-from threading import Thread
 
-def _boot_notifier():
+def load_schema_registry():
+    # колонки/таблицы для админских эндпоинтов — один запрос к каталогу на процесс
     try:
-        from app.services.notifier import start_loop
-        start_loop()
+        from app.services import schema_registry
+        schema_registry.refresh()
+        schema_registry.ensure_listener()
     except Exception as e:
-        print("[notifier] failed to start:", e)
+        print("[schema_registry] failed to load:", e)
 
-if os.getenv("ENABLE_NOTIFIER"):
-    t = Thread(target=_boot_notifier, daemon=True)
-    t.start()
-    print("[notifier] started from main.py")
 
-from sqlalchemy import text
-from app.db import SessionLocal
-
-def ensure_indexes_once():
-    try:
-        with SessionLocal() as db:
-            db.execute(text("""
-                CREATE INDEX IF NOT EXISTS idx_apps_campaign_kind_created
-                ON applications(campaign_id, kind, created_at DESC)
-            """))
-            db.commit()
-    except Exception:
-        pass
-
-ensure_indexes_once()
+app.state.import_sec = time.perf_counter() - _IMPORT_STARTED
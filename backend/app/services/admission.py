@@ -0,0 +1,171 @@
+# backend/app/services/admission.py
+"""
+Admission control для /hh/applications/queue по глобальному бэклогу диспетчера.
+
+- Бэклог: все заявки queued/retry в горячем окне (pending = due + отложенные, в т.ч.
+  отложенные самим admission) — пороги и ETA считаются по нему.
+- Скорость разбора: отправки диспетчера (sent_at) за последние ADMISSION_RATE_WINDOW_MIN
+  минут; updated_at не годится — его двигают просмотры из hh_events и истечение в
+  applications_store.maintain(). Не меньше ADMISSION_MIN_RATE_PER_MIN, чтобы ETA
+  не уходил в бесконечность на простое.
+- ETA = pending / скорость. Снимок кэшируется на ADMISSION_CACHE_SEC (один запрос на процесс);
+  принятое после снимка процесс досчитывает сам (record() — после вставки, по факту).
+- Решение для партии: manual — всегда принимается (с ETA); auto при бэклоге выше
+  мягкого порога — ставится с next_try_at = момент, когда разберут всё стоящее перед ней
+  (партии расходятся во времени, а не приходят одной волной); выше жёсткого порога
+  или дальше ADMISSION_MAX_DEFER_SEC — 429.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+from app.db import engine
+from app.services.applications_store import HOT_DAYS
+from app.services.singleflight import SingleFlight
+from app.services.ttl_cache import TTLCache
+
+CACHE_SEC = float(os.getenv("ADMISSION_CACHE_SEC", "5"))
+RATE_WINDOW_MIN = int(os.getenv("ADMISSION_RATE_WINDOW_MIN", "15"))
+MIN_RATE_PER_MIN = float(os.getenv("ADMISSION_MIN_RATE_PER_MIN", "30"))
+# auto: выше мягкого порога (по числу due или ETA) — откладываем, выше жёсткого — отказ
+SOFT_BACKLOG = int(os.getenv("ADMISSION_SOFT_BACKLOG", "5000"))
+SOFT_ETA_SEC = float(os.getenv("ADMISSION_SOFT_ETA_SEC", "900"))
+HARD_BACKLOG = int(os.getenv("ADMISSION_HARD_BACKLOG", "20000"))
+MAX_DEFER_SEC = float(os.getenv("ADMISSION_MAX_DEFER_SEC", "21600"))
+
+_CACHE = TTLCache("admission", ttl=CACHE_SEC, max_items=4)
+_FLIGHT = SingleFlight("admission", timeout=10)
+
+
+@dataclass
+class Backlog:
+    pending: int
+    due: int
+    deferred: int
+    drained: int
+    drain_per_min: float
+    eta_sec: int
+
+    @property
+    def state(self) -> str:
+        if self.pending >= HARD_BACKLOG:
+            return "rejecting"
+        if self.pending >= SOFT_BACKLOG or self.eta_sec >= SOFT_ETA_SEC:
+            return "deferring"
+        return "ok"
+
+    def as_dict(self) -> dict:
+        return {
+            "pending": self.pending,
+            "due": self.due,
+            "deferred": self.deferred,
+            "drained_window": self.drained,
+            "window_min": RATE_WINDOW_MIN,
+            "drain_per_min": round(self.drain_per_min, 1),
+            "eta_sec": self.eta_sec,
+            "state": self.state,
+            "soft_backlog": SOFT_BACKLOG,
+            "soft_eta_sec": SOFT_ETA_SEC,
+            "hard_backlog": HARD_BACKLOG,
+        }
+
+
+def _compute() -> Backlog:
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT
+              count(*)                                                                  AS pending,
+              count(*) FILTER (WHERE COALESCE(next_try_at, now()) <= now())             AS due,
+              count(*) FILTER (WHERE status = 'queued' AND kind = 'auto' AND next_try_at > now()) AS deferred
+              FROM applications
+             WHERE created_at >= now() - make_interval(days => :hot)
+               AND status IN ('queued', 'retry')
+        """), {"hot": HOT_DAYS}).mappings().first()
+        drained = conn.execute(text("""
+            SELECT count(*)
+              FROM applications
+             WHERE created_at >= now() - make_interval(days => :hot)
+               AND status = 'sent'
+               AND sent_at >= now() - make_interval(mins => :w)
+        """), {"hot": HOT_DAYS, "w": RATE_WINDOW_MIN}).scalar() or 0
+    rate = max(drained / max(RATE_WINDOW_MIN, 1), MIN_RATE_PER_MIN)
+    pending = int(row["pending"] or 0)
+    return Backlog(
+        pending=pending,
+        due=int(row["due"] or 0),
+        deferred=int(row["deferred"] or 0),
+        drained=int(drained),
+        drain_per_min=rate,
+        eta_sec=_eta(pending, rate),
+    )
+
+
+def _eta(n: int, rate: float) -> int:
+    return int(math.ceil(n / rate * 60))
+
+
+async def backlog() -> Backlog:
+    """Снимок бэклога (кэш CACHE_SEC, конкурентные промахи схлопываются)."""
+    cached, state = _CACHE.get("backlog")
+    if state == "fresh":
+        return cached
+
+    async def _load() -> Backlog:
+        snap = await asyncio.to_thread(_compute)
+        _CACHE.set("backlog", snap)
+        return snap
+
+    return await _FLIGHT.do("backlog", _load)
+
+
+@dataclass
+class Decision:
+    admit: bool
+    defer_sec: int
+    eta_sec: int
+    backlog: Backlog
+
+    def as_dict(self) -> dict:
+        return {
+            "eta_sec": self.eta_sec,
+            "deferred_sec": self.defer_sec,
+            "backlog": self.backlog.pending,
+            "backlog_state": self.backlog.state,
+        }
+
+
+# сколько заявок процесс поставил после текущего снимка (снимок в кэше не меняем)
+_admitted = {"snap": None, "n": 0}
+
+
+def _ahead_of_snap(snap: Backlog) -> int:
+    if _admitted["snap"] is not snap:
+        _admitted["snap"], _admitted["n"] = snap, 0
+    return _admitted["n"]
+
+
+def record(snap: Backlog, n: int) -> None:
+    """Учесть n реально поставленных заявок (после квоты и вставки) в очереди перед следующими."""
+    # снимок успел смениться — новый считался позже и эти заявки, скорее всего, уже видит
+    if _admitted["snap"] is snap:
+        _admitted["n"] += max(n, 0)
+
+
+def decide(snap: Backlog, kind: str, n: int) -> Decision:
+    """Решение для партии из n заявок вида kind; в очередь её заносит record()."""
+    ahead = snap.pending + _ahead_of_snap(snap)
+    wait = _eta(ahead, snap.drain_per_min)
+    eta = wait + _eta(n, snap.drain_per_min)
+    if kind != "auto":
+        return Decision(True, 0, eta, snap)
+    if ahead >= HARD_BACKLOG or wait > MAX_DEFER_SEC:
+        return Decision(False, 0, wait, snap)
+    if ahead < SOFT_BACKLOG and wait < SOFT_ETA_SEC:
+        return Decision(True, 0, eta, snap)
+    # следующая партия (после record) встаёт за этой: next_try_at расходятся на n / скорость
+    return Decision(True, wait, eta, snap)
@@ -0,0 +1,275 @@
+# backend/app/services/applications_store.py
+"""
+Запись в секционированную applications (миграция 0041).
+
+applications разбита по месяцам created_at, поэтому уникального
+(user_id, vacancy_id) на ней нет: дедуп держит applications_dedup
+(user_id, vacancy_id) -> (application_id, created_at). Все вставки идут
+через insert_new/upsert — аналоги ON CONFLICT DO NOTHING / DO UPDATE.
+Адрес заявки (id, created_at) из дедупа позволяет обновлять её
+с отсечением секций.
+
+Обслуживание секций (maintain): создаём месяцы вперёд (applications и
+applications_log, миграция 0042), старше APPLICATIONS_RETAIN_MONTHS —
+отсоединяем в applications_archive_YYYYMM (данные остаются отдельной
+таблицей, удаление — вручную).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from app.db import engine
+
+MONTHS_AHEAD = int(os.getenv("APPLICATIONS_PARTITIONS_AHEAD", "3"))
+RETAIN_MONTHS = int(os.getenv("APPLICATIONS_RETAIN_MONTHS", "0"))  # 0 — не отсоединять
+# окно «живых» заявок для воркеров: старше — не берём в отправку (и не трогаем старые секции);
+# queued/retry, выпавшие из окна, maintain() закрывает как error (EXPIRED_ERROR), а не оставляет висеть
+HOT_DAYS = int(os.getenv("APPLICATIONS_HOT_DAYS", "60"))
+EXPIRED_ERROR = "expired: not sent within APPLICATIONS_HOT_DAYS"
+
+# колонки, которые можно передать в values (имена подставляются в SQL)
+_COLUMNS = {
+    "resume_id", "cover_letter", "kind", "status", "source", "meta", "answers",
+    "attempt_count", "campaign_id", "next_try_at", "error",
+}
+_JSONB = {"meta", "answers"}
+
+_NEXT_ID = "nextval(pg_get_serial_sequence('applications', 'id'))"
+
+
+def _columns(values: Dict[str, Any]) -> List[str]:
+    bad = set(values) - _COLUMNS
+    if bad:
+        raise ValueError(f"unknown applications columns: {sorted(bad)}")
+    return sorted(values)
+
+
+def _bind(col: str) -> str:
+    return f"CAST(:v_{col} AS jsonb)" if col in _JSONB else f":v_{col}"
+
+
+def _params(values: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        f"v_{c}": (json.dumps(v) if c in _JSONB and not isinstance(v, str) and v is not None else v)
+        for c, v in values.items()
+    }
+
+
+def _vids(vacancy_ids: Iterable[Any]) -> List[int]:
+    return list(dict.fromkeys(int(v) for v in vacancy_ids))
+
+
+def existing_vacancies(db, user_id: int, vacancy_ids: Optional[Sequence[Any]] = None) -> set[int]:
+    """vacancy_id, на которые пользователь уже откликался (одно чтение дедупа)."""
+    if vacancy_ids is None:
+        rows = db.execute(text("""
+            SELECT vacancy_id FROM applications_dedup WHERE user_id = :u
+        """), {"u": user_id}).scalars().all()
+    else:
+        rows = db.execute(text("""
+            SELECT vacancy_id FROM applications_dedup
+             WHERE user_id = :u AND vacancy_id = ANY(CAST(:vids AS bigint[]))
+        """), {"u": user_id, "vids": _vids(vacancy_ids)}).scalars().all()
+    return {int(v) for v in rows}
+
+
+def locate(db, user_id: int, vacancy_id: Any) -> Optional[Tuple[int, datetime]]:
+    """(id, created_at) заявки по паре пользователь/вакансия — для UPDATE с отсечением секций."""
+    row = db.execute(text("""
+        SELECT application_id, created_at FROM applications_dedup
+         WHERE user_id = :u AND vacancy_id = :v
+    """), {"u": user_id, "v": int(vacancy_id)}).first()
+    return (int(row[0]), row[1]) if row else None
+
+
+def insert_new(db, user_id: int, vacancy_ids: Iterable[Any], **values: Any) -> List[int]:
+    """
+    Вставляет заявки на вакансии, на которые ещё не откликались
+    (ON CONFLICT DO NOTHING). Возвращает vacancy_id вставленных.
+    """
+    vids = _vids(vacancy_ids)
+    if not vids:
+        return []
+    cols = _columns(values)
+    col_sql = "".join(f", {c}" for c in cols)
+    val_sql = "".join(f", {_bind(c)}" for c in cols)
+    rows = db.execute(text(f"""
+        WITH src AS (
+            SELECT DISTINCT v AS vacancy_id FROM unnest(CAST(:vids AS bigint[])) AS v
+        ),
+        claimed AS (
+            INSERT INTO applications_dedup (user_id, vacancy_id, application_id, created_at)
+            SELECT CAST(:uid AS bigint), vacancy_id, {_NEXT_ID}, now()
+              FROM src
+            ON CONFLICT (user_id, vacancy_id) DO NOTHING
+            RETURNING vacancy_id, application_id, created_at
+        )
+        INSERT INTO applications (id, user_id, vacancy_id, created_at, updated_at{col_sql})
+        SELECT c.application_id, CAST(:uid AS bigint), c.vacancy_id, c.created_at, c.created_at{val_sql}
+          FROM claimed c
+        RETURNING vacancy_id
+    """), {"uid": user_id, "vids": vids, **_params(values)}).scalars().all()
+    return [int(v) for v in rows]
+
+
+def upsert(
+    db,
+    user_id: int,
+    vacancy_ids: Iterable[Any],
+    *,
+    values: Dict[str, Any],
+    update_cols: Optional[Iterable[str]] = None,
+    coalesce_cols: Iterable[str] = (),
+    revive_before: Optional[datetime] = None,
+) -> List[Tuple[int, datetime]]:
+    """
+    ON CONFLICT DO UPDATE: новые вставляются, существующие обновляются
+    колонками update_cols (по умолчанию — все из values; coalesce_cols
+    не затираются NULL'ом). Если revive_before задан, у заявок старше него
+    created_at становится now() (строка переезжает в текущую секцию).
+    Возвращает (vacancy_id, created_at) всех затронутых заявок.
+    """
+    vids = _vids(vacancy_ids)
+    if not vids:
+        return []
+    cols = _columns(values)
+    upd = _columns({c: None for c in (update_cols if update_cols is not None else cols)})
+    coalesce = set(coalesce_cols)
+
+    claimed = db.execute(text(f"""
+        WITH src AS (
+            SELECT DISTINCT v AS vacancy_id FROM unnest(CAST(:vids AS bigint[])) AS v
+        ),
+        ins AS (
+            INSERT INTO applications_dedup (user_id, vacancy_id, application_id, created_at)
+            SELECT CAST(:uid AS bigint), vacancy_id, {_NEXT_ID}, now()
+              FROM src
+            ON CONFLICT (user_id, vacancy_id) DO NOTHING
+            RETURNING vacancy_id, application_id, created_at
+        )
+        SELECT vacancy_id, application_id, created_at, TRUE AS is_new FROM ins
+        UNION ALL
+        SELECT d.vacancy_id, d.application_id, d.created_at, FALSE
+          FROM applications_dedup d
+          JOIN src USING (vacancy_id)
+         WHERE d.user_id = :uid
+    """), {"uid": user_id, "vids": vids}).all()
+
+    # ON CONFLICT DO NOTHING ждёт коммита параллельной вставки того же ключа,
+    # но SELECT выше работает на снимке начала оператора и этой строки не видит.
+    # Отдельный оператор (READ COMMITTED — новый снимок) её уже видит.
+    missing = set(vids) - {int(r[0]) for r in claimed}
+    if missing:
+        claimed += db.execute(text("""
+            SELECT vacancy_id, application_id, created_at, FALSE AS is_new
+              FROM applications_dedup
+             WHERE user_id = :uid AND vacancy_id = ANY(CAST(:vids AS bigint[]))
+        """), {"uid": user_id, "vids": sorted(missing)}).all()
+
+    new = [r for r in claimed if r[3]]
+    old = [r for r in claimed if not r[3]]
+    out: List[Tuple[int, datetime]] = []
+    params = _params(values)
+
+    if new:
+        col_sql = "".join(f", {c}" for c in cols)
+        val_sql = "".join(f", {_bind(c)}" for c in cols)
+        rows = db.execute(text(f"""
+            INSERT INTO applications (id, user_id, vacancy_id, created_at, updated_at{col_sql})
+            SELECT n.id, CAST(:uid AS bigint), n.vid, n.ca, n.ca{val_sql}
+              FROM unnest(CAST(:ids AS bigint[]), CAST(:vids AS bigint[]), CAST(:cas AS timestamptz[]))
+                   AS n(id, vid, ca)
+            RETURNING vacancy_id, created_at
+        """), {
+            "uid": user_id,
+            "ids": [r[1] for r in new],
+            "vids": [r[0] for r in new],
+            "cas": [r[2] for r in new],
+            **params,
+        }).all()
+        out.extend((int(r[0]), r[1]) for r in rows)
+
+    if old:
+        sets = [
+            f"{c} = COALESCE({_bind(c)}, a.{c})" if c in coalesce else f"{c} = {_bind(c)}"
+            for c in upd
+        ]
+        sets.append("updated_at = now()")
+        if revive_before is not None:
+            sets.append("created_at = CASE WHEN a.created_at < :revive THEN now() ELSE a.created_at END")
+        # created_at = ANY(...) — отсечение секций по адресу из дедупа
+        rows = db.execute(text(f"""
+            UPDATE applications a
+               SET {", ".join(sets)}
+             WHERE a.id = ANY(CAST(:ids AS bigint[]))
+               AND a.created_at = ANY(CAST(:cas AS timestamptz[]))
+            RETURNING a.id, a.vacancy_id, a.created_at
+        """), {
+            "ids": [r[1] for r in old],
+            "cas": [r[2] for r in old],
+            "revive": revive_before,
+            **{k: v for k, v in params.items() if k[2:] in upd},
+        }).all()
+        out.extend((int(r[1]), r[2]) for r in rows)
+
+        prev = {int(r[1]): r[2] for r in old}
+        moved = [(int(r[0]), r[2]) for r in rows if prev.get(int(r[0])) != r[2]]
+        if moved:
+            db.execute(text("""
+                UPDATE applications_dedup d
+                   SET created_at = m.ca
+                  FROM unnest(CAST(:ids AS bigint[]), CAST(:cas AS timestamptz[])) AS m(id, ca)
+                 WHERE d.user_id = :uid AND d.application_id = m.id
+            """), {"uid": user_id, "ids": [m[0] for m in moved], "cas": [m[1] for m in moved]})
+
+    return out
+
+
+# ---------- обслуживание секций ----------
+
+def maintain() -> dict:
+    """
+    Создаёт секции на MONTHS_AHEAD вперёд, отсоединяет старше RETAIN_MONTHS и
+    закрывает queued/retry старше HOT_DAYS: диспетчер их уже не видит.
+    """
+    with engine.begin() as conn:
+        expired = conn.execute(text("""
+            UPDATE applications
+               SET status = 'error', error = :err, next_try_at = NULL, updated_at = now()
+             WHERE status IN ('queued', 'retry')
+               AND created_at < now() - make_interval(days => :hot)
+        """), {"err": EXPIRED_ERROR, "hot": HOT_DAYS}).rowcount or 0
+        created = conn.execute(
+            text("SELECT applications_ensure_partitions(:n)"), {"n": MONTHS_AHEAD}
+        ).scalar() or 0
+        created += conn.execute(
+            text("SELECT applications_log_ensure_partitions(:n)"), {"n": MONTHS_AHEAD}
+        ).scalar() or 0
+        archived: List[str] = []
+        if RETAIN_MONTHS > 0:
+            archived = list(conn.execute(
+                text("SELECT applications_detach_partitions(:k)"), {"k": RETAIN_MONTHS}
+            ).scalars().all())
+    return {"created": int(created), "archived": archived, "expired": int(expired)}
+
+
+async def run_loop(interval_sec: int | None = None):
+    if interval_sec is None:
+        interval_sec = int(os.getenv("APPLICATIONS_MAINTAIN_EVERY_SEC", "21600"))
+    while True:
+        try:
+            stats = await asyncio.to_thread(maintain)
+            print(f"[applications_store] {stats}")
+        except Exception as e:
+            print(f"[applications_store] maintain failed: {e}")
+        await asyncio.sleep(interval_sec)
+
+
+if __name__ == "__main__":
+    print(maintain())
@@ -6,17 +6,15 @@ import asyncio
 from datetime import datetime, time, timezone, timedelta
 from typing import List, Any, Optional
 
-import httpx
-from sqlalchemy import text, bindparam
+from sqlalchemy import text
 
 from app.db import SessionLocal
-from app.services.limits import quota_for_user, TZ_MSK
+from app.services.hh_client import hh_get
+from app.services.limits import quota_for_user, reserve_quota, TZ_MSK
+from app.services import applications_store
 from app.services.notifier import notify_quota_exhausted_once
 from urllib.parse import parse_qsl, urlencode
 
-HH_API = "https://api.hh.ru"
-UA = "hhbot/1.0"
-
 
 def _to_time(v: Any) -> time:
     """Принимает time | 'HH:MM' | любое → возвращает корректное time."""
@@ -44,8 +42,6 @@ async def _fetch_vacancy_ids(token: str, query: str, limit: int, date_from: Opti
     if limit <= 0:
         return []
 
-    headers = {"Authorization": f"Bearer {token}", "User-Agent": UA}
-
     base_pairs: list[tuple[str, str]] = []
     if query:
         base_pairs = parse_qsl(query, keep_blank_values=True)
@@ -60,23 +56,25 @@ async def _fetch_vacancy_ids(token: str, query: str, limit: int, date_from: Opti
     out: List[int] = []
     page = 0
     per_page = 100
-    async with httpx.AsyncClient(timeout=15.0, headers=headers) as client:
-        while len(out) < limit and page < 10:
-            url = f"{HH_API}/vacancies?{query_str}&page={page}&per_page={per_page}"
-            r = await client.get(url)
-            if r.status_code != 200:
-                break
-            items = r.json().get("items", [])
-            if not items:
+    while len(out) < limit and page < 10:
+        r = await hh_get(
+            f"/vacancies?{query_str}&page={page}&per_page={per_page}",
+            access_token=token,
+            timeout=15.0,
+        )
+        if r.status_code != 200:
+            break
+        items = r.json().get("items", [])
+        if not items:
+            break
+        for it in items:
+            try:
+                out.append(int(it["id"]))
+            except Exception:
+                pass
+            if len(out) >= limit:
                 break
-            for it in items:
-                try:
-                    out.append(int(it["id"]))
-                except Exception:
-                    pass
-                if len(out) >= limit:
-                    break
-            page += 1
+        page += 1
     return out
     
 async def dispatch_auto_once() -> dict:
@@ -181,38 +179,21 @@ async def dispatch_auto_once() -> dict:
             if ids:
                 ids = list(dict.fromkeys(int(v) for v in ids))[:allowed]
 
-                existing = db.execute(text("""
-                    SELECT vacancy_id
-                    FROM applications
-                    WHERE user_id = :uid AND vacancy_id = ANY(:vids)
-                """), {"uid": r["user_id"], "vids": ids}).scalars().all()
-                existing_set = set(int(x) for x in existing)
+                existing_set = applications_store.existing_vacancies(db, r["user_id"], ids)
                 to_insert = [int(v) for v in ids if int(v) not in existing_set]
+                # резерв квоты: строка счётчика заблокирована до commit по кампании
+                to_insert = to_insert[:reserve_quota(db, r["user_id"], len(to_insert))]
 
                 # Текст письма
                 raw_cl = r.get("cover_letter")
                 cl = (str(raw_cl).rstrip() if raw_cl is not None else "Здравствуйте! Откликаюсь на вакансию.")
 
                 if to_insert:
-                    stmt = text("""
-                        WITH src(vid) AS (VALUES :vids),
-                        ins AS (
-                          INSERT INTO applications
-                            (user_id, vacancy_id, resume_id, cover_letter, kind, status,
-                             next_try_at, created_at, updated_at, campaign_id)
-                          SELECT :uid, src.vid, :rid, :cl, 'auto', 'queued',
-                                 NULL, now(), now(), :cid
-                          FROM src
-                          ON CONFLICT (user_id, vacancy_id) DO NOTHING
-                          RETURNING 1
-                        )
-                        SELECT count(*) FROM ins
-                    """).bindparams(bindparam("vids", expanding=True))
-
-                    inserted = db.execute(
-                        stmt,
-                        {"uid": r["user_id"], "rid": r["resume_id"], "cid": cid, "vids": to_insert, "cl": cl},
-                    ).scalar() or 0
+                    inserted = len(applications_store.insert_new(
+                        db, r["user_id"], to_insert,
+                        resume_id=r["resume_id"], cover_letter=cl, kind="auto", status="queued",
+                        next_try_at=None, campaign_id=cid,
+                    ))
 
             if inserted > 0:
                 db.execute(text("""
@@ -224,6 +205,7 @@ async def dispatch_auto_once() -> dict:
                 """), {"cid": cid, "n": inserted})
 
             queued_total += inserted
+            db.commit()
 
         db.commit()
 
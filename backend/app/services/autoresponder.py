@@ -1,7 +1,8 @@
 # file: services/autoresponder.py
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
-from app.services.limits import quota_for_user
+from app.services.limits import quota_for_user, reserve_quota
+from app.services import applications_store
 
 def plan_autoresponses(engine: Engine, hh_search):
     """
@@ -48,32 +49,23 @@ def plan_autoresponses(engine: Engine, hh_search):
             vacancy_ids = [str(v["id"]) for v in vacancies]
 
             # 5) Отбрасываем уже имеющиеся заявки
-            existing = conn.execute(text("""
-                SELECT vacancy_id
-                  FROM applications
-                 WHERE user_id = :uid
-                   AND vacancy_id = ANY(:vids::text[])
-            """), {"uid": row["user_id"], "vids": vacancy_ids}).scalars().all()
-            existing_set = set(str(x) for x in existing)
+            existing_set = {
+                str(v) for v in applications_store.existing_vacancies(
+                    conn, row["user_id"], [v for v in vacancy_ids if v.isdigit()]
+                )
+            }
 
             to_queue = [vid for vid in vacancy_ids if vid not in existing_set][:allowed]
+            to_queue = to_queue[:reserve_quota(conn, row["user_id"], len(to_queue))]
             if not to_queue:
                 continue
 
             # 6) Массовая вставка
-            inserted = conn.execute(text("""
-                INSERT INTO applications (user_id, vacancy_id, cover_letter,
-                                          status, kind, resume_id, answers)
-                SELECT :uid, v.vid, :cover, 'queued', 'auto', :resume_id, '[]'::jsonb
-                  FROM UNNEST(:vids::text[]) AS v(vid)
-                ON CONFLICT ON CONSTRAINT uq_applications_user_vacancy DO NOTHING
-                RETURNING id
-            """), {
-                "uid": row["user_id"],
-                "vids": to_queue,
-                "cover": row["cover_letter"],
-                "resume_id": row["resume_id"],
-            }).rowcount or 0
+            inserted = len(applications_store.insert_new(
+                conn, row["user_id"], [v for v in to_queue if v.isdigit()],
+                cover_letter=row["cover_letter"], status="queued", kind="auto",
+                resume_id=row["resume_id"], answers=[],
+            ))
 
             if inserted > 0:
                 conn.execute(text("""
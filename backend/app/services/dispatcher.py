@@ -2,9 +2,10 @@
 from __future__ import annotations
 
 import asyncio
+import os
 from datetime import datetime, timedelta, timezone
 import re
-from typing import Optional
+from typing import List, Optional
 
 import httpx
 from sqlalchemy import text
@@ -15,6 +16,7 @@ from app.services.hh_client import (
 )
 from app.services.limits import quota_for_user, today_bounds_msk
 from app.services.notifier import notify_quota_exhausted_once
+from app.services.applications_store import HOT_DAYS
 
 import logging
 import json
@@ -23,6 +25,8 @@ import json
 BATCH_SIZE = 50
 MAX_ATTEMPTS = 5
 BACKOFF_SECONDS = [60, 300, 900, 3600, 86400]  # 1м, 5м, 15м, 1ч, 24ч
+# аренда захваченной пачки: дольше, чем занимает отправка BATCH_SIZE заявок
+CLAIM_LEASE_SEC = int(os.getenv("DISPATCH_CLAIM_LEASE_SEC", "900"))
 
 
 def _backoff(attempt: int) -> int:
@@ -87,25 +91,67 @@ def _classify_reason(msg: str) -> str | None:
 
     return None
     
-async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
+async def dispatch_once(
+    dry_run: bool = False,
+    limit: int = BATCH_SIZE,
+    shards: Optional[List[int]] = None,
+    shard_count: int = 0,
+) -> dict:
+    """
+    shards/shard_count — только заявки пользователей с user_id % shard_count IN shards
+    (шарды захватываются через services/leader.py, чтобы реплики не брали одни и те же строки).
+    """
     taken = sent = retried = failed = skipped = 0
+    if shard_count and not shards:
+        return {"taken": 0, "sent": 0, "retried": 0, "failed": 0, "skipped": 0}
+    shard_sql = "AND mod(user_id, :n) = ANY(:shards)" if shard_count else ""
 
-    with SessionLocal() as db:
-        rows = db.execute(text("""
-            SELECT id, user_id, vacancy_id, resume_id, cover_letter, attempt_count
-              FROM applications
-             WHERE
+    due_sql = f"""
+        SELECT id, created_at
+          FROM applications
+         WHERE created_at >= now() - make_interval(days => :hot)   -- только «горячие» секции
+           AND (
                (status = 'queued' AND COALESCE(next_try_at, now()) <= now())
                 OR
                (status = 'retry'  AND next_try_at <= now())
-             ORDER BY id
-             LIMIT :lim
-        """), {"lim": limit}).mappings().all()
+           )
+           {shard_sql}
+         ORDER BY id
+         LIMIT :lim
+    """
+    params = {"lim": limit, "hot": HOT_DAYS, "n": shard_count, "shards": list(shards or [])}
+
+    with SessionLocal() as db:
+        if dry_run:
+            rows = db.execute(text(f"""
+                SELECT a.id, a.created_at, a.user_id, a.vacancy_id, a.resume_id, a.cover_letter, a.attempt_count
+                  FROM applications a
+                  JOIN ({due_sql}) d ON d.id = a.id AND d.created_at = a.created_at
+            """), params).mappings().all()
+        else:
+            # захват: next_try_at сдвигается на аренду, и строка перестаёт быть «due» для
+            # других вызовов (воркер, POST /hh/applications/dispatch, реплики); SKIP LOCKED —
+            # параллельный захват пропускает чужие строки, а не ждёт их. Каждый исход ниже
+            # перезаписывает статус; если процесс упал посреди пачки, строки снова станут
+            # due по истечении CLAIM_LEASE_SEC.
+            rows = db.execute(text(f"""
+                UPDATE applications a
+                   SET next_try_at = now() + make_interval(secs => :lease)
+                  FROM ({due_sql} FOR UPDATE SKIP LOCKED) d
+                 WHERE a.id = d.id AND a.created_at = d.created_at
+                RETURNING a.id, a.created_at, a.user_id, a.vacancy_id, a.resume_id, a.cover_letter, a.attempt_count
+            """), {**params, "lease": CLAIM_LEASE_SEC}).mappings().all()
+        rows = sorted(rows, key=lambda r: r["id"])
 
         taken = len(rows)
+        # захват фиксируем сразу: дальше строки обновляются по одной
+        db.commit()
 
         for r in rows:
             app_id = r["id"]
+            # коммит на каждую заявку (finally): UPDATE статуса через триггер 0043 держит
+            # строку campaign_stats кампании до commit — вставки в эту кампанию
+            # (queue, send_now, auto_tick) не должны ждать сетевые вызовы HH всей пачки
             try:
                 if dry_run:
                     skipped += 1
@@ -122,8 +168,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                            SET status='error',
                                error='no hh access_token for user',
                                updated_at=now()
-                         WHERE id=:id
-                    """), {"id": app_id})
+                         WHERE id=:id AND created_at=:ca
+                    """), {"id": app_id, "ca": r["created_at"]})
                     failed += 1
                     continue
                 q = quota_for_user(db, r["user_id"])
@@ -135,8 +181,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                            SET status='retry',
                                next_try_at = :nta,
                                updated_at = now()
-                         WHERE id = :id
-                    """), {"id": app_id, "nta": end_utc})
+                         WHERE id=:id AND created_at=:ca
+                    """), {"id": app_id, "ca": r["created_at"], "nta": end_utc})
                     notify_quota_exhausted_once(db, r["user_id"], q["reset_time"], q["tariff"])
                     skipped += 1
                     continue
@@ -156,8 +202,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                sent_at=COALESCE(sent_at, now()),
                                error=:er,
                                updated_at=now()
-                         WHERE id=:id
-                    """), {"id": app_id, "er": f"already_applied: {str(e)[:400]}"})
+                         WHERE id=:id AND created_at=:ca
+                    """), {"id": app_id, "ca": r["created_at"], "er": f"already_applied: {str(e)[:400]}"})
                     sent += 1
                 except HHNonRetryable as e:
                     msg = str(e)
@@ -172,8 +218,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                SET status='error',
                                    error=:reason,
                                    updated_at=now()
-                             WHERE id=:id
-                        """), {"id": app_id, "reason": reason})
+                             WHERE id=:id AND created_at=:ca
+                        """), {"id": app_id, "ca": r["created_at"], "reason": reason})
                         skipped += 1
                     else:
                         db.execute(text("""
@@ -181,8 +227,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                SET status='error',
                                    error=:er,
                                    updated_at=now()
-                             WHERE id=:id
-                        """), {"id": app_id, "er": f"non-retryable: {msg[:500]}"})
+                             WHERE id=:id AND created_at=:ca
+                        """), {"id": app_id, "ca": r["created_at"], "er": f"non-retryable: {msg[:500]}"})
                         failed += 1
                 except HHUnauthorized as e:
                     # авторизация — быстрый ретрай (можно вставить refresh_access_token())
@@ -196,8 +242,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                attempt_count=:ac,
                                next_try_at=:nta,
                                updated_at=now()
-                         WHERE id=:id
-                    """), {"id": app_id, "er": f"401 unauthorized: {str(e)[:450]}", "ac": attempt, "nta": next_try})
+                         WHERE id=:id AND created_at=:ca
+                    """), {"id": app_id, "ca": r["created_at"], "er": f"401 unauthorized: {str(e)[:450]}", "ac": attempt, "nta": next_try})
                     retried += 1
                 except HHError as e:
                     msg = str(e)
@@ -212,8 +258,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                SET status='error',
                                    error=:reason,
                                    updated_at=now()
-                             WHERE id=:id
-                        """), {"id": app_id, "reason": reason})
+                             WHERE id=:id AND created_at=:ca
+                        """), {"id": app_id, "ca": r["created_at"], "reason": reason})
                         skipped += 1
                     else:
                         attempt = int(r["attempt_count"] or 0) + 1
@@ -224,8 +270,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                        error=:er,
                                        attempt_count=:ac,
                                        updated_at=now()
-                                 WHERE id=:id
-                            """), {"id": app_id, "er": f"max attempts; last: {msg[:500]}", "ac": attempt})
+                                 WHERE id=:id AND created_at=:ca
+                            """), {"id": app_id, "ca": r["created_at"], "er": f"max attempts; last: {msg[:500]}", "ac": attempt})
                             failed += 1
                         else:
                             delay = _backoff(attempt - 1)
@@ -237,8 +283,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                        attempt_count=:ac,
                                        next_try_at=:nta,
                                        updated_at=now()
-                                 WHERE id=:id
-                            """), {"id": app_id, "er": msg[:500], "ac": attempt, "nta": next_try})
+                                 WHERE id=:id AND created_at=:ca
+                            """), {"id": app_id, "ca": r["created_at"], "er": msg[:500], "ac": attempt, "nta": next_try})
                             retried += 1
     
                 else:
@@ -249,8 +295,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                sent_at=now(),
                                error=NULL,
                                updated_at=now()
-                         WHERE id=:id
-                    """), {"id": app_id})
+                         WHERE id=:id AND created_at=:ca
+                    """), {"id": app_id, "ca": r["created_at"]})
                     sent += 1
             except Exception as e:
                 # неожиданные — в ретрай/ошибку по лимиту
@@ -262,8 +308,8 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                error=:er,
                                attempt_count=:ac,
                                updated_at=now()
-                         WHERE id=:id
-                    """), {"id": app_id, "er": f"unexpected: {str(e)[:500]}", "ac": attempt})
+                         WHERE id=:id AND created_at=:ca
+                    """), {"id": app_id, "ca": r["created_at"], "er": f"unexpected: {str(e)[:500]}", "ac": attempt})
                     failed += 1
                 else:
                     delay = _backoff(attempt - 1)
@@ -275,11 +321,11 @@ async def dispatch_once(dry_run: bool = False, limit: int = BATCH_SIZE) -> dict:
                                attempt_count=:ac,
                                next_try_at=:nta,
                                updated_at=now()
-                         WHERE id=:id
-                    """), {"id": app_id, "er": f"unexpected: {str(e)[:500]}", "ac": attempt, "nta": next_try})
+                         WHERE id=:id AND created_at=:ca
+                    """), {"id": app_id, "ca": r["created_at"], "er": f"unexpected: {str(e)[:500]}", "ac": attempt, "nta": next_try})
                     retried += 1
-
-        db.commit()
+            finally:
+                db.commit()
 
     return {
         "taken": taken,
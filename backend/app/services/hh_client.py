@@ -1,10 +1,74 @@
 # app/services/hh_client.py
+import asyncio
+import hashlib
 import os
 import httpx
 
+from app.services.hh_replay import hh_transport
+from app.services.singleflight import SingleFlight
+
 HH_API = os.getenv("HH_API_BASE", "https://api.hh.ru")
 UA = os.getenv("HH_USER_AGENT", "hhbot/1.0")
 
+# одинаковые конкурентные GET в HH (areas, vacancies?..., vacancies/{id}) идут одним запросом
+HH_GET_FLIGHT = SingleFlight("hh_get", timeout=float(os.getenv("HH_COALESCE_TIMEOUT_SEC", "25")))
+
+_client_state: dict = {"client": None, "loop": None}
+
+
+def _client() -> httpx.AsyncClient:
+    """Общий AsyncClient (пул соединений) на текущий event loop."""
+    loop = asyncio.get_running_loop()
+    client = _client_state["client"]
+    if client is None or client.is_closed or _client_state["loop"] is not loop:
+        client = httpx.AsyncClient(
+            timeout=20.0,
+            headers={"User-Agent": UA, "HH-User-Agent": UA, "Accept": "application/json"},
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            transport=hh_transport(),
+        )
+        _client_state["client"], _client_state["loop"] = client, loop
+    return client
+
+
+async def aclose() -> None:
+    """Закрыть пул соединений (shutdown воркера)."""
+    client = _client_state["client"]
+    _client_state["client"], _client_state["loop"] = None, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def _flight_key(path: str, params, access_token: str | None) -> tuple:
+    items = []
+    for k, v in sorted((params or {}).items()):
+        if isinstance(v, (list, tuple)):
+            items.append((k, tuple(str(x) for x in v)))
+        else:
+            items.append((k, str(v)))
+    # ответы с токеном персональные — ключуем по хэшу токена
+    tok = hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16] if access_token else ""
+    return (path, tuple(items), tok)
+
+
+async def hh_get(
+    path: str,
+    params: dict | None = None,
+    *,
+    access_token: str | None = None,
+    timeout: float | None = None,
+) -> httpx.Response:
+    """
+    GET в HH API через общий клиент со схлопыванием одинаковых запросов.
+    Ответ один на всех ожидающих — тело уже прочитано, его можно только читать.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"} if access_token else None
+
+    async def call() -> httpx.Response:
+        return await _client().get(f"{HH_API.rstrip('/')}{path}", params=params, headers=headers)
+
+    return await HH_GET_FLIGHT.do(_flight_key(path, params, access_token), call, timeout=timeout)
+
 
 class HHError(Exception):
     """Ретраибельная ошибка (сеть/429/5xx/неясная 4xx)."""
@@ -72,7 +136,7 @@ async def send_response(
         form["message"] = msg
 
     try:
-        async with httpx.AsyncClient(timeout=20.0, headers=headers) as client:
+        async with httpx.AsyncClient(timeout=20.0, headers=headers, transport=hh_transport()) as client:
             r = await client.post(f"{HH_API}/negotiations", data=form)
             if r.status_code in (200, 201, 202, 204):
                 return
@@ -110,14 +174,12 @@ async def send_response(
         raise HHError(f"httpx: {e!s}") from e
 
 async def get_vacancy(access_token: str, vacancy_id: int) -> dict:
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "User-Agent": UA,
-        "HH-User-Agent": UA,
-        "Accept": "application/json",
-    }
-    async with httpx.AsyncClient(timeout=15.0, headers=headers) as client:
-        r = await client.get(f"{HH_API}/vacancies/{vacancy_id}")
-        if r.status_code == 200:
-            return r.json()
-        raise HHError(f"vacancy_fetch {r.status_code}/{r.text}")
\ No newline at end of file
+    try:
+        r = await hh_get(f"/vacancies/{vacancy_id}", access_token=access_token, timeout=15.0)
+    except asyncio.TimeoutError as e:
+        raise HHError("vacancy_fetch timeout") from e
+    except httpx.RequestError as e:
+        raise HHError(f"httpx: {e!s}") from e
+    if r.status_code == 200:
+        return r.json()
+    raise HHError(f"vacancy_fetch {r.status_code}/{r.text}")
\ No newline at end of file
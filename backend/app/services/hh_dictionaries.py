@@ -0,0 +1,146 @@
+# backend/app/services/hh_dictionaries.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.services.hh_client import hh_get
+from app.services.singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+# справочники HH меняются редко — держим снапшот в памяти и обновляем в фоне
+REFRESH_SEC = float(os.getenv("HH_DICT_REFRESH_SEC", "21600"))
+RETRY_SEC = float(os.getenv("HH_DICT_RETRY_SEC", "300"))
+
+_REFRESH = SingleFlight("hh_dictionaries", timeout=60.0)
+
+_state: Dict[str, Any] = {
+    "snapshot": None,     # dict, отдаётся как есть
+    "etag": None,
+    "loaded_at": 0.0,     # monotonic последней успешной загрузки
+    "next_try": 0.0,      # monotonic, раньше которого не пробуем обновлять
+    "error": None,
+}
+_bg_tasks: set[asyncio.Task] = set()
+
+
+async def _fetch(path: str) -> Any:
+    r = await hh_get(path, timeout=20.0)
+    if r.status_code != 200:
+        raise RuntimeError(f"HH {path} -> {r.status_code}")
+    return r.json()
+
+
+def build_snapshot(roles_payload: dict, dicts_payload: dict) -> dict:
+    """
+    Собирает снапшот с готовыми индексами:
+      categories       — [{id, name}] в порядке HH
+      category_roles   — category_id -> [role_id]
+      role_category    — role_id -> category_id (первая категория в порядке HH)
+      roles            — role_id -> name
+      employment/schedule/experience — [{id, name}]
+    """
+    categories: List[dict] = []
+    category_roles: Dict[str, List[str]] = {}
+    role_category: Dict[str, str] = {}
+    roles: Dict[str, str] = {}
+
+    for cat in roles_payload.get("categories") or []:
+        cid = str(cat.get("id"))
+        categories.append({"id": cid, "name": cat.get("name") or cid})
+        rids: List[str] = []
+        for role in cat.get("roles") or []:
+            rid = str(role.get("id"))
+            rids.append(rid)
+            roles.setdefault(rid, role.get("name") or rid)
+            role_category.setdefault(rid, cid)
+        category_roles[cid] = rids
+
+    def _items(key: str) -> List[dict]:
+        return [
+            {"id": str(x.get("id")), "name": x.get("name") or str(x.get("id"))}
+            for x in (dicts_payload.get(key) or [])
+            if isinstance(x, dict) and x.get("id") is not None
+        ]
+
+    return {
+        "categories": categories,
+        "category_roles": category_roles,
+        "role_category": role_category,
+        "roles": roles,
+        "employment": _items("employment"),
+        "schedule": _items("schedule"),
+        "experience": _items("experience"),
+    }
+
+
+def _etag_of(snapshot: dict) -> str:
+    raw = json.dumps(snapshot, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return '"' + hashlib.sha1(raw).hexdigest() + '"'
+
+
+async def _refresh() -> dict:
+    try:
+        roles_payload, dicts_payload = await asyncio.gather(
+            _fetch("/professional_roles"), _fetch("/dictionaries")
+        )
+        snapshot = build_snapshot(roles_payload, dicts_payload)
+        if not snapshot["categories"]:
+            raise RuntimeError("HH /professional_roles: пустой список категорий")
+    except Exception as e:
+        _state["error"] = str(e)
+        _state["next_try"] = time.monotonic() + RETRY_SEC
+        raise
+
+    now = time.monotonic()
+    etag = _etag_of(snapshot)
+    if etag != _state["etag"]:
+        log.info("hh dictionaries updated: %s categories, %s roles", len(snapshot["categories"]), len(snapshot["roles"]))
+    snapshot["updated_at"] = datetime.now(timezone.utc).isoformat()
+    _state.update(snapshot=snapshot, etag=etag, loaded_at=now, next_try=now + REFRESH_SEC, error=None)
+    return snapshot
+
+
+def _refresh_in_background() -> None:
+    async def run() -> None:
+        try:
+            await _REFRESH.do("refresh", _refresh)
+        except Exception as e:
+            log.warning("hh dictionaries refresh failed: %s", e)
+
+    task = asyncio.create_task(run())
+    _bg_tasks.add(task)
+    task.add_done_callback(_bg_tasks.discard)
+
+
+async def get_snapshot() -> tuple[dict, str]:
+    """
+    (snapshot, etag). Первый вызов ждёт загрузки, дальше отдаём из памяти,
+    а устаревший снапшот обновляем в фоне.
+    """
+    if _state["snapshot"] is None:
+        await _REFRESH.do("refresh", _refresh)
+    elif time.monotonic() >= _state["next_try"] and not _REFRESH.stats()["in_flight"]:
+        _state["next_try"] = time.monotonic() + RETRY_SEC
+        _refresh_in_background()
+    return _state["snapshot"], _state["etag"]
+
+
+def stats() -> dict:
+    snap: Optional[dict] = _state["snapshot"]
+    return {
+        "loaded": snap is not None,
+        "etag": _state["etag"],
+        "updated_at": snap.get("updated_at") if snap else None,
+        "age_sec": round(time.monotonic() - _state["loaded_at"], 1) if snap else None,
+        "categories": len(snap["categories"]) if snap else 0,
+        "roles": len(snap["roles"]) if snap else 0,
+        "last_error": _state["error"],
+    }
@@ -1,29 +1,44 @@
 # app/services/hh_events.py 
 from sqlalchemy import text
+
+from app.services import applications_store
+
 EVENT_MAP = {
     "viewed": "viewed", "resume_viewed": "viewed", "read": "viewed", "seen": "viewed",
     "invite": "invited", "invited": "invited", "offer": "invited",
     "rejected": "declined", "declined": "declined", "denied": "declined", "failed": "declined",
 }
 
+# smallint-коды applications_log.event_code (миграция 0042, application_event_code())
+EVENT_CODES = {
+    "queued": 1, "sent": 2, "error": 3, "retry": 4, "canceled": 5,
+    "viewed": 10, "invited": 11, "declined": 12,
+}
+# колонка текущего состояния на applications
+STATE_COLUMN = {"viewed": "viewed_at", "invited": "invited_at", "declined": "declined_at"}
+
 def apply_hh_event(session, *, user_id:int, resume_uuid:str, vacancy_id:int, event:str):
     ev = EVENT_MAP.get(event.lower().strip())
     if not ev:
         return 0
-    app_id = session.execute(text("""
-        SELECT id FROM applications
-        WHERE user_id=:u AND vacancy_id=:v AND resume_id=:r
-    """), {"u": user_id, "v": vacancy_id, "r": resume_uuid}).scalar_one_or_none()
+    # адрес заявки из дедупа; created_at в условии — обращение только к её секции
+    loc = applications_store.locate(session, user_id, vacancy_id)
+    if not loc:
+        return 0
+    app_id, created_at = loc
+    col = STATE_COLUMN[ev]
+    # состояние — на самой заявке (первое время события); статус — только для итоговых
+    status_sql = ", status=:st" if ev in ("invited", "declined") else ""
+    app_id = session.execute(text(f"""
+        UPDATE applications
+           SET {col}=COALESCE({col}, now()){status_sql}, updated_at=now()
+         WHERE id=:id AND created_at=:ca AND resume_id=:r
+        RETURNING id
+    """), {"id": app_id, "ca": created_at, "r": resume_uuid, "st": ev}).scalar_one_or_none()
     if not app_id:
         return 0
-    # если целевой статус — обновляем саму заявку
-    if ev in ("invited","declined"):
-        session.execute(text("""
-            UPDATE applications SET status=:st, updated_at=now()
-            WHERE id=:id
-        """), {"st": ev, "id": app_id})
     # обязательно логируем событие
     session.execute(text("""
-        INSERT INTO applications_log (application_id, event) VALUES (:id, :ev)
-    """), {"id": app_id, "ev": ev})
+        INSERT INTO applications_log (application_id, event_code) VALUES (:id, :code)
+    """), {"id": app_id, "code": EVENT_CODES[ev]})
     return 1
@@ -5,16 +5,9 @@ from typing import Optional, Tuple
 
 import requests
 from sqlalchemy import text
-from sqlalchemy.engine import Engine
-from sqlalchemy import create_engine
 
 from app.core.config import settings
-
-engine: Engine = create_engine(
-    settings.database_url,
-    future=True, pool_pre_ping=True, pool_size=3, max_overflow=3, pool_timeout=10,
-    connect_args={"connect_timeout": 5},
-)
+from app.db import engine
 
 def refresh_access_token(*, user_id: int) -> Tuple[bool, Optional[str]]:
     """
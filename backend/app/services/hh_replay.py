@@ -0,0 +1,234 @@
+# backend/app/services/hh_replay.py
+"""
+Запись/воспроизведение HTTP-обмена с HH API (фикстуры для тестов и бенчмарков).
+
+HH_REPLAY_MODE:
+  off    — обычная сеть (по умолчанию);
+  record — ходим в HH и сохраняем пары запрос/ответ в HH_FIXTURES_DIR;
+  replay — отвечаем из фикстур, без сети.
+
+В replay можно добавить задержку (HH_REPLAY_LATENCY_MS) и долю
+искусственных 503 (HH_REPLAY_ERROR_RATE, детерминированно по HH_REPLAY_SEED).
+
+Формат фикстуры (один JSON-файл на пару):
+  {"name": "...",
+   "request":  {"method": "GET", "path": "/vacancies",
+                "query": [["text", "python"], ...] | null,   # null — любой query
+                "form": {"vacancy_id": "1"}},                # опционально, по подмножеству
+   "response": {"status": 200, "headers": {...}, "json": {...}}}
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+import httpx
+
+log = logging.getLogger(__name__)
+
+MODE = (os.getenv("HH_REPLAY_MODE") or "off").strip().lower()
+FIXTURES_DIR = Path(
+    os.getenv("HH_FIXTURES_DIR") or Path(__file__).resolve().parents[2] / "fixtures" / "hh"
+)
+LATENCY_MS = float(os.getenv("HH_REPLAY_LATENCY_MS", "0"))
+ERROR_RATE = float(os.getenv("HH_REPLAY_ERROR_RATE", "0"))
+SEED = os.getenv("HH_REPLAY_SEED", "42")
+
+# заголовки ответа, которые имеет смысл сохранять
+_KEEP_HEADERS = {"content-type", "retry-after", "location"}
+
+
+def _plain_headers(response: httpx.Response) -> List[tuple]:
+    """Тело уже раскодировано — выкидываем content-encoding/length."""
+    return [
+        (k, v) for k, v in response.headers.multi_items()
+        if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+    ]
+
+
+def _query_of(request: httpx.Request) -> List[List[str]]:
+    return sorted([k, v] for k, v in request.url.params.multi_items())
+
+
+def _form_of(request: httpx.Request) -> Dict[str, str]:
+    ctype = (request.headers.get("content-type") or "").lower()
+    if request.method == "GET" or "application/x-www-form-urlencoded" not in ctype:
+        return {}
+    try:
+        body = request.content.decode("utf-8")
+    except Exception:
+        return {}
+    return {k: v for k, v in parse_qsl(body) if k != "message"}
+
+
+class _FixtureStore:
+    def __init__(self, root: Path):
+        self.root = root
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[tuple, List[dict]]] = None
+
+        self.served = 0
+        self.misses = 0
+        self.injected = 0
+        self.recorded = 0
+
+    def _load(self) -> Dict[tuple, List[dict]]:
+        with self._lock:
+            if self._index is None:
+                index: Dict[tuple, List[dict]] = {}
+                for f in sorted(self.root.glob("*.json")):
+                    try:
+                        fx = json.loads(f.read_text(encoding="utf-8"))
+                        req = fx["request"]
+                        index.setdefault((req["method"].upper(), req["path"]), []).append(fx)
+                    except Exception as e:
+                        log.warning("bad HH fixture %s: %s", f, e)
+                self._index = index
+            return self._index
+
+    def match(self, request: httpx.Request) -> Optional[dict]:
+        cands = self._load().get((request.method.upper(), request.url.path), [])
+        query, form = _query_of(request), _form_of(request)
+        # точное совпадение query важнее шаблона (query = null)
+        for exact in (True, False):
+            for fx in cands:
+                req = fx["request"]
+                q = req.get("query")
+                if exact != (q is not None):
+                    continue
+                if q is not None and sorted(q) != query:
+                    continue
+                if any(form.get(k) != str(v) for k, v in (req.get("form") or {}).items()):
+                    continue
+                return fx
+        return None
+
+    def save(self, request: httpx.Request, response: httpx.Response, body: bytes) -> None:
+        query, form = _query_of(request), _form_of(request)
+        try:
+            payload: Any = json.loads(body.decode("utf-8")) if body else None
+            resp = {"json": payload}
+        except Exception:
+            resp = {"text": body.decode("utf-8", "replace")}
+        fx = {
+            "name": f"{request.method} {request.url.path}",
+            "request": {"method": request.method, "path": request.url.path, "query": query},
+            "response": {
+                "status": response.status_code,
+                "headers": {k: v for k, v in response.headers.items() if k.lower() in _KEEP_HEADERS},
+                **resp,
+            },
+        }
+        if form:
+            fx["request"]["form"] = form
+        digest = hashlib.sha1(
+            json.dumps([request.method, request.url.path, query, form]).encode("utf-8")
+        ).hexdigest()[:10]
+        slug = re.sub(r"[^a-z0-9]+", "_", request.url.path.lower()).strip("_") or "root"
+        path = self.root / f"{request.method.lower()}_{slug}_{digest}.json"
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(fx, ensure_ascii=False, indent=2), encoding="utf-8")
+            self._index = None
+            self.recorded += 1
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Транспорт httpx для sync- и async-клиентов: record поверх реальной сети либо replay."""
+
+    def __init__(self, mode: str = MODE, root: Path = FIXTURES_DIR, *,
+                 latency_ms: float = LATENCY_MS, error_rate: float = ERROR_RATE, seed: str = SEED):
+        self.mode = mode
+        self.store = _FixtureStore(Path(root))
+        self.latency = max(0.0, latency_ms) / 1000.0
+        self.error_rate = max(0.0, min(1.0, error_rate))
+        self._rnd = random.Random(seed)
+        self._rnd_lock = threading.Lock()
+        self._sync_net: Optional[httpx.HTTPTransport] = None
+        self._async_net: Optional[httpx.AsyncHTTPTransport] = None
+
+    # ---------- replay ----------
+
+    def _injected_error(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._rnd_lock:
+            return self._rnd.random() < self.error_rate
+
+    def _replay(self, request: httpx.Request) -> httpx.Response:
+        if self._injected_error():
+            self.store.injected += 1
+            return httpx.Response(503, json={"errors": [{"type": "replay_injected"}]}, request=request)
+        fx = self.store.match(request)
+        if fx is None:
+            self.store.misses += 1
+            log.warning("HH replay miss: %s %s", request.method, request.url)
+            return httpx.Response(
+                404, json={"errors": [{"type": "replay_miss", "value": str(request.url)}]}, request=request
+            )
+        self.store.served += 1
+        r = fx["response"]
+        kw: Dict[str, Any] = {"json": r["json"]} if "json" in r else {"text": r.get("text", "")}
+        return httpx.Response(r["status"], headers=r.get("headers") or {}, request=request, **kw)
+
+    # ---------- sync ----------
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.mode == "record":
+            if self._sync_net is None:
+                self._sync_net = httpx.HTTPTransport()
+            resp = self._sync_net.handle_request(request)
+            body = resp.read()
+            self.store.save(request, resp, body)
+            return httpx.Response(resp.status_code, headers=_plain_headers(resp), content=body, request=request)
+        if self.latency:
+            time.sleep(self.latency)
+        return self._replay(request)
+
+    # ---------- async ----------
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.mode == "record":
+            if self._async_net is None:
+                self._async_net = httpx.AsyncHTTPTransport()
+            resp = await self._async_net.handle_async_request(request)
+            body = await resp.aread()
+            self.store.save(request, resp, body)
+            return httpx.Response(resp.status_code, headers=_plain_headers(resp), content=body, request=request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._replay(request)
+
+    def stats(self) -> dict:
+        s = self.store
+        return {
+            "mode": self.mode,
+            "fixtures_dir": str(s.root),
+            "served": s.served,
+            "misses": s.misses,
+            "injected_errors": s.injected,
+            "recorded": s.recorded,
+        }
+
+
+_transport: Optional[ReplayTransport] = None
+
+
+def hh_transport() -> Optional[ReplayTransport]:
+    """Транспорт для клиентов HH; None — режим off, обычная сеть."""
+    global _transport
+    if MODE not in ("record", "replay"):
+        return None
+    if _transport is None:
+        _transport = ReplayTransport()
+    return _transport
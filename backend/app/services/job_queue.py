@@ -0,0 +1,301 @@
+# backend/app/services/job_queue.py
+"""
+Очередь фоновых задач в Postgres (таблица background_jobs, миграция 0045).
+
+- enqueue(db, kind, payload, ...) — в транзакции вызывающего (commit — его),
+  enqueue_now(...) — своей транзакцией. dedup_key: одна живая задача на ключ,
+  повторный enqueue возвращает id уже стоящей.
+- Обработчики — функции payload -> результат (sync или async), регистрируются
+  декоратором @job("kind", concurrency=..., max_attempts=...) в модулях JOB_MODULES;
+  воркер импортирует их через load_handlers().
+- drain_once() — забрать готовые задачи (FOR UPDATE SKIP LOCKED) и выполнить.
+  Не больше concurrency задач типа одновременно по всем процессам; ошибка —
+  ретрай с экспоненциальным backoff, после max_attempts или PermanentJobError — failed.
+- Задача, чей воркер умер, через lease_sec снова становится queued.
+- stats() — глубина очереди по типам (/metrics/jobs).
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import inspect
+import json
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.db import engine
+from app.services.leader import lock_key
+
+log = logging.getLogger(__name__)
+
+JOBS_BATCH = int(os.getenv("JOBS_BATCH", "10"))
+RETAIN_DAYS = int(os.getenv("JOBS_RETAIN_DAYS", "7"))
+BACKOFF_BASE_SEC = float(os.getenv("JOBS_BACKOFF_BASE_SEC", "10"))
+BACKOFF_MAX_SEC = float(os.getenv("JOBS_BACKOFF_MAX_SEC", "3600"))
+PURGE_EVERY_SEC = 600
+
+# модули с обработчиками (@job) — их импортирует воркер
+JOB_MODULES = [
+    "app.api.v1.campaigns",
+    "app.api.v1.hh_auth",
+]
+
+# пространство advisory-локов очереди (xact-лок на тип при захвате): 'jb'
+NS_JOBS = 0x6A62
+
+
+class PermanentJobError(Exception):
+    """Повторять бессмысленно (нет кампании/пользователя) — сразу failed."""
+
+
+@dataclass
+class JobType:
+    kind: str
+    fn: Callable[[dict], Any]
+    concurrency: int = 1
+    max_attempts: int = 5
+    lease_sec: float = 300
+    priority: int = 0
+
+
+_REGISTRY: Dict[str, JobType] = {}
+
+
+def job(kind: str, *, concurrency: int = 1, max_attempts: int = 5, lease_sec: float = 300, priority: int = 0):
+    """Регистрирует обработчик типа задач."""
+    def deco(fn):
+        _REGISTRY[kind] = JobType(kind, fn, concurrency, max_attempts, lease_sec, priority)
+        return fn
+    return deco
+
+
+def load_handlers() -> List[str]:
+    for name in JOB_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            log.warning("job handlers %s import failed: %s", name, e)
+    return sorted(_REGISTRY)
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------- постановка ----------
+
+_INSERT_SQL = text("""
+    INSERT INTO background_jobs (kind, payload, priority, run_at, max_attempts, dedup_key)
+    VALUES (:k, CAST(:p AS jsonb), :pr, COALESCE(:ra, now()) + make_interval(secs => :d), :ma, :dk)
+    ON CONFLICT (kind, dedup_key) WHERE dedup_key IS NOT NULL AND status IN ('queued', 'running')
+    DO NOTHING
+    RETURNING id
+""")
+
+
+def enqueue(
+    db,
+    kind: str,
+    payload: Optional[dict] = None,
+    *,
+    priority: Optional[int] = None,
+    run_at: Optional[datetime] = None,
+    delay_sec: float = 0,
+    dedup_key: Optional[str] = None,
+    max_attempts: Optional[int] = None,
+) -> Optional[int]:
+    """id задачи (или уже стоящей с тем же dedup_key). db — Session или Connection."""
+    jt = _REGISTRY.get(kind)
+    params = {
+        "k": kind,
+        "p": json.dumps(payload or {}, ensure_ascii=False, default=str),
+        "pr": priority if priority is not None else (jt.priority if jt else 0),
+        "ra": run_at,
+        "d": float(delay_sec or 0),
+        "ma": max_attempts or (jt.max_attempts if jt else 5),
+        "dk": dedup_key,
+    }
+    job_id = db.execute(_INSERT_SQL, params).scalar()
+    if job_id is None and dedup_key is not None:
+        job_id = db.execute(text("""
+            SELECT id FROM background_jobs
+             WHERE kind = :k AND dedup_key = :dk AND status IN ('queued', 'running')
+        """), {"k": kind, "dk": dedup_key}).scalar()
+    return int(job_id) if job_id is not None else None
+
+
+def enqueue_now(kind: str, payload: Optional[dict] = None, **kw) -> Optional[int]:
+    """enqueue отдельной транзакцией."""
+    with engine.begin() as conn:
+        return enqueue(conn, kind, payload, **kw)
+
+
+# ---------- захват и завершение ----------
+
+_CLAIM_SQL = text("""
+    WITH picked AS (
+        SELECT id
+          FROM background_jobs
+         WHERE kind = :k AND status = 'queued' AND run_at <= now()
+         ORDER BY priority DESC, run_at, id
+         LIMIT LEAST(
+             :lim,
+             GREATEST(:conc - (SELECT count(*) FROM background_jobs WHERE kind = :k AND status = 'running'), 0)
+         )
+         FOR UPDATE SKIP LOCKED
+    )
+    UPDATE background_jobs j
+       SET status = 'running', attempts = j.attempts + 1,
+           locked_by = :w, locked_at = now(), updated_at = now()
+      FROM picked
+     WHERE j.id = picked.id
+    RETURNING j.id, j.payload, j.attempts, j.max_attempts
+""")
+
+
+def claim(kind: str, limit: int) -> List[dict]:
+    jt = _REGISTRY[kind]
+    with engine.begin() as conn:
+        # подсчёт running и захват — под xact-локом типа: лимит общий для всех процессов
+        conn.execute(text("SELECT pg_advisory_xact_lock(:ns, :key)"), {"ns": NS_JOBS, "key": lock_key(kind)})
+        rows = conn.execute(_CLAIM_SQL, {
+            "k": kind, "lim": int(limit), "conc": jt.concurrency, "w": _worker_id(),
+        }).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def complete(job_id: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE background_jobs
+               SET status = 'done', finished_at = now(), updated_at = now(),
+                   locked_by = NULL, locked_at = NULL, last_error = NULL
+             WHERE id = :id AND status = 'running'
+        """), {"id": job_id})
+
+
+def fail(job_id: int, attempts: int, max_attempts: int, error: str, permanent: bool = False) -> str:
+    """Ретрай с backoff или failed; возвращает новый статус."""
+    final = permanent or attempts >= max_attempts
+    delay = min(BACKOFF_BASE_SEC * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SEC)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE background_jobs
+               SET status = :st,
+                   run_at = CASE WHEN :final THEN run_at ELSE now() + make_interval(secs => :d) END,
+                   finished_at = CASE WHEN :final THEN now() END,
+                   last_error = :err, locked_by = NULL, locked_at = NULL, updated_at = now()
+             WHERE id = :id AND status = 'running'
+        """), {"id": job_id, "st": "failed" if final else "queued", "final": final, "d": delay, "err": error[:1000]})
+    return "failed" if final else "queued"
+
+
+_last_purge = 0.0
+
+
+def maintain() -> dict:
+    """Зависшие running (истёк lease) — обратно в queued/failed; старые done/failed — удалить."""
+    global _last_purge
+    reaped = purged = 0
+    with engine.begin() as conn:
+        for jt in _REGISTRY.values():
+            reaped += conn.execute(text("""
+                UPDATE background_jobs
+                   SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                       finished_at = CASE WHEN attempts >= max_attempts THEN now() END,
+                       run_at = now(),
+                       last_error = 'lease expired (' || COALESCE(locked_by, '?') || ')',
+                       locked_by = NULL, locked_at = NULL, updated_at = now()
+                 WHERE kind = :k AND status = 'running'
+                   AND locked_at < now() - make_interval(secs => :lease)
+            """), {"k": jt.kind, "lease": float(jt.lease_sec)}).rowcount or 0
+        if time.monotonic() - _last_purge >= PURGE_EVERY_SEC:
+            _last_purge = time.monotonic()
+            purged = conn.execute(text("""
+                DELETE FROM background_jobs
+                 WHERE status IN ('done', 'failed')
+                   AND finished_at < now() - make_interval(days => :d)
+            """), {"d": RETAIN_DAYS}).rowcount or 0
+    return {"reaped": reaped, "purged": purged}
+
+
+# ---------- выполнение ----------
+
+async def _execute(jt: JobType, row: dict) -> bool:
+    payload = row["payload"] if isinstance(row["payload"], dict) else json.loads(row["payload"] or "{}")
+    try:
+        if inspect.iscoroutinefunction(jt.fn):
+            await jt.fn(payload)
+        else:
+            await asyncio.to_thread(jt.fn, payload)
+    except Exception as e:
+        status = await asyncio.to_thread(
+            fail, row["id"], row["attempts"], row["max_attempts"],
+            f"{type(e).__name__}: {e}", isinstance(e, PermanentJobError),
+        )
+        print(f"[jobs] {jt.kind}#{row['id']} attempt {row['attempts']} failed ({status}): {e}")
+        return False
+    await asyncio.to_thread(complete, row["id"])
+    return True
+
+
+async def drain_once(limit: int = JOBS_BATCH) -> dict:
+    """Один проход: обслуживание, захват до limit готовых задач, параллельное выполнение."""
+    if not _REGISTRY:
+        return {}
+    housekeeping = await asyncio.to_thread(maintain)
+    claimed = []
+    for jt in sorted(_REGISTRY.values(), key=lambda t: -t.priority):
+        if len(claimed) >= limit:
+            break
+        rows = await asyncio.to_thread(claim, jt.kind, limit - len(claimed))
+        claimed += [(jt, r) for r in rows]
+    if not claimed:
+        # пустой проход не логируем
+        return {k: v for k, v in housekeeping.items() if v}
+    results = await asyncio.gather(*(_execute(jt, r) for jt, r in claimed))
+    return {"done": results.count(True), "failed": results.count(False),
+            **{k: v for k, v in housekeeping.items() if v}}
+
+
+# ---------- метрики ----------
+
+def stats(bind=None) -> dict:
+    """Глубина очереди по типам: queued/ready/running и завершённые за час."""
+    with (bind or engine).connect() as conn:
+        rows = conn.execute(text("""
+            SELECT kind,
+                   count(*) FILTER (WHERE status = 'queued')                      AS queued,
+                   count(*) FILTER (WHERE status = 'queued' AND run_at <= now())  AS ready,
+                   count(*) FILTER (WHERE status = 'running')                     AS running,
+                   count(*) FILTER (WHERE status = 'done'
+                                      AND finished_at >= now() - interval '1 hour') AS done_1h,
+                   count(*) FILTER (WHERE status = 'failed'
+                                      AND finished_at >= now() - interval '1 hour') AS failed_1h,
+                   EXTRACT(EPOCH FROM now() - min(run_at)
+                           FILTER (WHERE status = 'queued' AND run_at <= now()))   AS oldest_ready_sec
+              FROM background_jobs
+             WHERE status IN ('queued', 'running') OR finished_at >= now() - interval '1 hour'
+             GROUP BY kind
+             ORDER BY kind
+        """)).mappings().all()
+    kinds = {}
+    for r in rows:
+        item = {k: int(r[k] or 0) for k in ("queued", "ready", "running", "done_1h", "failed_1h")}
+        item["oldest_ready_sec"] = round(float(r["oldest_ready_sec"]), 1) if r["oldest_ready_sec"] is not None else None
+        jt = _REGISTRY.get(r["kind"])
+        if jt:
+            item["concurrency"] = jt.concurrency
+        kinds[r["kind"]] = item
+    return {
+        "kinds": kinds,
+        "ready_total": sum(v["ready"] for v in kinds.values()),
+        "running_total": sum(v["running"] for v in kinds.values()),
+    }
@@ -0,0 +1,89 @@
+# backend/app/services/keyset.py
+"""
+Keyset-пагинация для списков админки и кампаний.
+
+Курсор — непрозрачная base64url-строка с ключом сортировки последней строки
+страницы. Следующая страница: WHERE (ключ) < (курсор) ORDER BY ключ DESC
+LIMIT n+1 — стоимость не зависит от глубины. Ключ обязательно заканчивается
+уникальной колонкой (id), чтобы порядок был стабильным.
+offset остаётся режимом совместимости: используется, только если cursor не передан.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+
+def _enc(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return {"dt": v.isoformat()}
+    if isinstance(v, date):
+        return {"d": v.isoformat()}
+    return v
+
+
+def _dec(v: Any) -> Any:
+    if isinstance(v, dict):
+        if "dt" in v:
+            return datetime.fromisoformat(v["dt"])
+        if "d" in v:
+            return date.fromisoformat(v["d"])
+    return v
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_enc(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = [_dec(v) for v in json.loads(raw)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="bad cursor")
+    if len(values) != size or any(v is None for v in values):
+        raise HTTPException(status_code=400, detail="bad cursor")
+    return values
+
+
+def after(
+    cols: Sequence[str],
+    cursor: Optional[str],
+    *,
+    desc: bool = True,
+    paramstyle: str = "named",
+) -> Tuple[str, dict]:
+    """
+    Условие «строки после курсора» для ORDER BY cols (все DESC или все ASC)
+    и его параметры. Без курсора — ("", {}).
+    paramstyle: "named" (:k0 — sqlalchemy.text) или "pyformat" (%(k0)s — psycopg2).
+    """
+    if not cursor:
+        return "", {}
+    values = decode_cursor(cursor, len(cols))
+    names = [f"k{i}" for i in range(len(cols))]
+    binds = [f"%({n})s" if paramstyle == "pyformat" else f":{n}" for n in names]
+    op = "<" if desc else ">"
+    return f"({', '.join(cols)}) {op} ({', '.join(binds)})", dict(zip(names, values))
+
+
+def order_by(cols: Sequence[str], *, desc: bool = True) -> str:
+    d = " DESC" if desc else " ASC"
+    return ", ".join(f"{c}{d}" for c in cols)
+
+
+def page(rows: Sequence[Any], limit: int, keys: Sequence[str]) -> Tuple[list, Optional[str]]:
+    """
+    rows выбраны с LIMIT limit+1: лишняя строка значит, что есть следующая страница.
+    Возвращает (строки страницы, next_cursor | None).
+    """
+    items = list(rows[:limit])
+    if len(rows) <= limit or not items:
+        return items, None
+    last = items[-1]
+    return items, encode_cursor([last[k] for k in keys])
@@ -0,0 +1,216 @@
+# backend/app/services/leader.py
+"""
+Выбор лидера и шарды между репликами воркера на advisory-локах Postgres.
+
+- Лидер — тот, кто держит session-level pg_try_advisory_lock(NS, key(имя)).
+  Лок живёт, пока живо отдельное соединение: процесс упал/соединение порвалось —
+  Postgres снимает лок сам, следующая реплика забирает его на своём tick().
+- tick() раз в LEADER_HEARTBEAT_SEC: лидер подтверждает, что лок ещё его
+  (pg_locks по своему pid), остальные пробуют его взять. Без подтверждения дольше
+  LEADER_TTL_SEC is_leader() -> False: зависший лидер сам перестаёт работать.
+- Короткие TCP keepalive на соединении лока — сервер замечает мёртвого лидера за секунды.
+- Шардируемые задачи: claim_shards(job, total) — каждая реплика держит примерно
+  total / число_участников шардов (участники — shared-лок job:members).
+- LEADER_ELECTION=0 — одна реплика: всегда лидер, все шарды свои.
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Set
+
+import psycopg2
+
+from app.db import DB_CONNECT_ARGS, PROCESS_ROLE, database_url
+
+ENABLED = os.getenv("LEADER_ELECTION", "1").lower() in ("1", "true", "yes", "on")
+HEARTBEAT_SEC = float(os.getenv("LEADER_HEARTBEAT_SEC", "2"))
+TTL_SEC = float(os.getenv("LEADER_TTL_SEC", "10"))
+NAME = os.getenv("LEADER_NAME", "hhbot-worker")
+
+# пространство ключей advisory-локов (первый int4 двухключевой формы): 'hh'
+NS = 0x6868
+
+
+def lock_key(name: str) -> int:
+    """Стабильный неотрицательный int4 из имени (тот же в pg_locks.objid)."""
+    return zlib.crc32(name.encode()) & 0x7FFFFFFF
+
+
+_HELD_SQL = """
+    SELECT objid::bigint
+      FROM pg_locks
+     WHERE locktype = 'advisory' AND pid = pg_backend_pid()
+       AND classid = %s AND objsubid = 2 AND granted
+"""
+
+
+class Elector:
+    def __init__(self, name: str = NAME):
+        self.name = name
+        self._key = lock_key(name)
+        self._conn = None
+        self._mu = threading.Lock()
+        self._leader = False
+        self._confirmed_at = 0.0
+        self._shards: Dict[str, Set[int]] = {}
+        self._members: Dict[str, int] = {}
+        self.elections = 0
+        self.last_error: Optional[str] = None
+
+    # --- соединение ---
+
+    def _connect(self):
+        kw = {k: v for k, v in DB_CONNECT_ARGS.items()
+              if k not in ("application_name", "keepalives_idle", "keepalives_interval", "keepalives_count")}
+        conn = psycopg2.connect(
+            database_url().replace("postgresql+psycopg2://", "postgresql://", 1),
+            application_name=f"hhbot-{PROCESS_ROLE}-leader",
+            keepalives_idle=5, keepalives_interval=2, keepalives_count=2,
+            # и сервер быстро замечает пропавшего клиента
+            options="-c tcp_keepalives_idle=5 -c tcp_keepalives_interval=2 -c tcp_keepalives_count=2",
+            **kw,
+        )
+        conn.autocommit = True
+        return conn
+
+    def _drop(self, err: Exception) -> None:
+        self.last_error = f"{type(err).__name__}: {err}"[:300]
+        if self._leader:
+            print(f"[leader] lost leadership: {self.last_error}")
+        self._leader = False
+        self._shards.clear()
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+
+    def _held(self, cur) -> Set[int]:
+        cur.execute(_HELD_SQL, (NS,))
+        return {int(r[0]) for r in cur.fetchall()}
+
+    # --- лидер ---
+
+    def tick(self) -> bool:
+        """Heartbeat/попытка стать лидером; True — мы лидер."""
+        if not ENABLED:
+            return True
+        with self._mu:
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                with self._conn.cursor() as cur:
+                    if not self._leader:
+                        cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (NS, self._key))
+                        if cur.fetchone()[0]:
+                            self._leader = True
+                            self.elections += 1
+                            print(f"[leader] {self.name}: became leader")
+                    if self._leader and self._key not in self._held(cur):
+                        raise RuntimeError("advisory lock is no longer held")
+                if self._leader:
+                    self._confirmed_at = time.monotonic()
+                self.last_error = None
+            except Exception as e:
+                self._drop(e)
+            return self._leader
+
+    def is_leader(self) -> bool:
+        if not ENABLED:
+            return True
+        return self._leader and time.monotonic() - self._confirmed_at <= TTL_SEC
+
+    # --- шарды ---
+
+    def claim_shards(self, job: str, total: int) -> List[int]:
+        """
+        Шарды job (0..total-1), которые сейчас за этой репликой. Лишние отпускает,
+        свободные добирает до справедливой доли. Вызывать между батчами задачи —
+        отпущенный шард не должен быть в работе.
+        """
+        if not ENABLED or total <= 1:
+            return list(range(max(total, 1)))
+        with self._mu:
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                held = self._shards.setdefault(job, set())
+                with self._conn.cursor() as cur:
+                    mine = self._held(cur)
+                    # участие — shared-лок job:members; session-локи копятся, берём его один раз
+                    members_key = lock_key(f"{job}:members")
+                    if members_key not in mine:
+                        cur.execute("SELECT pg_try_advisory_lock_shared(%s, %s)", (NS, members_key))
+                    cur.execute("""
+                        SELECT count(*) FROM pg_locks
+                         WHERE locktype = 'advisory' AND classid = %s AND objid::bigint = %s
+                           AND objsubid = 2 AND granted
+                    """, (NS, members_key))
+                    members = max(int(cur.fetchone()[0]), 1)
+                    fair = math.ceil(total / members)
+
+                    # то, что числится за нами, но лока уже нет (переподключение), — забываем
+                    held &= {s for s in held if lock_key(f"{job}:{s}") in mine}
+                    for shard in sorted(held, reverse=True):
+                        if len(held) <= fair:
+                            break
+                        cur.execute("SELECT pg_advisory_unlock(%s, %s)", (NS, lock_key(f"{job}:{shard}")))
+                        held.discard(shard)
+                    for shard in range(total):
+                        if len(held) >= fair:
+                            break
+                        if shard in held:
+                            continue
+                        cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (NS, lock_key(f"{job}:{shard}")))
+                        if cur.fetchone()[0]:
+                            held.add(shard)
+                self._members[job] = members
+                return sorted(held)
+            except Exception as e:
+                self._drop(e)
+                return []
+
+    def release(self) -> None:
+        """Отдать лидерство и шарды сразу (graceful shutdown) — без ожидания TTL."""
+        with self._mu:
+            if self._conn is not None:
+                try:
+                    with self._conn.cursor() as cur:
+                        cur.execute("SELECT pg_advisory_unlock_all()")
+                except Exception:
+                    pass
+            if self._leader:
+                print(f"[leader] {self.name}: released leadership")
+                self._leader = False
+            self._drop(RuntimeError("released"))
+            self.last_error = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ENABLED,
+            "name": self.name,
+            "leader": self.is_leader(),
+            "elections": self.elections,
+            "confirmed_ago_sec": round(time.monotonic() - self._confirmed_at, 1) if self._confirmed_at else None,
+            "shards": {job: sorted(s) for job, s in self._shards.items()},
+            "members": dict(self._members),
+            "last_error": self.last_error,
+        }
+
+
+_elector: Optional[Elector] = None
+_elector_lock = threading.Lock()
+
+
+def get_elector() -> Elector:
+    global _elector
+    if _elector is None:
+        with _elector_lock:
+            if _elector is None:
+                _elector = Elector()
+    return _elector
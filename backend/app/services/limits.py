@@ -1,10 +1,13 @@
 # backend/app/services/limits.py
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional, Literal
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.services.tariff_cache import FREE_LIMIT, PAID_LIMIT, get_tariff_info
+
 TZ_MSK = timezone(timedelta(hours=3))
+HARD_CAP = 200
 
 def today_bounds_msk(now: Optional[datetime] = None):
     now = now.astimezone(TZ_MSK) if now else datetime.now(TZ_MSK)
@@ -18,34 +21,51 @@ def reset_time_msk(now: Optional[datetime] = None) -> str:
                + timedelta(days=1)).strftime("%H:%M %d.%m.%Y")
 
 def get_user_tariff(db: Session, user_id: int) -> Literal["free", "paid"]:
-    row = db.execute(text("""
-        SELECT 1
-          FROM subscriptions
-         WHERE user_id = :u
-           AND status IN ('active','paid')
-           AND (expires_at IS NULL OR now() < expires_at)
-         LIMIT 1
-    """), {"u": user_id}).first()
-    return "paid" if row else "free"
+    # кэш с инвалидацией через NOTIFY (services/tariff_cache.py)
+    return get_tariff_info(db, user_id)["tariff"]
+
+def msk_today(now: Optional[datetime] = None) -> date:
+    now = now.astimezone(TZ_MSK) if now else datetime.now(TZ_MSK)
+    return now.date()
+
+def daily_cap_for(tariff: str) -> int:
+    tariff_limit = PAID_LIMIT if tariff == "paid" else FREE_LIMIT
+    return min(tariff_limit, HARD_CAP)
 
 def count_effective_today(db: Session, user_id: int) -> int:
-    start_utc, end_utc = today_bounds_msk()
+    # счётчик ведёт триггер на applications (миграция 0038) — одна строка вместо COUNT(*)
     row = db.execute(text("""
-        SELECT COUNT(*)::int
-          FROM applications
+        SELECT used
+          FROM user_daily_usage
          WHERE user_id = :u
-           AND created_at >= :start_utc
-           AND created_at <  :end_utc
-           AND COALESCE(LOWER(status), '') NOT IN ('canceled','cancelled')
-    """), {"u": user_id, "start_utc": start_utc, "end_utc": end_utc}).first()
+           AND msk_day = :d
+    """), {"u": user_id, "d": msk_today()}).first()
     return int(row[0]) if row else 0
 
+def reserve_quota(db: Session, user_id: int, n: int, daily_cap: Optional[int] = None) -> int:
+    """
+    Резервирует до n заявок из суточной квоты, возвращает сколько выдано.
+    Строка счётчика блокируется до конца транзакции вызывающего: заявки
+    вставляются в той же транзакции (их учтёт триггер), а параллельный
+    планировщик ждёт коммита и видит уже новый used — перебора квоты нет.
+    """
+    if n <= 0:
+        return 0
+    if daily_cap is None:
+        daily_cap = daily_cap_for(get_user_tariff(db, user_id))
+    used = db.execute(text("""
+        INSERT INTO user_daily_usage AS u (user_id, msk_day, used)
+        VALUES (:u, :d, 0)
+        ON CONFLICT (user_id, msk_day) DO UPDATE SET used = u.used
+        RETURNING used
+    """), {"u": user_id, "d": msk_today()}).scalar_one()
+    return max(0, min(int(n), daily_cap - int(used)))
+
 def quota_for_user(db: Session, user_id: int) -> dict:
     # Итог по «созданным сегодня», чтобы лимит уменьшался сразу:
     tariff = get_user_tariff(db, user_id)
-    tariff_limit = 200 if tariff == "paid" else 10
-    hard_cap = 200
-    daily_cap = min(tariff_limit, hard_cap)
+    hard_cap = HARD_CAP
+    daily_cap = daily_cap_for(tariff)
     used = count_effective_today(db, user_id)
     remaining = max(0, daily_cap - used)
     return {
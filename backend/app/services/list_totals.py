@@ -0,0 +1,89 @@
+# backend/app/services/list_totals.py
+"""
+Totals для списков админки без точного count(*) на каждый запрос.
+
+- Список без фильтра: оценка по pg_class.reltuples (для секционированных
+  таблиц — сумма по секциям), кэшируется на LIST_TOTALS_TTL_SEC.
+- С фильтром: точный count(*), кэш на тот же TTL по ключу «список + фильтр».
+- ?exact_total=1 — всегда точный count (и обновляет кэш).
+Вместе с числом возвращается флаг exact: True — только что посчитано точно.
+"""
+from __future__ import annotations
+
+import os
+from typing import Awaitable, Callable, Hashable, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.services.ttl_cache import TTLCache
+
+TTL_SEC = float(os.getenv("LIST_TOTALS_TTL_SEC", "30"))
+
+TOTALS_CACHE = TTLCache(
+    "list_totals",
+    ttl=TTL_SEC,
+    max_items=int(os.getenv("LIST_TOTALS_MAX_ITEMS", "2000")),
+    max_bytes=1024 * 1024,
+)
+
+# -1 в reltuples — таблица ещё не анализировалась.
+# Суммируем только листья: с PG14 у секционированного родителя тоже есть
+# reltuples (сумма по секциям), и родитель + секции давали двойной счёт.
+# Для обычной таблицы pg_partition_tree возвращает её саму как лист.
+_ESTIMATE_SQL = text("""
+    SELECT SUM(GREATEST(c.reltuples, 0))::bigint AS est,
+           bool_or(c.reltuples >= 0)             AS analyzed
+      FROM pg_partition_tree(to_regclass(:t)) t
+      JOIN pg_class c ON c.oid = t.relid
+     WHERE t.isleaf
+""")
+
+
+def reltuples_estimate(bind: Engine, table: str) -> Optional[int]:
+    """Оценка числа строк по статистике планировщика; None — статистики нет."""
+    with bind.connect() as conn:
+        row = conn.execute(_ESTIMATE_SQL, {"t": table}).first()
+    if not row or not row[1]:
+        return None
+    return int(row[0] or 0)
+
+
+def total(
+    key: Hashable,
+    count: Callable[[], int],
+    *,
+    exact: bool = False,
+    estimate: Optional[Callable[[], Optional[int]]] = None,
+) -> Tuple[int, bool]:
+    """
+    (total, exact). count — точный подсчёт, estimate — дешёвая оценка
+    (передаётся только для списков без фильтра).
+    """
+    if not exact:
+        cached, state = TOTALS_CACHE.get(key)
+        if state is not None:
+            return int(cached), False
+        if estimate is not None:
+            est = estimate()
+            if est is not None:
+                TOTALS_CACHE.set(key, est)
+                return est, False
+    n = int(count() or 0)
+    TOTALS_CACHE.set(key, n)
+    return n, True
+
+
+async def atotal(key: Hashable, count: Callable[[], Awaitable[int]], *, exact: bool = False) -> Tuple[int, bool]:
+    """То же для async-эндпоинтов (без оценки: там списки всегда с фильтром)."""
+    if not exact:
+        cached, state = TOTALS_CACHE.get(key)
+        if state is not None:
+            return int(cached), False
+    n = int((await count()) or 0)
+    TOTALS_CACHE.set(key, n)
+    return n, True
+
+
+def invalidate(key: Hashable) -> None:
+    TOTALS_CACHE.invalidate(key)
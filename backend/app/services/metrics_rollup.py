@@ -0,0 +1,150 @@
+# backend/app/services/metrics_rollup.py
+"""
+Дневные роллапы для графиков админки (metrics.*, миграция 0039).
+
+Каждый день считается одним диапазонным запросом по индексу
+(created_at >= d AND created_at < d + 1 день), а не cast'ом по всей истории.
+Периодически пересчитываются только последние дни (с последнего
+посчитанного дня до сегодня) и воронка (applied_20 — по счётчикам
+metrics.user_applied, их ведёт триггер миграции 0048); пустые таблицы при первом запуске
+заполняются целиком. Полный пересчёт: python -m app.services.metrics_rollup --backfill
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.db import engine
+
+REFRESH_DAYS = int(os.getenv("METRICS_ROLLUP_REFRESH_DAYS", "2"))
+BACKFILL_CHUNK_DAYS = 90
+
+
+def refresh_days(conn, d_from: date, d_to: date) -> int:
+    """Пересчитывает дневные бакеты [d_from, d_to]. Возвращает число дней."""
+    params = {"d0": d_from, "d1": d_to}
+    conn.execute(text("""
+        INSERT INTO metrics.registrations_daily (date, registrations, updated_at)
+        SELECT d::date,
+               (SELECT COUNT(*)
+                  FROM users u
+                 WHERE u.created_at >= d
+                   AND u.created_at <  d + INTERVAL '1 day'),
+               now()
+          FROM generate_series(CAST(:d0 AS date), CAST(:d1 AS date), INTERVAL '1 day') AS d
+        ON CONFLICT (date) DO UPDATE
+           SET registrations = EXCLUDED.registrations, updated_at = now()
+    """), params)
+    # активна на дату d: started_at::date <= d < expires_at::date — в диапазонном виде
+    conn.execute(text("""
+        INSERT INTO metrics.active_subscribers_daily (date, active_subscribers, updated_at)
+        SELECT d::date,
+               (SELECT COUNT(*)
+                  FROM subscriptions s
+                 WHERE s.status = 'active'
+                   AND s.expires_at >= d + INTERVAL '1 day'
+                   AND s.started_at <  d + INTERVAL '1 day'),
+               now()
+          FROM generate_series(CAST(:d0 AS date), CAST(:d1 AS date), INTERVAL '1 day') AS d
+        ON CONFLICT (date) DO UPDATE
+           SET active_subscribers = EXCLUDED.active_subscribers, updated_at = now()
+    """), params)
+    return (d_to - d_from).days + 1
+
+
+def refresh_funnel(conn) -> None:
+    conn.execute(text("""
+        INSERT INTO metrics.funnel_alltime (step, label, value, updated_at)
+        SELECT step, label, value, now() FROM (
+            SELECT 'visited' AS step, 'Зашли в бота' AS label, COUNT(*)::bigint AS value
+              FROM users
+            UNION ALL
+            SELECT 'hh_connected', 'Подключили HH', COUNT(*)::bigint
+              FROM users
+             WHERE hh_account_id IS NOT NULL AND hh_account_id <> ''
+            UNION ALL
+            SELECT 'applied_20', 'Сделали 20 откликов', COUNT(*)::bigint
+              FROM metrics.user_applied
+             WHERE applied >= 20
+            UNION ALL
+            SELECT 'subscribed', 'Оформили подписку (активна)', COUNT(DISTINCT user_id)::bigint
+              FROM subscriptions
+             WHERE status = 'active'
+               AND started_at <= now()
+               AND expires_at  >  now()
+        ) f
+        ON CONFLICT (step) DO UPDATE
+           SET label = EXCLUDED.label, value = EXCLUDED.value, updated_at = now()
+    """))
+
+
+def backfill(d_from: Optional[date] = None) -> int:
+    """Полный пересчёт с начала истории (или с d_from) порциями, каждая — своя транзакция."""
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT LEAST(
+                     (SELECT MIN(created_at)::date FROM users),
+                     (SELECT MIN(started_at)::date FROM subscriptions),
+                     current_date),
+                   current_date
+        """)).first()
+    start, today = row[0], row[1]
+    if d_from is not None:
+        start = d_from
+
+    days = 0
+    cur = start
+    while cur <= today:
+        end = min(cur + timedelta(days=BACKFILL_CHUNK_DAYS - 1), today)
+        with engine.begin() as conn:
+            days += refresh_days(conn, cur, end)
+        cur = end + timedelta(days=1)
+    with engine.begin() as conn:
+        refresh_funnel(conn)
+    return days
+
+
+def refresh_recent() -> dict:
+    """Последние REFRESH_DAYS дней (и пропуски с последнего прогона) + воронка."""
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT (SELECT MAX(date) FROM metrics.registrations_daily), current_date
+        """)).first()
+    last, today = row[0], row[1]
+    if last is None:
+        return {"backfilled_days": backfill()}
+
+    d_from = min(last, today - timedelta(days=max(REFRESH_DAYS, 1) - 1))
+    with engine.begin() as conn:
+        days = refresh_days(conn, d_from, today)
+        refresh_funnel(conn)
+    return {"days": days, "from": d_from.isoformat()}
+
+
+async def run_loop(interval_sec: int | None = None):
+    if interval_sec is None:
+        interval_sec = int(os.getenv("METRICS_ROLLUP_EVERY_SEC", "300"))
+    while True:
+        try:
+            stats = await asyncio.to_thread(refresh_recent)
+            print(f"[metrics_rollup] {stats}")
+        except Exception as e:
+            print(f"[metrics_rollup] failed: {e}")
+        await asyncio.sleep(interval_sec)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Роллапы metrics.* для графиков админки")
+    ap.add_argument("--backfill", action="store_true", help="пересчитать всю историю")
+    ap.add_argument("--from", dest="d_from", type=date.fromisoformat, default=None,
+                    help="начало пересчёта, YYYY-MM-DD (с --backfill)")
+    args = ap.parse_args()
+    if args.backfill:
+        print(f"[metrics_rollup] backfilled {backfill(args.d_from)} days")
+    else:
+        asyncio.run(run_loop())
@@ -0,0 +1,160 @@
+# backend/app/services/schema_registry.py
+"""
+Кэш схемы БД: таблица -> множество колонок (schema public).
+
+Читается одним запросом к information_schema при старте (main.py) или при
+первом обращении, дальше эндпоинты проверяют наличие таблиц/колонок без
+запросов к каталогу. После миграций — POST /metrics/schema/refresh: он
+перечитывает схему локально и шлёт pg_notify('schema_changed'), по которому
+LISTEN-поток каждого процесса (все воркеры uvicorn, app.worker) делает
+refresh() у себя. Как и в tariff_cache, после переподключения LISTEN схема
+перечитывается — уведомления за время разрыва могли потеряться.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import select
+import threading
+import time
+from typing import Dict, FrozenSet, Optional
+
+import psycopg2
+from sqlalchemy import text
+
+from app.db import DB_CONNECT_ARGS, database_url, engine
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "schema_changed"
+LISTEN_ENABLED = os.getenv("SCHEMA_REGISTRY_LISTEN", "1").lower() in ("1", "true", "yes", "on")
+
+_lock = threading.Lock()
+_tables: Optional[Dict[str, FrozenSet[str]]] = None
+_loaded_at: Optional[float] = None
+_loads = 0
+
+_listener_lock = threading.Lock()
+_listener: Optional[threading.Thread] = None
+_listening = threading.Event()
+_notifications = 0
+
+
+def _fetch(conn) -> Dict[str, FrozenSet[str]]:
+    rows = conn.execute(text("""
+        SELECT table_name, column_name
+          FROM information_schema.columns
+         WHERE table_schema = 'public'
+    """)).all()
+    tables: Dict[str, set] = {}
+    for t, c in rows:
+        tables.setdefault(t, set()).add(c)
+    return {t: frozenset(cols) for t, cols in tables.items()}
+
+
+def refresh(conn=None) -> dict:
+    """Перечитывает схему (conn — уже открытое соединение, иначе берём из пула)."""
+    global _tables, _loaded_at, _loads
+    if conn is None:
+        with engine.connect() as c:
+            tables = _fetch(c)
+    else:
+        tables = _fetch(conn)
+    with _lock:
+        _tables = tables
+        _loaded_at = time.time()
+        _loads += 1
+    return stats()
+
+
+def refresh_all() -> dict:
+    """Перечитать схему здесь и разослать refresh остальным процессам."""
+    with engine.begin() as c:
+        result = refresh(c)
+        c.execute(text("SELECT pg_notify(:ch, '')"), {"ch": CHANNEL})
+    return result
+
+
+def _snapshot(conn=None) -> Dict[str, FrozenSet[str]]:
+    ensure_listener()
+    tables = _tables
+    if tables is None:
+        refresh(conn)
+        tables = _tables
+    return tables or {}
+
+
+def columns(table: str, conn=None) -> FrozenSet[str]:
+    return _snapshot(conn).get(table, frozenset())
+
+
+def has_table(table: str, conn=None) -> bool:
+    return table in _snapshot(conn)
+
+
+def has_column(table: str, column: str, conn=None) -> bool:
+    return column in columns(table, conn)
+
+
+# ---------- LISTEN ----------
+
+def _listen_forever() -> None:
+    global _notifications
+    dsn = database_url().replace("postgresql+psycopg2://", "postgresql://", 1)
+    backoff = 1.0
+    while True:
+        conn = None
+        try:
+            kw = {k: v for k, v in DB_CONNECT_ARGS.items() if k != "application_name"}
+            conn = psycopg2.connect(dsn, application_name="hhbot-schema-listen", **kw)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL};")
+            # пока не слушали, уведомления могли потеряться
+            if _tables is not None:
+                refresh()
+            _listening.set()
+            backoff = 1.0
+            while True:
+                if select.select([conn], [], [], 60.0) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    # пачку уведомлений покрывает одно перечитывание
+                    _notifications += len(conn.notifies)
+                    conn.notifies.clear()
+                    refresh()
+        except Exception as e:
+            _listening.clear()
+            log.warning("schema registry LISTEN failed: %s; retry in %.0fs", e, backoff)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 60.0)
+
+
+def ensure_listener() -> None:
+    """Запускает LISTEN-поток один раз на процесс (лениво, при первом обращении к реестру)."""
+    global _listener
+    if not LISTEN_ENABLED or _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(target=_listen_forever, name="schema-listen", daemon=True)
+            _listener.start()
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "loaded": _tables is not None,
+            "tables": len(_tables or {}),
+            "loaded_at": _loaded_at,
+            "loads": _loads,
+            "listening": _listening.is_set(),
+            "notifications": _notifications,
+        }
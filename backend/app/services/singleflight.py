@@ -0,0 +1,78 @@
+# backend/app/services/singleflight.py
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    Схлопывание одинаковых конкурентных вызовов (single-flight).
+
+    Первый вызов с ключом запускает upstream-задачу, остальные ждут её же
+    результата. Отмена одного ожидающего не трогает остальных; если
+    разошлись все ожидающие — задача отменяется. Таймаут — на ожидающего.
+    """
+
+    def __init__(self, name: str, *, timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+        self.leaders = 0
+        self.shared = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        *,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        task = self._calls.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+            self.leaders += 1
+        else:
+            self.shared += 1
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        wait = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), wait)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            left = self._waiters.get(key, 1) - 1
+            if left > 0:
+                self._waiters[key] = left
+            else:
+                self._waiters.pop(key, None)
+                # ждать больше некому — upstream не нужен
+                if not task.done():
+                    task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            self._calls.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # помечаем исключение прочитанным
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,174 @@
+# backend/app/services/tariff_cache.py
+"""
+Кэш статуса подписки: user_id -> (tariff, limit, expires_at).
+
+Тариф меняется только при оплате (cp_webhooks), истечении (notifier)
+и действиях админа, поэтому горячий путь (квоты) не ходит в subscriptions.
+TTL записи не больше времени до expires_at — истёкшая подписка не
+задержится в кэше. Пишущие пути вызывают `notify_tariff_changed` —
+pg_notify('tariff_changed', user_id) доходит до всех процессов после
+commit, фоновый LISTEN-поток сбрасывает запись. Пока LISTEN не работает,
+TTL урезается до TARIFF_CACHE_FALLBACK_TTL_SEC.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import select
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import psycopg2
+from sqlalchemy import text
+
+from app.db import DB_CONNECT_ARGS, database_url
+from app.services.ttl_cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "tariff_changed"
+TTL_SEC = float(os.getenv("TARIFF_CACHE_TTL_SEC", "300"))
+FALLBACK_TTL_SEC = float(os.getenv("TARIFF_CACHE_FALLBACK_TTL_SEC", "15"))
+LISTEN_ENABLED = os.getenv("TARIFF_CACHE_LISTEN", "1").lower() in ("1", "true", "yes", "on")
+
+PAID_LIMIT = 200
+FREE_LIMIT = 10
+
+TARIFF_CACHE = TTLCache(
+    "tariffs",
+    ttl=TTL_SEC,
+    max_items=int(os.getenv("TARIFF_CACHE_MAX_ITEMS", "50000")),
+    max_bytes=8 * 1024 * 1024,
+)
+
+_listener_lock = threading.Lock()
+_listener: Optional[threading.Thread] = None
+_listening = threading.Event()
+_notifications = 0
+# растёт при каждой инвалидации: загрузка, начатая до неё, в кэш не пишется
+_generation = 0
+
+
+def _load(db, user_id: int) -> dict:
+    row = db.execute(text("""
+        SELECT bool_or(expires_at IS NULL) AS forever, MAX(expires_at) AS expires_at
+          FROM subscriptions
+         WHERE user_id = :u
+           AND status IN ('active','paid')
+           AND (expires_at IS NULL OR now() < expires_at)
+    """), {"u": user_id}).first()
+    paid = bool(row and (row[0] or row[1]))
+    return {
+        "tariff": "paid" if paid else "free",
+        "limit": PAID_LIMIT if paid else FREE_LIMIT,
+        # бессрочная подписка — expires_at нет
+        "expires_at": None if (not paid or row[0]) else row[1],
+    }
+
+
+def _ttl_for(info: dict) -> float:
+    ttl = TTL_SEC if _listening.is_set() else min(TTL_SEC, FALLBACK_TTL_SEC)
+    exp = info.get("expires_at")
+    if exp is not None:
+        exp = exp if exp.tzinfo else exp.replace(tzinfo=timezone.utc)
+        ttl = min(ttl, (exp - datetime.now(timezone.utc)).total_seconds())
+    return ttl
+
+
+def get_tariff_info(db, user_id: int) -> dict:
+    """{'tariff': 'paid'|'free', 'limit': int, 'expires_at': datetime|None} — из кэша или БД."""
+    ensure_listener()
+    key = int(user_id)
+    info, _ = TARIFF_CACHE.get(key)
+    if info is not None:
+        return info
+    gen = _generation
+    info = _load(db, key)
+    if gen == _generation:
+        TARIFF_CACHE.set(key, info, ttl=_ttl_for(info), size=128)
+    return info
+
+
+def invalidate(user_id: int) -> None:
+    global _generation
+    _generation += 1
+    TARIFF_CACHE.invalidate(int(user_id))
+
+
+def _invalidate_all() -> None:
+    global _generation
+    _generation += 1
+    TARIFF_CACHE.clear()
+
+
+def notify_tariff_changed(db, user_id: int) -> None:
+    """
+    Вызывать в транзакции, меняющей подписку: NOTIFY уйдёт остальным
+    процессам только после commit. Локальную запись сбрасываем сразу.
+    """
+    db.execute(text("SELECT pg_notify(:ch, :uid)"), {"ch": CHANNEL, "uid": str(int(user_id))})
+    invalidate(user_id)
+
+
+# ---------- LISTEN ----------
+
+def _listen_forever() -> None:
+    global _notifications
+    dsn = database_url().replace("postgresql+psycopg2://", "postgresql://", 1)
+    backoff = 1.0
+    while True:
+        conn = None
+        try:
+            kw = {k: v for k, v in DB_CONNECT_ARGS.items() if k != "application_name"}
+            conn = psycopg2.connect(dsn, application_name="hhbot-tariff-listen", **kw)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL};")
+            # пока не слушали, уведомления могли потеряться
+            _invalidate_all()
+            _listening.set()
+            backoff = 1.0
+            while True:
+                if select.select([conn], [], [], 60.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    n = conn.notifies.pop(0)
+                    _notifications += 1
+                    try:
+                        invalidate(int(n.payload))
+                    except ValueError:
+                        _invalidate_all()
+        except Exception as e:
+            _listening.clear()
+            log.warning("tariff cache LISTEN failed: %s; retry in %.0fs", e, backoff)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 60.0)
+
+
+def ensure_listener() -> None:
+    """Запускает LISTEN-поток один раз на процесс (лениво, при первом обращении к кэшу)."""
+    global _listener
+    if not LISTEN_ENABLED or _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(target=_listen_forever, name="tariff-listen", daemon=True)
+            _listener.start()
+
+
+def stats() -> dict:
+    return {
+        **TARIFF_CACHE.stats(),
+        "listening": _listening.is_set(),
+        "notifications": _notifications,
+        "ttl_sec": TTL_SEC,
+    }
@@ -0,0 +1,529 @@
+# backend/app/services/tg_outbox.py
+"""
+Исходящие сообщения Telegram: единственный путь отправки из бэкенда.
+
+- enqueue(db, text=..., user_id=/chat_id=, reply_markup=, parse_mode=) — строка в
+  notifications (status pending) в транзакции вызывающего; отправляет воркер.
+- drain_once() — личные сообщения (scope='user'): захват пачки (pending -> queued,
+  SKIP LOCKED), отправка общим httpx.AsyncClient, статусы — одним UPDATE на пачку.
+- broadcast_once() — одна рассылка (scope 'all' или 'segment:<key>', см. AUDIENCES)
+  по users постранично; курсор и счётчики в payload, после рестарта продолжает
+  с места остановки.
+- Порядок в чате: сообщения одного чата уходят последовательно; пока более раннее
+  сообщение пользователя в работе или на ретрае, следующие не захватываются.
+- Лимиты Telegram: общий темп TG_GLOBAL_PER_SEC, рассылки — не быстрее
+  TG_BROADCAST_PER_SEC (запас под личные), в один чат — не чаще TG_CHAT_INTERVAL_SEC.
+  429 — ждём retry_after (чат и весь бот) и повторяем.
+- Временная ошибка — pending с backoff, после TG_MAX_ATTEMPTS — failed;
+  400/403 (бот заблокирован, плохой chat_id) — сразу failed.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import text
+
+from app.db import engine
+
+BOT_TOKEN = (os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("BOT_TOKEN") or "").strip()
+API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+
+BATCH = int(os.getenv("TG_OUTBOX_BATCH", "100"))
+CONCURRENCY = int(os.getenv("TG_OUTBOX_CONCURRENCY", "20"))
+LEASE_SEC = float(os.getenv("TG_OUTBOX_LEASE_SEC", "300"))
+GLOBAL_PER_SEC = float(os.getenv("TG_GLOBAL_PER_SEC", "25"))
+BROADCAST_PER_SEC = float(os.getenv("TG_BROADCAST_PER_SEC", "15"))
+CHAT_INTERVAL_SEC = float(os.getenv("TG_CHAT_INTERVAL_SEC", "1"))
+MAX_ATTEMPTS = int(os.getenv("TG_MAX_ATTEMPTS", "5"))
+# 429 внутри одного прохода повторяем сразу после retry_after, не больше стольких раз
+MAX_RETRY_AFTER = int(os.getenv("TG_MAX_RETRY_AFTER", "3"))
+BROADCAST_PAGE = 500
+
+MAX_LEN = 4096
+
+# куда вести кнопки оплаты
+BACKEND_BASE = (os.getenv("BACKEND_BASE_URL") or "https://api.hhofferbot.ru").rstrip("/")
+
+
+# ---------- клавиатуры по умолчанию ----------
+
+def _payment_keyboard(tg_id: int) -> dict:
+    """Инлайн-кнопки оплаты для конкретного пользователя."""
+    week = f"{BACKEND_BASE}/pay?plan=week&tg_id={int(tg_id)}"
+    month = f"{BACKEND_BASE}/pay?plan=month&tg_id={int(tg_id)}"
+    return {
+        "inline_keyboard": [
+            [{"text": "Неделя — 690₽", "url": week}],
+            [{"text": "Месяц — 1900₽", "url": month}],
+        ]
+    }
+
+
+def _needs_payment_keyboard(text_msg: str) -> bool:
+    """Эвристика — если в тексте есть /payment или упоминание оплаты, подставим кнопки."""
+    t = (text_msg or "").lower()
+    return "/payment" in t or "оплат" in t
+
+
+# ---------- постановка ----------
+
+_INSERT_SQL = text("""
+    INSERT INTO notifications (user_id, chat_id, scope, text, payload, scheduled_at, status)
+    VALUES (
+        COALESCE(:uid, (SELECT id FROM users WHERE tg_id = :chat LIMIT 1)),
+        :chat, :scope, :txt, CAST(:p AS jsonb),
+        now() + make_interval(secs => :d), 'pending'
+    )
+    RETURNING id
+""")
+
+
+def enqueue(
+    db,
+    *,
+    text_msg: str,
+    user_id: Optional[int] = None,
+    chat_id: Optional[int] = None,
+    reply_markup: Optional[dict] = None,
+    parse_mode: Optional[str] = None,
+    scope: str = "user",
+    delay_sec: float = 0,
+) -> int:
+    """id уведомления. db — Session или Connection; commit — за вызывающим."""
+    payload = {}
+    if reply_markup:
+        payload["reply_markup"] = reply_markup
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
+    row = db.execute(_INSERT_SQL, {
+        "uid": int(user_id) if user_id else None,
+        "chat": int(chat_id) if chat_id else None,
+        "scope": scope,
+        "txt": text_msg,
+        "p": json.dumps(payload, ensure_ascii=False) if payload else None,
+        "d": float(delay_sec or 0),
+    }).first()
+    return int(row[0])
+
+
+def enqueue_now(**kw) -> int:
+    """enqueue отдельной транзакцией."""
+    with engine.begin() as conn:
+        return enqueue(conn, **kw)
+
+
+# ---------- темп ----------
+
+class _Pacer:
+    """Равномерный темп: слоты через 1/rate; pause() сдвигает все слоты (429)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / max(rate, 0.1)
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, sec: float) -> None:
+        self._next = max(self._next, time.monotonic() + sec)
+
+
+class _ChatPacer:
+    """Не чаще одного сообщения в чат за interval (слот резервируется до ожидания)."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next: Dict[int, float] = {}
+
+    async def wait(self, chat: int) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next.get(chat, 0.0))
+        self._next[chat] = slot + self.interval
+        if len(self._next) > 10000:
+            # старые слоты уже ничего не ограничивают
+            self._next = {c: t for c, t in self._next.items() if t > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, chat: int, sec: float) -> None:
+        self._next[chat] = max(self._next.get(chat, 0.0), time.monotonic() + sec)
+
+
+_GLOBAL = _Pacer(GLOBAL_PER_SEC)
+_BROADCAST = _Pacer(BROADCAST_PER_SEC)
+_CHATS = _ChatPacer(CHAT_INTERVAL_SEC)
+
+_counters = {"sent": 0, "failed": 0, "retried": 0, "rate_limited": 0}
+
+
+# ---------- HTTP ----------
+
+_client_state: dict = {"client": None, "loop": None}
+
+
+def _client() -> httpx.AsyncClient:
+    """Общий AsyncClient (пул соединений) на текущий event loop."""
+    loop = asyncio.get_running_loop()
+    client = _client_state["client"]
+    if client is None or client.is_closed or _client_state["loop"] is not loop:
+        client = httpx.AsyncClient(
+            base_url=f"{API_BASE}/bot{BOT_TOKEN}/",
+            timeout=15.0,
+            limits=httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY),
+        )
+        _client_state["client"], _client_state["loop"] = client, loop
+    return client
+
+
+async def aclose() -> None:
+    """Закрыть пул соединений (shutdown воркера)."""
+    client = _client_state["client"]
+    _client_state["client"], _client_state["loop"] = None, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+class TgError(Exception):
+    def __init__(self, code: int, description: str, retry_after: float = 0):
+        super().__init__(f"tg {code}: {description}")
+        self.code = code
+        self.retry_after = retry_after
+
+    @property
+    def permanent(self) -> bool:
+        # 400 — плохой запрос/чат, 403 — бот заблокирован: повтор не поможет
+        return self.code in (400, 403)
+
+
+async def _post(chat: int, part: str, reply_markup: Optional[dict], parse_mode: Optional[str]) -> None:
+    body = {"chat_id": int(chat), "text": part, "disable_web_page_preview": True}
+    if reply_markup:
+        body["reply_markup"] = reply_markup
+    if parse_mode:
+        body["parse_mode"] = parse_mode
+    try:
+        resp = await _client().post("sendMessage", json=body)
+    except httpx.HTTPError as e:
+        raise TgError(0, f"{type(e).__name__}: {e}")
+    if resp.status_code == 200:
+        return
+    try:
+        data = resp.json()
+    except ValueError:
+        data = {}
+    retry_after = float((data.get("parameters") or {}).get("retry_after") or 0)
+    raise TgError(resp.status_code, str(data.get("description") or resp.text[:200]), retry_after)
+
+
+async def send(
+    chat: int,
+    text_msg: str,
+    reply_markup: Optional[dict] = None,
+    parse_mode: Optional[str] = None,
+    pacer: Optional[_Pacer] = None,
+) -> None:
+    """
+    Отправить одно сообщение (длинное — частями по 4096, кнопки с первой частью)
+    с соблюдением лимитов. 429 — ждём retry_after и повторяем; TgError наружу —
+    если повторы кончились или ошибка не 429.
+    """
+    parts = [text_msg[i: i + MAX_LEN] for i in range(0, len(text_msg), MAX_LEN)] or [text_msg]
+    for idx, part in enumerate(parts):
+        for attempt in range(MAX_RETRY_AFTER + 1):
+            await _CHATS.wait(chat)
+            if pacer is not None:
+                await pacer.wait()
+            await _GLOBAL.wait()
+            try:
+                await _post(chat, part, reply_markup if idx == 0 else None, parse_mode)
+                break
+            except TgError as e:
+                if e.code != 429 or attempt >= MAX_RETRY_AFTER:
+                    raise
+                _counters["rate_limited"] += 1
+                # flood control у Telegram общий на бота — притормаживаем всё
+                _CHATS.pause(chat, e.retry_after)
+                _GLOBAL.pause(e.retry_after)
+
+
+# ---------- личные сообщения ----------
+
+_REAP_SQL = text("""
+    UPDATE notifications
+       SET status = 'pending', updated_at = now()
+     WHERE status = 'queued'
+       AND updated_at < now() - make_interval(secs => :lease)
+""")
+
+_CLAIM_SQL = text("""
+    WITH picked AS (
+        SELECT n.id
+          FROM notifications n
+         WHERE n.status = 'pending' AND n.scope = 'user' AND n.scheduled_at <= now()
+           AND NOT EXISTS (
+               SELECT 1 FROM notifications p
+                WHERE p.user_id = n.user_id AND p.id < n.id AND p.scope = 'user'
+                  AND (p.status = 'queued' OR (p.status = 'pending' AND p.attempts > 0))
+           )
+         ORDER BY n.scheduled_at, n.id
+         LIMIT :lim
+         FOR UPDATE OF n SKIP LOCKED
+    )
+    UPDATE notifications n
+       SET status = 'queued', updated_at = now()
+      FROM picked
+     WHERE n.id = picked.id
+    RETURNING n.id, n.user_id, n.chat_id, n.text, n.payload, n.attempts,
+              (SELECT u.tg_id FROM users u WHERE u.id = n.user_id) AS tg_id
+""")
+
+# статусы пачки одним запросом: r.tried — была ли попытка (attempts +1)
+_WRITE_SQL = text("""
+    UPDATE notifications n
+       SET status       = r.status,
+           sent_at      = CASE WHEN r.status = 'sent' THEN now() ELSE n.sent_at END,
+           error        = r.error,
+           attempts     = n.attempts + r.tried,
+           scheduled_at = CASE WHEN r.status = 'pending'
+                               THEN now() + make_interval(secs => r.delay)
+                               ELSE n.scheduled_at END,
+           updated_at   = now()
+      FROM jsonb_to_recordset(CAST(:rows AS jsonb))
+           AS r(id bigint, status text, error text, tried int, delay float8)
+     WHERE n.id = r.id AND n.status = 'queued'
+""")
+
+
+def _claim(limit: int) -> List[dict]:
+    with engine.begin() as conn:
+        conn.execute(_REAP_SQL, {"lease": LEASE_SEC})
+        rows = conn.execute(_CLAIM_SQL, {"lim": int(limit)}).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def _write(results: List[dict]) -> None:
+    if not results:
+        return
+    with engine.begin() as conn:
+        conn.execute(_WRITE_SQL, {"rows": json.dumps(results, ensure_ascii=False)})
+
+
+def _backoff(attempts: int) -> float:
+    return min(30.0 * 2 ** attempts, 3600.0)
+
+
+@dataclass
+class _Msg:
+    id: int
+    chat: Optional[int]
+    text: str
+    reply_markup: Optional[dict]
+    parse_mode: Optional[str]
+    attempts: int
+
+
+def _to_msg(row: dict) -> _Msg:
+    payload = row["payload"] if isinstance(row["payload"], dict) else json.loads(row["payload"] or "{}")
+    chat = row["chat_id"] or row["tg_id"]
+    markup = payload.get("reply_markup")
+    if markup is None and chat and _needs_payment_keyboard(row["text"]):
+        markup = _payment_keyboard(int(chat))
+    return _Msg(int(row["id"]), int(chat) if chat else None, row["text"] or "",
+                markup, payload.get("parse_mode"), int(row["attempts"] or 0))
+
+
+async def _drain_chat(msgs: List[_Msg], sem: asyncio.Semaphore, results: List[dict]) -> None:
+    """Сообщения одного чата — по порядку; после временной ошибки остальные ждут её ретрая."""
+    async with sem:
+        for i, m in enumerate(msgs):
+            try:
+                await send(m.chat, m.text, m.reply_markup, m.parse_mode)
+            except TgError as e:
+                err = str(e)[:1000]
+                if e.permanent or m.attempts + 1 >= MAX_ATTEMPTS:
+                    _counters["failed"] += 1
+                    results.append({"id": m.id, "status": "failed", "error": err, "tried": 1, "delay": 0})
+                    continue
+                _counters["retried"] += 1
+                delay = max(_backoff(m.attempts), e.retry_after)
+                results.append({"id": m.id, "status": "pending", "error": err, "tried": 1, "delay": delay})
+                # следующие — обратно без попытки: их не захватят, пока не уйдёт это
+                results += [{"id": r.id, "status": "pending", "error": None, "tried": 0, "delay": 0}
+                            for r in msgs[i + 1:]]
+                return
+            _counters["sent"] += 1
+            results.append({"id": m.id, "status": "sent", "error": None, "tried": 1, "delay": 0})
+
+
+async def drain_once(limit: int = BATCH) -> dict:
+    """Один проход по личным сообщениям; {'sent', 'failed', 'retry'} (пустой — если нечего)."""
+    if not BOT_TOKEN:
+        return {}
+    rows = await asyncio.to_thread(_claim, limit)
+    if not rows:
+        return {}
+    results: List[dict] = []
+    by_chat: Dict[int, List[_Msg]] = defaultdict(list)
+    for m in sorted(map(_to_msg, rows), key=lambda m: m.id):
+        if m.chat is None:
+            results.append({"id": m.id, "status": "failed", "error": "user has no tg_id", "tried": 1, "delay": 0})
+        else:
+            by_chat[m.chat].append(m)
+    sem = asyncio.Semaphore(CONCURRENCY)
+    try:
+        await asyncio.gather(*(_drain_chat(msgs, sem, results) for msgs in by_chat.values()))
+    finally:
+        # и при отмене (shutdown) фиксируем то, что успели; остальное вернёт reap по lease
+        await asyncio.shield(asyncio.to_thread(_write, results))
+    out = {"sent": 0, "failed": 0, "pending": 0}
+    for r in results:
+        out[r["status"]] += 1
+    return {"sent": out["sent"], "failed": out["failed"], "retry": out["pending"]}
+
+
+# ---------- рассылки ----------
+
+# получатели рассылок по scope (условие на users u); тот же список — в админке
+AUDIENCES = {
+    "all": "TRUE",
+    "segment:premium": """
+        EXISTS (SELECT 1 FROM subscriptions s WHERE s.user_id = u.id AND s.status = 'active')
+    """,
+    "segment:no_subscription": """
+        NOT EXISTS (SELECT 1 FROM subscriptions s WHERE s.user_id = u.id AND s.status = 'active')
+    """,
+    "segment:active": "u.last_seen_at >= now() - INTERVAL '30 days'",
+    "segment:auto_responses": """
+        EXISTS (SELECT 1 FROM auto_responses ar WHERE ar.user_id = u.id AND ar.active = TRUE)
+    """,
+    "segment:ai_responses": """
+        EXISTS (SELECT 1 FROM ai_responses_settings a WHERE a.user_id = u.id AND a.enabled = TRUE)
+    """,
+}
+
+
+def audience_sql(scope: str) -> Optional[str]:
+    """SELECT u.id, u.tg_id получателей рассылки scope (без порядка); None — scope не рассылка."""
+    cond = AUDIENCES.get(scope)
+    if cond is None:
+        return None
+    return f"SELECT u.id, u.tg_id FROM users u WHERE u.tg_id IS NOT NULL AND ({cond})"
+
+
+# всё, что не 'user', — рассылка; неизвестный scope закрываем как failed, а не оставляем pending
+_CLAIM_BROADCAST_SQL = text("""
+    WITH picked AS (
+        SELECT id FROM notifications
+         WHERE status = 'pending' AND scope <> 'user' AND scheduled_at <= now()
+         ORDER BY scheduled_at, id
+         LIMIT 1
+         FOR UPDATE SKIP LOCKED
+    )
+    UPDATE notifications n
+       SET status = 'queued', updated_at = now()
+      FROM picked
+     WHERE n.id = picked.id
+    RETURNING n.id, n.scope, n.text, n.payload
+""")
+
+
+def _claim_broadcast() -> Optional[dict]:
+    with engine.begin() as conn:
+        conn.execute(_REAP_SQL, {"lease": LEASE_SEC})
+        row = conn.execute(_CLAIM_BROADCAST_SQL).mappings().first()
+    return dict(row) if row else None
+
+
+def _recipients(scope: str, after: int) -> List[tuple]:
+    with engine.connect() as conn:
+        return [tuple(r) for r in conn.execute(text(f"""
+            SELECT id, tg_id FROM ({audience_sql(scope)}) r
+             WHERE id > :after
+             ORDER BY id
+             LIMIT :lim
+        """), {"after": after, "lim": BROADCAST_PAGE}).all()]
+
+
+def _save_progress(nid: int, state: dict, status: Optional[str] = None) -> None:
+    """
+    Курсор рассылки в payload (заодно продлевает lease); status — финал: курсор и
+    счётчики сбрасываются (итог — в error), повторная отправка из админки идёт с начала.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE notifications
+               SET payload = CASE WHEN :status IS NULL
+                                  THEN COALESCE(payload, '{}'::jsonb) || CAST(:st AS jsonb)
+                                  ELSE COALESCE(payload, '{}'::jsonb) - 'cursor' - 'sent' - 'failed' - 'last_error'
+                             END,
+                   status  = COALESCE(:status, status),
+                   sent_at = CASE WHEN :status = 'sent' THEN now() ELSE sent_at END,
+                   error   = CASE WHEN :status IS NULL THEN error ELSE :err END,
+                   updated_at = now()
+             WHERE id = :id AND status = 'queued'
+        """), {
+            "id": nid, "st": json.dumps(state, ensure_ascii=False), "status": status,
+            "err": (f"{state['failed']} of {state['sent'] + state['failed']} failed: {state.get('last_error')}"
+                    if state["failed"] else None),
+        })
+
+
+async def broadcast_once() -> dict:
+    """Одна рассылка (или продолжение прерванной) до конца."""
+    if not BOT_TOKEN:
+        return {}
+    row = await asyncio.to_thread(_claim_broadcast)
+    if not row:
+        return {}
+    payload = row["payload"] if isinstance(row["payload"], dict) else json.loads(row["payload"] or "{}")
+    state = {
+        "cursor": int(payload.get("cursor") or 0),
+        "sent": int(payload.get("sent") or 0),
+        "failed": int(payload.get("failed") or 0),
+        "last_error": payload.get("last_error"),
+    }
+    if audience_sql(row["scope"]) is None:
+        state["last_error"] = f"unknown scope {row['scope']!r}"
+        state["failed"] = 1
+        await asyncio.to_thread(_save_progress, row["id"], state, "failed")
+        return {"broadcast": row["id"], "sent": 0, "failed": 1}
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(tg: int) -> None:
+        async with sem:
+            try:
+                await send(int(tg), row["text"] or "", payload.get("reply_markup"),
+                           payload.get("parse_mode"), pacer=_BROADCAST)
+                state["sent"] += 1
+                _counters["sent"] += 1
+            except TgError as e:
+                state["failed"] += 1
+                state["last_error"] = str(e)[:300]
+
+    while True:
+        page = await asyncio.to_thread(_recipients, row["scope"], state["cursor"])
+        if not page:
+            break
+        await asyncio.gather(*(one(tg) for _, tg in page))
+        state["cursor"] = int(page[-1][0])
+        await asyncio.to_thread(_save_progress, row["id"], state)
+
+    # все адресаты не получили — failed, иначе sent (число неудач — в error)
+    final = "failed" if state["failed"] and not state["sent"] else "sent"
+    await asyncio.to_thread(_save_progress, row["id"], state, final)
+    return {"broadcast": row["id"], "sent": state["sent"], "failed": state["failed"]}
+
+
+def stats() -> dict:
+    return dict(_counters)
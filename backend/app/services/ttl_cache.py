@@ -0,0 +1,155 @@
+# backend/app/services/ttl_cache.py
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+def _approx_size(value: Any) -> int:
+    """Грубая оценка размера значения в байтах (по JSON-представлению)."""
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except Exception:
+        return 1024
+
+
+class TTLCache:
+    """
+    In-process LRU-кэш с TTL, ограничением по числу записей и по памяти.
+
+    Запись живёт `ttl` секунд как свежая, затем ещё `stale_ttl` секунд
+    может отдаваться как устаревшая (stale-while-revalidate).
+    Потокобезопасен: им пользуются и async-, и sync-эндпоинты.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        ttl: float = 60.0,
+        stale_ttl: float = 0.0,
+        max_items: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+    ):
+        self.name = name
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.max_items = int(max_items)
+        self.max_bytes = int(max_bytes)
+
+        # key -> (value, fresh_until, stale_until, size)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._revalidating: set[Hashable] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.revalidations = 0
+
+    # ---------- чтение/запись ----------
+
+    def get(self, key: Hashable) -> Tuple[Any, Optional[str]]:
+        """Вернёт (value, 'fresh' | 'stale') или (None, None) при промахе."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            value, fresh_until, stale_until, _ = entry
+            if now < fresh_until:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value, "fresh"
+            if now < stale_until:
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                return value, "stale"
+            self._drop(key)
+            self.misses += 1
+            return None, None
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        *,
+        ttl: Optional[float] = None,
+        stale_ttl: Optional[float] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        ttl = self.ttl if ttl is None else float(ttl)
+        stale_ttl = self.stale_ttl if stale_ttl is None else float(stale_ttl)
+        if ttl <= 0:
+            return
+        size = _approx_size(value) if size is None else int(size)
+        if size > self.max_bytes:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, now + ttl, now + ttl + stale_ttl, size)
+            self._bytes += size
+            self.sets += 1
+            while self._data and (len(self._data) > self.max_items or self._bytes > self.max_bytes):
+                old_key = next(iter(self._data))
+                self._drop(old_key)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    # ---------- фоновое обновление ----------
+
+    def begin_revalidate(self, key: Hashable) -> bool:
+        """True, если обновление ключа ещё никто не запустил (дедуп фоновых задач)."""
+        with self._lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+            self.revalidations += 1
+            return True
+
+    def end_revalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._revalidating.discard(key)
+
+    # ---------- метрики ----------
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "name": self.name,
+                "items": len(self._data),
+                "bytes": self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "sets": self.sets,
+                "evictions": self.evictions,
+                "revalidations": self.revalidations,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,370 @@
+# backend/app/worker.py
+"""
+Фоновый процесс: `python -m app.worker` (из backend/).
+
+Все фоновые циклы — asyncio-задачи одного event loop под супервизором:
+диспетчер откликов, автоотклики, отправка уведомлений и рассылок (tg_outbox),
+напоминания о подписке, роллапы метрик, обслуживание секций applications,
+очередь background_jobs. API-воркеры uvicorn их больше не запускают.
+
+- Включение по циклам: ENABLE_DISPATCHER, ENABLE_AUTO_SCHEDULER, ENABLE_NOTIFIER,
+  ENABLE_REMINDERS, ENABLE_METRICS_ROLLUP, ENABLE_APPLICATIONS_PARTITIONS, ENABLE_JOBS
+  (в воркере по умолчанию 1, выключить — 0).
+- Ошибка итерации логируется, следующая — с backoff; упавшая задача перезапускается.
+- Несколько реплик воркера: singleton-циклы идут только на лидере
+  (services/leader.py), диспетчер делит заявки по шардам user_id (DISPATCH_SHARDS).
+- Здоровье: WORKER_HEALTH_FILE (json), `python -m app.worker --health` — код 0/1
+  для healthcheck контейнера.
+- SIGTERM/SIGINT: новые итерации не начинаются, текущие (отправки в HH/Telegram)
+  дорабатывают до WORKER_SHUTDOWN_GRACE_SEC, потом отменяются.
+- Диспетчер и автоотклики ходят в БД синхронной сессией вперемешку с запросами к HH,
+  поэтому идут на отдельном event loop в своём потоке (_HHLoop): основной loop
+  (heartbeat лидерства, health, tg_outbox, jobs) они не блокируют. Loop у них общий —
+  пул httpx и single-flight hh_client привязаны к одному loop.
+"""
+from __future__ import annotations
+
+import os
+
+from app.core.env import load_env
+
+load_env()
+# размер пулов app.db — по роли процесса; задаём до первого импорта app.db
+os.environ.setdefault("PROCESS_ROLE", "worker")
+
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+HEALTH_FILE = os.getenv("WORKER_HEALTH_FILE", "/tmp/hhbot-worker-health.json")
+HEALTH_EVERY_SEC = float(os.getenv("WORKER_HEALTH_EVERY_SEC", "10"))
+SHUTDOWN_GRACE_SEC = float(os.getenv("WORKER_SHUTDOWN_GRACE_SEC", "30"))
+MAX_BACKOFF_SEC = float(os.getenv("WORKER_MAX_BACKOFF_SEC", "300"))
+
+
+def _flag(name: str, default: str = "1") -> bool:
+    return (os.getenv(name, default) or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass
+class Loop:
+    name: str
+    step: Callable[[], Awaitable[object]]
+    interval: float
+    enabled: bool = True
+    singleton: bool = False
+    standby: bool = False
+    active_since: Optional[float] = None
+    runs: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    restarts: int = 0
+    busy_since: Optional[float] = None
+    last_ok: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def state(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "singleton": self.singleton,
+            "standby": self.standby,
+            "active_since": self.active_since,
+            "interval_sec": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "restarts": self.restarts,
+            "busy_since": self.busy_since,
+            "last_ok": self.last_ok,
+            "last_error": self.last_error,
+        }
+
+
+class _HHLoop:
+    """Отдельный event loop в потоке для шагов с синхронной БД и запросами к HH."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="worker-hh", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    async def run(self, fn: Callable[[], Awaitable[object]]):
+        # отмена на основном loop (grace при остановке) отменяет и задачу в потоке
+        fut = asyncio.run_coroutine_threadsafe(fn(), self._ensure())
+        return await asyncio.wrap_future(fut)
+
+    async def close(self) -> None:
+        if self._loop is None:
+            return
+        from app.services import hh_client
+        loop, thread = self._loop, self._thread
+        self._loop = self._thread = None
+        try:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(hh_client.aclose(), loop))
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            await asyncio.to_thread(thread.join, 5)
+            if not thread.is_alive():
+                loop.close()
+
+
+_hh_loop = _HHLoop()
+
+
+# --- шаги циклов (импорты внутри: `--health` не тянет БД и роутеры) ---
+
+async def _dispatch_step():
+    from app.services.dispatcher import dispatch_once
+    from app.services.leader import get_elector
+    # шарды перезахватываются между батчами: отпущенный шард уже не в работе
+    total = int(os.getenv("DISPATCH_SHARDS", "16"))
+    shards = await asyncio.to_thread(get_elector().claim_shards, "dispatcher", total)
+    return await _hh_loop.run(lambda: dispatch_once(
+        dry_run=False, limit=int(os.getenv("DISPATCH_BATCH", "50")), shards=shards, shard_count=total,
+    ))
+
+
+async def _auto_step():
+    from app.services.auto_scheduler import dispatch_auto_once
+    return await _hh_loop.run(dispatch_auto_once)
+
+
+async def _notifier_step():
+    from app.services import tg_outbox
+    return await tg_outbox.drain_once()
+
+
+async def _broadcasts_step():
+    from app.services import tg_outbox
+    return await tg_outbox.broadcast_once()
+
+
+async def _reminders_step():
+    from app.services import notifier
+    return await asyncio.to_thread(notifier.schedule_subscription_reminders)
+
+
+async def _metrics_rollup_step():
+    from app.services.metrics_rollup import refresh_recent
+    return await asyncio.to_thread(refresh_recent)
+
+
+async def _applications_partitions_step():
+    from app.services.applications_store import maintain
+    return await asyncio.to_thread(maintain)
+
+
+_job_handlers: Optional[List[str]] = None
+
+
+async def _jobs_step():
+    global _job_handlers
+    from app.services import job_queue
+    if _job_handlers is None:
+        _job_handlers = job_queue.load_handlers()
+        print(f"[worker:jobs] handlers: {', '.join(_job_handlers) or 'none'}")
+    return await job_queue.drain_once()
+
+
+def build_loops() -> List[Loop]:
+    bot_token = (os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("BOT_TOKEN") or "").strip()
+    return [
+        Loop("dispatcher", _dispatch_step, float(os.getenv("DISPATCH_EVERY_SEC", "5")),
+             _flag("ENABLE_DISPATCHER")),
+        Loop("auto_scheduler", _auto_step, float(os.getenv("AUTO_POLL_EVERY_SEC", "300")),
+             _flag("ENABLE_AUTO_SCHEDULER"), singleton=True),
+        # без токена бота отправлять нечем; личные и рассылки — раздельно, рассылка не держит личные
+        Loop("notifier", _notifier_step, float(os.getenv("NOTIFIER_EVERY_SEC", "1")),
+             _flag("ENABLE_NOTIFIER") and bool(bot_token), singleton=True),
+        Loop("broadcasts", _broadcasts_step, float(os.getenv("BROADCASTS_EVERY_SEC", "10")),
+             _flag("ENABLE_NOTIFIER") and bool(bot_token), singleton=True),
+        Loop("reminders", _reminders_step, float(os.getenv("REMINDERS_EVERY_SEC", "60")),
+             _flag("ENABLE_REMINDERS"), singleton=True),
+        Loop("metrics_rollup", _metrics_rollup_step, float(os.getenv("METRICS_ROLLUP_EVERY_SEC", "300")),
+             _flag("ENABLE_METRICS_ROLLUP"), singleton=True),
+        Loop("applications_partitions", _applications_partitions_step,
+             float(os.getenv("APPLICATIONS_MAINTAIN_EVERY_SEC", "21600")),
+             _flag("ENABLE_APPLICATIONS_PARTITIONS"), singleton=True),
+        # очередь задач разбирают все реплики (SKIP LOCKED)
+        Loop("jobs", _jobs_step, float(os.getenv("JOBS_POLL_SEC", "1")), _flag("ENABLE_JOBS")),
+    ]
+
+
+# --- супервизор ---
+
+async def _sleep_or_stop(stop: asyncio.Event, delay: float) -> None:
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=max(delay, 0))
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _run_loop(loop: Loop, stop: asyncio.Event) -> None:
+    """Итерации до сигнала остановки; начатая итерация всегда доводится до конца."""
+    from app.services.leader import HEARTBEAT_SEC, get_elector
+
+    while not stop.is_set():
+        if loop.singleton and not get_elector().is_leader():
+            loop.standby, loop.active_since = True, None
+            await _sleep_or_stop(stop, min(loop.interval, HEARTBEAT_SEC))
+            continue
+        if loop.active_since is None:
+            loop.standby, loop.active_since = False, time.time()
+        loop.busy_since = time.time()
+        try:
+            result = await loop.step()
+            loop.runs += 1
+            loop.consecutive_failures = 0
+            loop.last_ok = time.time()
+            if result:
+                print(f"[worker:{loop.name}] {result}")
+        except Exception as e:
+            loop.failures += 1
+            loop.consecutive_failures += 1
+            loop.last_error = f"{type(e).__name__}: {e}"[:300]
+            print(f"[worker:{loop.name}] error: {loop.last_error}")
+        finally:
+            loop.busy_since = None
+        delay = loop.interval
+        if loop.consecutive_failures:
+            delay = min(loop.interval * 2 ** (loop.consecutive_failures - 1), max(MAX_BACKOFF_SEC, loop.interval))
+        await _sleep_or_stop(stop, delay)
+
+
+def health(snapshot: dict, now: Optional[float] = None) -> Tuple[bool, List[str]]:
+    """(ok, проблемы) по снимку состояния: файл свежий, включённые циклы давно не молчат."""
+    now = now or time.time()
+    problems = []
+    if now - float(snapshot.get("updated_at") or 0) > HEALTH_EVERY_SEC * 3:
+        problems.append("health snapshot is stale")
+    started = float(snapshot.get("started_at") or now)
+    for name, st in (snapshot.get("loops") or {}).items():
+        if not st.get("enabled") or st.get("standby"):
+            continue
+        # отсчёт — с последнего успеха или с момента, когда цикл стал активным (лидерство)
+        last = max(st.get("last_ok") or 0, st.get("active_since") or 0) or started
+        if now - last > max(st["interval_sec"] * 3, 120):
+            problems.append(f"{name}: no successful run for {int(now - last)}s ({st.get('last_error') or 'busy'})")
+    return not problems, problems
+
+
+def _write_health(loops: List[Loop], started_at: float, stopping: bool) -> None:
+    from app.services.leader import get_elector
+
+    snap = {
+        "pid": os.getpid(),
+        "started_at": started_at,
+        "updated_at": time.time(),
+        "stopping": stopping,
+        "leader": get_elector().stats(),
+        "loops": {lp.name: lp.state() for lp in loops},
+    }
+    tmp = f"{HEALTH_FILE}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(snap, f)
+        os.replace(tmp, HEALTH_FILE)
+    except OSError as e:
+        print(f"[worker] health file write failed: {e}")
+
+
+async def _leader_heartbeat(stop: asyncio.Event) -> None:
+    from app.services.leader import HEARTBEAT_SEC, get_elector
+
+    elector = get_elector()
+    while not stop.is_set():
+        await asyncio.to_thread(elector.tick)
+        await _sleep_or_stop(stop, HEARTBEAT_SEC)
+
+
+async def run(loops: Optional[List[Loop]] = None) -> None:
+    from app.services.leader import get_elector
+
+    loops = loops if loops is not None else build_loops()
+    active = [lp for lp in loops if lp.enabled]
+    started_at = time.time()
+    stop = asyncio.Event()
+
+    ev = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            ev.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    print(f"[worker] started: {', '.join(lp.name for lp in active) or 'no loops enabled'}")
+    heartbeat = asyncio.create_task(_leader_heartbeat(stop), name="leader")
+    tasks: Dict[asyncio.Task, Loop] = {asyncio.create_task(_run_loop(lp, stop), name=lp.name): lp for lp in active}
+
+    while not stop.is_set():
+        _write_health(loops, started_at, stopping=False)
+        if not tasks:
+            await _sleep_or_stop(stop, HEALTH_EVERY_SEC)
+            continue
+        done, _ = await asyncio.wait(tasks, timeout=HEALTH_EVERY_SEC, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            lp = tasks.pop(t)
+            if stop.is_set():
+                continue
+            # _run_loop сам ловит ошибки шагов — сюда попадают только сбои супервизора
+            exc = t.exception() if not t.cancelled() else None
+            lp.restarts += 1
+            lp.last_error = f"loop crashed: {exc!r}"[:300]
+            print(f"[worker:{lp.name}] {lp.last_error}; restarting")
+            await _sleep_or_stop(stop, min(2 ** lp.restarts, MAX_BACKOFF_SEC))
+            tasks[asyncio.create_task(_run_loop(lp, stop), name=lp.name)] = lp
+
+    # graceful: ждём текущие итерации (отправки), потом отменяем
+    print(f"[worker] stopping, draining {len(tasks)} loops (grace {SHUTDOWN_GRACE_SEC:.0f}s)")
+    _write_health(loops, started_at, stopping=True)
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=SHUTDOWN_GRACE_SEC)
+        for t in pending:
+            print(f"[worker:{tasks[t].name}] did not finish in time, cancelling")
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    await asyncio.gather(heartbeat, return_exceptions=True)
+    # отдаём лидерство и шарды сразу — другая реплика подхватит без ожидания TTL
+    await asyncio.to_thread(get_elector().release)
+    from app.services import tg_outbox
+    await tg_outbox.aclose()
+    await _hh_loop.close()
+    print("[worker] stopped")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Фоновые циклы hhbot (диспетчер, автоотклики, уведомления)")
+    ap.add_argument("--health", action="store_true", help="проверить WORKER_HEALTH_FILE и выйти (0 — ok)")
+    args = ap.parse_args(argv)
+
+    if args.health:
+        try:
+            with open(HEALTH_FILE) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"unhealthy: {e}")
+            return 1
+        ok, problems = health(snapshot)
+        print("ok" if ok else "unhealthy: " + "; ".join(problems))
+        return 0 if ok else 1
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
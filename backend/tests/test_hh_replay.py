@@ -0,0 +1,180 @@
+# backend/tests/test_hh_replay.py
+"""
+Пути к HH API в replay-режиме (services/hh_replay.py, фикстуры backend/fixtures/hh):
+схлопывание hh_get, фолбэки и листание поиска кампаний, исходы send_response.
+Сеть и БД не нужны. В конце — маленький бенчмарк: с задержкой ответа HH
+зонды и страницы поиска должны идти параллельно, а не по очереди.
+"""
+import asyncio
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.services import hh_client
+from app.services.hh_replay import ReplayTransport
+
+FIXTURES = Path(__file__).resolve().parents[1] / "fixtures" / "hh"
+
+
+class _NoTokenDb:
+    """Вместо сессии: токена HH у пользователя нет (поиск идёт без авторизации)."""
+
+    def execute(self, *args, **kwargs):
+        return self
+
+    def scalar(self):
+        return None
+
+
+def _transport(latency_ms: float = 0) -> ReplayTransport:
+    return ReplayTransport("replay", FIXTURES, latency_ms=latency_ms, error_rate=0)
+
+
+@pytest.fixture
+def campaigns(monkeypatch):
+    from app.api.v1 import campaigns as module
+
+    def use(transport: ReplayTransport):
+        client = httpx.Client(transport=transport)
+        monkeypatch.setitem(module._hh_sync_state, "client", client)
+        return client
+
+    yield module, use
+    client = module._hh_sync_state.get("client")
+    if client is not None:
+        client.close()
+
+
+def _search(module, qp: str, limit: int) -> list:
+    return [it["id"] for it in module._hh_search_by_qs(_NoTokenDb(), 1, qp, limit)]
+
+
+# ---------- hh_get ----------
+
+def test_hh_get_coalesces_concurrent_requests(monkeypatch):
+    transport = _transport(latency_ms=50)
+
+    async def run():
+        monkeypatch.setitem(hh_client._client_state, "client", httpx.AsyncClient(transport=transport))
+        monkeypatch.setitem(hh_client._client_state, "loop", asyncio.get_running_loop())
+        leaders = hh_client.HH_GET_FLIGHT.leaders
+        try:
+            responses = await asyncio.gather(*(hh_client.hh_get("/vacancies/1001") for _ in range(20)))
+        finally:
+            await hh_client.aclose()
+        return responses, hh_client.HH_GET_FLIGHT.leaders - leaders
+
+    responses, leaders = asyncio.run(run())
+    assert {r.status_code for r in responses} == {200}
+    assert {r.json()["id"] for r in responses} == {"1001"}
+    assert leaders == 1
+    assert transport.stats()["served"] == 1
+
+
+def test_hh_get_does_not_coalesce_different_tokens(monkeypatch):
+    transport = _transport(latency_ms=20)
+
+    async def run():
+        monkeypatch.setitem(hh_client._client_state, "client", httpx.AsyncClient(transport=transport))
+        monkeypatch.setitem(hh_client._client_state, "loop", asyncio.get_running_loop())
+        try:
+            return await asyncio.gather(
+                hh_client.hh_get("/vacancies/1001", access_token="a"),
+                hh_client.hh_get("/vacancies/1001", access_token="b"),
+            )
+        finally:
+            await hh_client.aclose()
+
+    asyncio.run(run())
+    assert transport.stats()["served"] == 2
+
+
+# ---------- поиск кампаний ----------
+
+def test_search_falls_back_when_professional_role_is_rejected(campaigns):
+    module, use = campaigns
+    transport = _transport()
+    use(transport)
+    # зонд с professional_role=999 — 400, берём вариант без него
+    assert _search(module, "text=python&area=1&professional_role=999", limit=2) == ["1001", "1002"]
+    assert transport.stats()["misses"] == 0
+
+
+def test_search_falls_back_when_probe_is_empty(campaigns):
+    module, use = campaigns
+    transport = _transport()
+    use(transport)
+    # с search_field=name найдено 0 — листаем text + area
+    assert _search(module, "text=python&area=1&search_field=name", limit=2) == ["1001", "1002"]
+    assert transport.stats()["misses"] == 0
+
+
+def test_search_with_nothing_found_costs_one_probe_round(campaigns):
+    module, use = campaigns
+    transport = _transport()
+    use(transport)
+    assert _search(module, "text=zzzqqq&area=1", limit=5) == []
+    assert transport.stats()["served"] == 1
+
+
+def test_search_pages_and_dedups(campaigns):
+    module, use = campaigns
+    transport = _transport()
+    use(transport)
+    ids = _search(module, "text=golang&area=1", limit=150)
+    # страница 1 повторяет хвост страницы 0 (выдача сдвинулась) — дубли отброшены
+    assert ids == [str(i) for i in range(5000, 5150)]
+    assert transport.stats()["served"] == 3  # зонд + 2 страницы
+
+
+# ---------- send_response ----------
+
+def _send(monkeypatch, vacancy_id: int, transport: ReplayTransport):
+    monkeypatch.setattr(hh_client, "hh_transport", lambda: transport)
+    return asyncio.run(hh_client.send_response("token", vacancy_id, "r1", None))
+
+
+def test_send_response_ok(monkeypatch):
+    assert _send(monkeypatch, 1001, _transport()) is None
+
+
+def test_send_response_already_applied(monkeypatch):
+    with pytest.raises(hh_client.HHAlreadyApplied):
+        _send(monkeypatch, 2002, _transport())
+
+
+def test_send_response_unauthorized(monkeypatch):
+    with pytest.raises(hh_client.HHUnauthorized):
+        _send(monkeypatch, 4010, _transport())
+
+
+def test_send_response_rate_limited_is_retryable(monkeypatch):
+    transport = _transport()
+    with pytest.raises(hh_client.HHError) as e:
+        _send(monkeypatch, 4290, transport)
+    assert not isinstance(e.value, hh_client.HHUnauthorized)
+    assert "429" in str(e.value)
+    # основной и запасной эндпоинты
+    assert transport.stats()["served"] == 2
+
+
+# ---------- бенчмарк ----------
+
+def test_replay_benchmark_search_is_parallel(campaigns):
+    module, use = campaigns
+    latency_ms = 100
+    transport = _transport(latency_ms=latency_ms)
+    use(transport)
+
+    started = time.perf_counter()
+    ids = _search(module, "text=python&area=1&professional_role=999", limit=2)
+    elapsed = time.perf_counter() - started
+    requests = transport.stats()["served"]
+    print(f"[bench] search: {requests} HH requests, {elapsed * 1000:.0f} ms at {latency_ms} ms/request")
+
+    assert ids == ["1001", "1002"]
+    # 2 зонда параллельно + 1 страница = 2 раунда задержки; последовательно было бы 3
+    assert requests == 3
+    assert elapsed < (requests - 0.5) * latency_ms / 1000
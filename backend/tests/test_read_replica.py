@@ -0,0 +1,71 @@
+# backend/tests/test_read_replica.py
+"""
+Маршрутизация read_engine (app/db.py): модуль из DB_READ_REPLICA_MODULES читает
+с реплики, остальные — с primary; недоступная или отстающая реплика — откат на
+primary. Нужна реплика в DATABASE_REPLICA_URL (подойдёт и обычный инстанс —
+лаг у него 0), без неё — skip.
+"""
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("DATABASE_REPLICA_URL"), reason="DATABASE_REPLICA_URL is not set"
+)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    from app import db as db_module
+
+    monkeypatch.setattr(db_module, "DB_READ_REPLICA_MODULES", {"admin_dashboard"})
+    monkeypatch.setattr(db_module, "REPLICA_MAX_LAG_SEC", 30.0)
+    # лаг перепроверяется в каждом тесте, а не берётся из прошлого
+    monkeypatch.setitem(db_module._replica_state, "checked_at", 0.0)
+    monkeypatch.setitem(db_module._replica_state, "lag_sec", None)
+    return db_module
+
+
+def _application_name(bind) -> str:
+    from sqlalchemy import text
+
+    with bind.connect() as conn:
+        return conn.execute(text("SELECT current_setting('application_name')")).scalar()
+
+
+def test_routed_module_reads_from_replica(db):
+    before = db.replica_stats()["routed"]
+    bind = db.read_engine("app.api.v1.admin_dashboard")
+    assert bind is db.replica_engine
+    assert _application_name(bind).endswith("-ro")
+    assert db.replica_stats()["routed"] == before + 1
+
+
+def test_unlisted_module_stays_on_primary(db):
+    bind = db.read_engine("app.api.v1.users")
+    assert bind is db.engine
+    # без проверки лага: к реплике не ходили
+    assert db._replica_state["checked_at"] == 0.0
+
+
+def test_lagging_replica_falls_back_to_primary(db, monkeypatch):
+    # любой измеренный лаг (даже 0) больше порога
+    monkeypatch.setattr(db, "REPLICA_MAX_LAG_SEC", -1.0)
+    before = db.replica_stats()["fallbacks"]
+    assert db.read_engine("app.api.v1.admin_dashboard") is db.engine
+    assert db.replica_lag() is not None
+    assert db.replica_stats()["fallbacks"] == before + 1
+
+
+def test_unreachable_replica_falls_back_to_primary(db, monkeypatch):
+    from sqlalchemy import create_engine
+
+    dead = create_engine(
+        "postgresql+psycopg2://hhbot@127.0.0.1:1/hhbot", connect_args={"connect_timeout": 2}
+    )
+    monkeypatch.setattr(db, "replica_engine", dead)
+    try:
+        assert db.read_engine("app.api.v1.admin_dashboard") is db.engine
+        assert db._replica_state["error"]
+    finally:
+        dead.dispose()
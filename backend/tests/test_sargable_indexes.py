@@ -0,0 +1,107 @@
+# backend/tests/test_sargable_indexes.py
+"""
+EXPLAIN-проверки миграции 0040: переписанные предикаты (полуоткрытые диапазоны
+вместо ::date) используют индексы. Нужна мигрированная БД в DATABASE_URL,
+без неё — skip. enable_seqscan=off: на пустой таблице планировщик иначе выберет
+seq scan, а проверяем мы именно то, что индекс для предиката применим.
+"""
+import json
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL is not set")
+
+# имя -> (SQL, индексы, из которых планировщик должен взять хотя бы один)
+CASES = {
+    # admin_dashboard: заявки за сегодня/вчера
+    "dashboard_today": (
+        "SELECT count(*) FROM applications WHERE created_at >= :start_utc AND created_at < :end_utc",
+        {"ix_applications_created_at", "idx_apps_created_at", "ix_applications_user_created"},
+    ),
+    # list_campaigns / campaign_stats: отправлено по кампании за сегодня
+    "list_campaigns_sent_today": (
+        """
+        SELECT count(*) FROM applications
+         WHERE campaign_id = :cid AND status = 'sent'
+           AND created_at >= :start_utc AND created_at < :end_utc
+        """,
+        {"ix_applications_campaign_status_created"},
+    ),
+    # /auto/status today_count и inflight в auto_tick
+    "user_auto_today": (
+        """
+        SELECT count(*) FROM applications
+         WHERE user_id = :uid AND kind = 'auto'
+           AND created_at >= :start_utc AND created_at < :end_utc
+        """,
+        {"ix_applications_user_created"},
+    ),
+    # admin_today_quotas: sent за московские сутки по updated_at
+    "today_quotas": (
+        """
+        SELECT user_id, count(*) FROM applications
+         WHERE status = 'sent' AND updated_at >= :start_utc AND updated_at < :end_utc
+         GROUP BY user_id
+        """,
+        {"ix_applications_status_updated"},
+    ),
+}
+
+# индекс секции -> он сам и все родительские (имена из миграций — у родителя)
+_ANCESTORS_SQL = """
+    WITH RECURSIVE up AS (
+        SELECT c.oid, c.relname::text AS name
+          FROM pg_class c
+         WHERE c.relname = :name AND c.relkind IN ('i', 'I')
+        UNION ALL
+        SELECT p.oid, p.relname::text
+          FROM up
+          JOIN pg_inherits i ON i.inhrelid = up.oid
+          JOIN pg_class p    ON p.oid = i.inhparent
+    )
+    SELECT name FROM up
+"""
+
+
+@pytest.fixture(scope="module")
+def conn():
+    from sqlalchemy import create_engine
+
+    from app.db import normalize_dsn
+
+    engine = create_engine(normalize_dsn(os.environ["DATABASE_URL"]))
+    with engine.connect() as c:
+        c.exec_driver_sql("SET enable_seqscan = off")
+        yield c
+    engine.dispose()
+
+
+def _index_names(plan: dict) -> set:
+    names = set()
+    if plan.get("Index Name"):
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans") or []:
+        names |= _index_names(child)
+    return names
+
+
+def _used_indexes(conn, sql: str, params: dict) -> set:
+    from sqlalchemy import text
+
+    raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+    used = set()
+    for name in _index_names(plan):
+        used |= set(conn.execute(text(_ANCESTORS_SQL), {"name": name}).scalars().all())
+    return used
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_predicate_uses_index(conn, case):
+    from app.services.limits import today_bounds_msk
+
+    sql, expected = CASES[case]
+    start_utc, end_utc = today_bounds_msk()
+    used = _used_indexes(conn, sql, {"start_utc": start_utc, "end_utc": end_utc, "cid": 1, "uid": 1})
+    assert used & expected, f"{case}: plan uses {sorted(used) or 'no index'}, expected one of {sorted(expected)}"
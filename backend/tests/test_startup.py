@@ -0,0 +1,67 @@
+# backend/tests/test_startup.py
+"""
+Бюджет импорта app.main (user-045): импорт в чистом процессе без доступной БД
+укладывается в STARTUP_IMPORT_BUDGET_SEC и не создаёт ни одного engine и не
+открывает сокетов — всё это откладывается до lifespan/первого запроса.
+"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_SEC = float(os.getenv("STARTUP_IMPORT_BUDGET_SEC", "3"))
+
+_PROBE = r"""
+import json, socket, time
+
+connects = []
+
+def _no_network(self, address, *args, **kwargs):
+    connects.append(repr(address))
+    raise OSError("network is disabled in the startup test")
+
+socket.socket.connect = _no_network
+socket.socket.connect_ex = _no_network
+
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+
+import app.db as db
+print(json.dumps({
+    "import_sec": elapsed,
+    "engine": db.engine.created,
+    "async_engine": db.async_engine.created,
+    "replica_engine": db.replica_engine.created if db.replica_engine is not None else False,
+    "connects": connects,
+}))
+"""
+
+
+def _import_probe() -> dict:
+    env = {
+        **os.environ,
+        # порт 1 на localhost: БД недоступна, любая попытка подключения — ошибка
+        "DATABASE_URL": "postgresql+psycopg2://u:p@127.0.0.1:1/none",
+        "DATABASE_REPLICA_URL": "",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+    # обязательные настройки app.core.config; значения не важны
+    for name in ("BACKEND_BASE_URL", "HH_CLIENT_ID", "HH_CLIENT_SECRET", "HH_REDIRECT_URI"):
+        env.setdefault(name, "test")
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert out.returncode == 0, out.stderr[-2000:]
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_import_is_lazy_and_within_budget():
+    probe = _import_probe()
+    assert probe["import_sec"] < BUDGET_SEC, f"app.main imported in {probe['import_sec']:.2f}s (budget {BUDGET_SEC}s)"
+    assert probe["engine"] is False
+    assert probe["async_engine"] is False
+    assert probe["replica_engine"] is False
+    assert probe["connects"] == []
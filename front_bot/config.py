@@ -1,5 +1,15 @@
 # 📦 Конфигурации 
 
+# Справочники ниже — запасные: актуальные бот берёт с бэкенда (utils/dictionaries.py)
+
+DEMO_SCHEDULES = [
+    {"id": "fullDay", "name": "Полный день"},
+    {"id": "shift", "name": "Сменный график"},
+    {"id": "flexible", "name": "Гибкий график"},
+    {"id": "remote", "name": "Удаленная работа"},
+    {"id": "flyInFlyOut", "name": "Вахтовый метод"}
+]
+
 DEMO_EMPLOYMENT = [
     {"id": "full", "name": "Полная занятость"},
     {"id": "part", "name": "Частичная занятость"},
@@ -68,15 +78,6 @@ DEMO_PROF_ROLE_MAP = {
     "27": ["40"],
 }
 
-# Название области по id
-AREA_NAME_BY_ID = {str(p["id"]): p["name"] for p in DEMO_PROFESSIONS}
-
-# Обратная мапа: роль -> область
-ROLE_TO_AREA_ID = {}
-for area_id, role_ids in DEMO_PROF_ROLE_MAP.items():
-    for rid in role_ids:
-        ROLE_TO_AREA_ID[str(rid)] = str(area_id)
-
 DEMO_RESUMES = [
     {"id": "resume_1", "title": "Python разработчик"},
     {"id": "resume_2", "title": "Frontend разработчик"},
@@ -17,6 +17,7 @@ import config
 import httpx
 from telegram.ext import ContextTypes
 from utils.api_client import users_seen
+from utils import dictionaries
 
 from telegram.constants import ParseMode
 from telegram.ext import Defaults
@@ -149,6 +150,8 @@ async def main() -> None:
     # --- Start polling ---
     async with application:
         await application.initialize()
+        await dictionaries.refresh()
+        dict_task = asyncio.create_task(dictionaries.reload_loop())
         logging.info("Bot started successfully")
         await application.start()
         await application.updater.start_polling()
@@ -158,6 +161,7 @@ async def main() -> None:
         except KeyboardInterrupt:
             logging.info("Received stop signal")
         finally:
+            dict_task.cancel()
             await application.updater.stop()
             await application.stop()
             await application.shutdown()
@@ -16,8 +16,7 @@ from telegram.ext import (
     filters,
 )
 
-import config
-from utils import texts, buttons
+from utils import texts, buttons, dictionaries
 from utils.helpers import build_paginated_keyboard, build_multi_choice_keyboard, handle_multi_choice
 from utils.states import (
     AUTO_RESPONSE_MAIN,
@@ -56,7 +55,6 @@ from routers.responses import (
     _scrape_vacancy_ids,
 )
 from routers.responses import _render_prof_page, handle_prof_toggle, handle_prof_all, handle_prof_page
-from config import DEMO_PROF_ROLE_MAP
 from utils.api_client import auto_status_sync, auto_set_active_sync
 
 logger = logging.getLogger(__name__)
@@ -422,7 +420,7 @@ async def ask_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         context.user_data.get("workfmt_selection", [])
     )
 
-    schedules = config.DEMO_SCHEDULES
+    schedules = dictionaries.schedules()
     context.bot_data["dictionaries"] = {"schedule": schedules}
 
     options = {item["id"]: item["name"] for item in schedules}
@@ -432,7 +430,7 @@ async def ask_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     return ASK_EMPLOYMENT
 
 async def handle_schedule_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    schedules = config.DEMO_SCHEDULES
+    schedules = dictionaries.schedules()
     options = {item["id"]: item["name"] for item in schedules}
     await handle_multi_choice(update, context, options, "schedule_selection", "schedule")
     return ASK_EMPLOYMENT
@@ -444,7 +442,7 @@ async def ask_employment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         context.user_data.get("workfmt_selection", [])
     )
 
-    employment = config.DEMO_EMPLOYMENT
+    employment = dictionaries.employment()
     context.bot_data["dictionaries"]["employment"] = employment
     options = {item["id"]: item["name"] for item in employment}
     context.user_data["employment_selection"] = set()
@@ -453,7 +451,7 @@ async def ask_employment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     return ASK_EMPLOYMENT
 
 async def handle_employment_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    employment = config.DEMO_EMPLOYMENT
+    employment = dictionaries.employment()
     options = {item["id"]: item["name"] for item in employment}
     await handle_multi_choice(update, context, options, "employment_selection", "employment")
     return ASK_EMPLOYMENT
@@ -466,8 +464,6 @@ async def ask_profession(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         context.user_data.get("employment_selection", [])
     )
 
-    context.bot_data["prof_categories"] = config.DEMO_PROFESSIONS
-    context.bot_data["prof_role_map"]   = getattr(config, "DEMO_PROF_ROLE_MAP", {})
     context.user_data["profession_selection"] = set()
     context.user_data["prof_page"] = 0
 
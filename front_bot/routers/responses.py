@@ -16,8 +16,7 @@ from telegram.ext import (
     filters,
 )
 
-import config
-from utils import texts, states, buttons
+from utils import texts, states, buttons, dictionaries
 from utils.api_client import (
     get_link_status,
     hh_resumes,
@@ -178,8 +177,7 @@ async def get_quota_safe(context, user_id: int) -> tuple[int, int, int]:
 PROF_PAGE_SIZE = 10
 
 def _all_prof_categories() -> list[dict]:
-    from config import DEMO_PROFESSIONS
-    return DEMO_PROFESSIONS
+    return dictionaries.categories()
 
 def _render_prof_page(context, page: int):
     cats = _all_prof_categories()                       
@@ -539,9 +537,9 @@ def _render_campaign_card(c: dict) -> str:
     wf = c.get("work_format") or []
     schedule = ", ".join(WORK_FORMAT_OPTIONS.get(x, x) for x in wf) or "Все"
 
-    # тип занятости по словарю из config
+    # тип занятости по словарю из utils.dictionaries
     empl_ids = set(c.get("employment") or [])
-    employment = ", ".join([e["name"] for e in config.DEMO_EMPLOYMENT if e["id"] in empl_ids]) or "Все"
+    employment = ", ".join([e["name"] for e in dictionaries.employment() if e["id"] in empl_ids]) or "Все"
 
     prof_area = c.get("prof_area") or _prof_roles_to_label(c.get("professional_roles"))
     query = c.get("query") or c.get("keyword") or "—"
@@ -1027,7 +1025,7 @@ async def handle_region_page(update: Update, context: ContextTypes.DEFAULT_TYPE)
     return ASK_SCHEDULE
 
 async def handle_schedule_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    schedules = config.DEMO_SCHEDULES
+    schedules = dictionaries.schedules()
     schedule_options = {item["id"]: item["name"] for item in schedules}
     await handle_multi_choice(update, context, schedule_options, "schedule_selection", "schedule")
     return ASK_EMPLOYMENT
@@ -1037,7 +1035,7 @@ async def ask_employment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     context.user_data["new_request"]["schedule"] = list(context.user_data.get("schedule_selection", []))
     await q.answer()
 
-    employment = config.DEMO_EMPLOYMENT
+    employment = dictionaries.employment()
     context.bot_data["dictionaries"]["employment"] = employment
 
     employment_options = {item["id"]: item["name"] for item in employment}
@@ -1048,18 +1046,9 @@ async def ask_employment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await q.message.edit_text(texts.ASK_EMPLOYMENT, reply_markup=reply_markup)
     return ASK_PROFESSION
 
-from config import DEMO_PROF_ROLE_MAP
-
 def _roles_from_categories(selected_category_ids: list[str]) -> list[int]:
-    """Берём из config.DEMO_PROF_ROLE_MAP все role id для выбранных категорий."""
-    out, seen = [], set()
-    for cid in selected_category_ids:
-        for rid in DEMO_PROF_ROLE_MAP.get(str(cid), []):
-            iri = int(rid)
-            if iri not in seen:
-                seen.add(iri)
-                out.append(iri)
-    return out
+    """Все role id для выбранных категорий (из справочника HH)."""
+    return dictionaries.roles_for_categories(selected_category_ids)
     
 def _get_professional_role_ids(context, data: dict) -> list[int]:
     """
@@ -1081,7 +1070,7 @@ def _get_professional_role_ids(context, data: dict) -> list[int]:
     return _roles_from_categories([str(c) for c in cats])
 
 async def handle_employment_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    employment = config.DEMO_EMPLOYMENT
+    employment = dictionaries.employment()
     employment_options = {item["id"]: item["name"] for item in employment}
     await handle_multi_choice(update, context, employment_options, "employment_selection", "employment")
     return ASK_PROFESSION
@@ -1091,10 +1080,6 @@ async def ask_profession(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     context.user_data["new_request"]["employment"] = list(context.user_data.get("employment_selection", []))
     await q.answer()
 
-    # Категории для клавиатуры 
-    context.bot_data["prof_categories"] = config.DEMO_PROFESSION
-    context.bot_data["prof_role_map"] = getattr(config, "DEMO_PROF_ROLE_MAP", {})
-
     # состояние выбора
     context.user_data["new_request"]["employment"] = list(context.user_data.get("employment_selection", []))
     context.user_data["prof_page"] = 0
@@ -1461,11 +1446,11 @@ async def confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE, messa
         schedule_names = work_format_names or ["Не указано"]
 
         employment_names = [
-            e["name"] for e in config.DEMO_EMPLOYMENT if e["id"] in (data.get("employment") or [])
+            e["name"] for e in dictionaries.employment() if e["id"] in (data.get("employment") or [])
         ] or ["Не указано"]
 
         prof_category_names = [
-            c["name"] for c in config.DEMO_PROFESSIONS if str(c["id"]) in (data.get("profession") or [])
+            c["name"] for c in dictionaries.categories() if str(c["id"]) in (data.get("profession") or [])
         ] or ["Не указано"]
 
         search_field_names = [
@@ -1691,8 +1676,6 @@ def _search_fields_to_label(fields: list[str]) -> str:
         mapping = {"name": "В названии", "description": "В описании", "company_name": "Название компании"}
     return ", ".join(mapping.get(f, f) for f in (fields or [])) or "Все"
 
-from config import AREA_NAME_BY_ID, ROLE_TO_AREA_ID
-
 def _prof_roles_to_label(professional_roles) -> str:
     """Преобразует список role_id -> человекочитаемые названия Проф. областей."""
     if not professional_roles:
@@ -1701,13 +1684,13 @@ def _prof_roles_to_label(professional_roles) -> str:
     role_ids = [str(r) for r in professional_roles if str(r).strip()]
     area_ids = []
     for rid in role_ids:
-        aid = ROLE_TO_AREA_ID.get(rid)
+        aid = dictionaries.category_of_role(rid)
         if aid:
             area_ids.append(aid)
     if not area_ids:
         return "—"
 
-    area_names = sorted({AREA_NAME_BY_ID.get(aid, f"[{aid}]") for aid in area_ids})
+    area_names = sorted({dictionaries.category_name(aid) or f"[{aid}]" for aid in area_ids})
     return ", ".join(area_names) if area_names else "—"
     
 async def send_responses(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -170,6 +170,11 @@ async def queue_applications(
     return await _req("POST", "/hh/applications/queue", json=payload)
 
 
+async def applications_backlog() -> Dict[str, Any]:
+    """Бэклог диспетчера: due, ETA, режим приёма (ok/deferring/rejecting)."""
+    return await _req("GET", "/hh/applications/backlog")
+
+
 async def dispatch_now(limit: int = 50, dry_run: bool = False) -> Dict[str, Any]:
     return await _req(
         "POST", "/hh/applications/dispatch",
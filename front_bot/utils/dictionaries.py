@@ -0,0 +1,150 @@
+# front_bot/utils/dictionaries.py
+"""
+Справочники HH (проф. области/роли, занятость, график) для бота.
+
+Грузятся с бэкенда (/hh/dictionaries) при старте и периодически
+перезапрашиваются с If-None-Match; до первой загрузки и при недоступности
+бэкенда работают DEMO_* из config. Все индексы строятся один раз на снапшот,
+поиск — по словарям.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+import config
+from utils.api_client import API_BASE
+
+log = logging.getLogger(__name__)
+
+RELOAD_SEC = float(os.getenv("HH_DICT_RELOAD_SEC", "3600"))
+_EXPAND_CACHE_MAX = 512
+
+_state: Dict[str, Any] = {
+    "etag": None,
+    "source": "config",
+    "categories": [],
+    "category_names": {},
+    "category_roles": {},
+    "role_category": {},
+    "employment": [],
+    "schedule": [],
+}
+_expand_cache: Dict[Tuple[str, ...], List[int]] = {}
+
+
+def _apply(snapshot: dict, *, etag: Optional[str], source: str) -> None:
+    categories = [{"id": str(c["id"]), "name": c["name"]} for c in snapshot.get("categories") or []]
+    category_roles = {
+        str(cid): tuple(int(r) for r in rids if str(r).isdigit())
+        for cid, rids in (snapshot.get("category_roles") or {}).items()
+    }
+    role_category = snapshot.get("role_category")
+    if role_category is None:
+        role_category = {}
+        for c in categories:
+            for rid in category_roles.get(c["id"], ()):
+                role_category.setdefault(str(rid), c["id"])
+
+    _state.update(
+        etag=etag,
+        source=source,
+        categories=categories,
+        category_names={c["id"]: c["name"] for c in categories},
+        category_roles=category_roles,
+        role_category={str(k): str(v) for k, v in role_category.items()},
+        employment=list(snapshot.get("employment") or config.DEMO_EMPLOYMENT),
+        schedule=list(snapshot.get("schedule") or config.DEMO_SCHEDULES),
+    )
+    _expand_cache.clear()
+
+
+def _apply_fallback() -> None:
+    _apply(
+        {
+            "categories": config.DEMO_PROFESSIONS,
+            "category_roles": config.DEMO_PROF_ROLE_MAP,
+            "employment": config.DEMO_EMPLOYMENT,
+            "schedule": config.DEMO_SCHEDULES,
+        },
+        etag=None,
+        source="config",
+    )
+
+
+_apply_fallback()
+
+
+# ---------- загрузка ----------
+
+async def refresh() -> bool:
+    """Перезапрашивает справочники. True — снапшот обновился."""
+    headers = {"If-None-Match": _state["etag"]} if _state["etag"] else {}
+    try:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(20.0)) as client:
+            r = await client.get(API_BASE + "/hh/dictionaries", headers=headers)
+        if r.status_code == 304:
+            return False
+        r.raise_for_status()
+        snapshot = r.json()
+        if not snapshot.get("categories"):
+            raise ValueError("empty categories")
+    except Exception as e:
+        log.warning("hh dictionaries load failed (source=%s): %s", _state["source"], e)
+        return False
+
+    _apply(snapshot, etag=r.headers.get("ETag"), source="backend")
+    log.info("hh dictionaries loaded: %s categories", len(_state["categories"]))
+    return True
+
+
+async def reload_loop() -> None:
+    """Фоновое обновление; при изменениях на HH бот подхватывает их без деплоя."""
+    while True:
+        await asyncio.sleep(RELOAD_SEC)
+        await refresh()
+
+
+# ---------- поиск ----------
+
+def categories() -> List[dict]:
+    return _state["categories"]
+
+
+def category_name(cid: Any) -> Optional[str]:
+    return _state["category_names"].get(str(cid))
+
+
+def category_of_role(rid: Any) -> Optional[str]:
+    return _state["role_category"].get(str(rid))
+
+
+def roles_for_categories(category_ids: Iterable[Any]) -> List[int]:
+    """role id всех выбранных категорий, без повторов, в порядке выбора."""
+    key = tuple(str(c) for c in category_ids)
+    out = _expand_cache.get(key)
+    if out is not None:
+        return list(out)
+
+    out, seen = [], set()
+    for cid in key:
+        for rid in _state["category_roles"].get(cid, ()):
+            if rid not in seen:
+                seen.add(rid)
+                out.append(rid)
+    if len(_expand_cache) >= _EXPAND_CACHE_MAX:
+        _expand_cache.clear()
+    _expand_cache[key] = out
+    return list(out)
+
+
+def employment() -> List[dict]:
+    return _state["employment"]
+
+
+def schedules() -> List[dict]:
+    return _state["schedule"]